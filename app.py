@@ -1,14 +1,19 @@
 import streamlit as st
-from langchain_openai import ChatOpenAI
-from langchain_openai import OpenAIEmbeddings
-from langchain_pinecone import PineconeVectorStore
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableBranch
 from langchain_core.runnables.history import RunnableWithMessageHistory
 from langchain_community.chat_message_histories import ChatMessageHistory
-from langchain.chains import create_history_aware_retriever, create_retrieval_chain
+from langchain.chains import create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain.retrievers import MultiQueryRetriever
 from dotenv import load_dotenv
+from backend import clients
+from backend.vectorstores import load_vectorstore
+from backend.sparse_index import SparseIndex
+from backend.hybrid_retriever import HybridRetriever
+from backend.rerank import load_rerank_stage
+from backend.preclassifier import KeywordPreclassifier
+from backend.regulations import REGULATION_NAMES
 import os
 
 # 1. 환경 설정
@@ -21,36 +26,36 @@ st.caption("Pinecone 클라우드 DB 연동 완료! (Model: Large)")
 @st.cache_resource
 def load_db():
     # ⚠️ 중요: 아까 ingest할 때 쓴 모델과 똑같아야 함!
-    embeddings = OpenAIEmbeddings(model="text-embedding-3-large")
-    index_name = os.getenv("PINECONE_INDEX_NAME")
-    
-    # Pinecone 인덱스에서 데이터 검색 도구 가져오기
-    vectorstore = PineconeVectorStore.from_existing_index(
-        index_name=index_name,
-        embedding=embeddings
-    )
+    embeddings = clients.embedding_client("text-embedding-3-large")
+
+    # Pinecone 인덱스(기본) 또는 로컬 인덱스(VECTOR_BACKEND=local)에서 데이터 검색 도구 가져오기
+    vectorstore = load_vectorstore(embeddings, model="text-embedding-3-large")
     return vectorstore
 
 vectorstore = load_db()
 
+# 인제스트 때 만들어 둔 BM25 희소 인덱스 (없으면 None → 벡터 검색만)
+@st.cache_resource
+def load_sparse_index():
+    return SparseIndex.load()
+
+sparse_index = load_sparse_index()
+
 # 3. 세션 및 체인 설정
 if "messages" not in st.session_state:
     st.session_state.messages = []
 if "store" not in st.session_state:
     st.session_state.store = {}
 
+# 체인은 대화 상태가 없으므로 한 번만 만들어 모든 메시지·세션이 같이 씁니다. (LLM 클라이언트와 커넥션 풀도 재사용)
+@st.cache_resource
 def get_rag_chain():
-    llm = ChatOpenAI(model="gpt-4o-mini", temperature=0)
+    llm = clients.chat_model("gpt-4o-mini", temperature=0)
 
-    # 기본 검색기 (벡터 검색) - Large 모델이라 성능 굿!
-    base_retriever = vectorstore.as_retriever(search_kwargs={"k": 3})
-
-    # Multi-Query 검색기 (BM25 대신 질문을 3개로 뻥튀기해서 커버)
-    multi_query_retriever = MultiQueryRetriever.from_llm(
-        retriever=base_retriever,
-        llm=llm,
-        include_original=True
-    )
+    # 하이브리드 검색기 (벡터 검색 + BM25를 RRF로 합침)
+    # "제17조"나 금액처럼 정확한 표현은 BM25가 잡아주므로, 질문을 LLM으로 늘리는 Multi-Query는 쓰지 않습니다.
+    # RERANK 설정이 켜져 있으면 후보를 넉넉히 뽑아 다시 정렬하고, 3개 이하로 필요한 만큼만 넘깁니다. (backend/rerank.py)
+    hybrid_retriever = HybridRetriever(vectorstore=vectorstore, sparse=sparse_index, k=3, rerank=load_rerank_stage(sparse_index))
 
     # 대화 맥락 인식
     contextualize_q_system_prompt = """
@@ -64,9 +69,15 @@ def get_rag_chain():
             ("human", "{input}"),
         ]
     )
-    history_aware_retriever = create_history_aware_retriever(
-        llm, multi_query_retriever, contextualize_q_prompt
-    )
+    # 대화 기록이 없거나 질문이 그 자체로 완결돼 있으면(지시어 없음 + 리그·조항 명시) 재구성 LLM을 부르지 않고 바로 검색
+    preclassifier = KeywordPreclassifier(REGULATION_NAMES)
+    history_aware_retriever = RunnableBranch(
+        (
+            lambda x: not x.get("chat_history") or preclassifier.is_self_contained(x["input"]),
+            (lambda x: x["input"]) | hybrid_retriever,
+        ),
+        contextualize_q_prompt | llm | StrOutputParser() | hybrid_retriever,
+    ).with_config(run_name="chat_retriever_chain")
 
     # 답변 생성
     qa_system_prompt = """
@@ -0,0 +1,76 @@
+import argparse
+import json
+import os
+import sys
+
+import httpx
+
+# 질문 여러 개를 /chat/batch로 한 번에 보내고, 답이 끝나는 대로 NDJSON 한 줄씩 받아 씁니다.
+# 사용법:
+#   python ask_batch.py checklist.txt                        # 한 줄에 질문 하나 (빈 줄, #으로 시작하는 줄은 무시)
+#   python ask_batch.py checklist.jsonl --out answers.ndjson  # {"question": ...} 한 줄에 하나
+#   cat checklist.txt | python ask_batch.py -
+# 서버의 BATCH_MAX_QUESTIONS(기본 100)보다 많으면 --batch-size개씩 나눠 보냅니다. (index는 입력 파일 기준 순번)
+
+
+def load_questions(path):
+    f = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    with f:
+        lines = [line.strip() for line in f]
+    lines = [line for line in lines if line and not line.startswith("#")]
+    if path.endswith(".jsonl"):
+        return [json.loads(line)["question"] for line in lines]
+    return lines
+
+
+def ask(client, url, questions, offset):
+    with client.stream("POST", f"{url}/chat/batch", json={"questions": questions}) as response:
+        response.raise_for_status()
+        for raw in response.iter_lines():
+            if raw.strip():
+                row = json.loads(raw)
+                if "index" in row:
+                    row["index"] += offset
+                yield row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="책첵 배치 질의 (/chat/batch)")
+    parser.add_argument("questions", help="질문 파일 (.txt 한 줄에 하나 / .jsonl) 또는 - (표준 입력)")
+    parser.add_argument("--url", default=os.getenv("CHAEKCHECK_API_URL", "http://localhost:8000"))
+    parser.add_argument("--out", default=None, help="결과 NDJSON 파일 (없으면 표준 출력)")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    if not questions:
+        print("❌ 질문이 없습니다.", file=sys.stderr)
+        return 1
+
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    answered = failed = 0
+    with httpx.Client(timeout=args.timeout) as client, out:
+        for offset in range(0, len(questions), args.batch_size):
+            for row in ask(client, args.url, questions[offset : offset + args.batch_size], offset):
+                if row.get("done"):
+                    print(
+                        f"📦 {row['questions']}개 질문 완료: {row['generation_time']}초 "
+                        f"(라우터 {row['router_calls']}회, 답변 {row['answer_calls']}회, 공유 컨텍스트 {row['shared_groups']}묶음)",
+                        file=sys.stderr,
+                    )
+                    continue
+                out.write(json.dumps(row, ensure_ascii=False) + "\n")
+                out.flush()
+                if "error" in row:
+                    failed += 1
+                    print(f"⚠️ [{row.get('index', '-')}] {row['error']}", file=sys.stderr)
+                else:
+                    answered += 1
+                    print(f"✅ [{row['index']}] {row['question']} ({row['elapsed']}초)", file=sys.stderr)
+    print(f"완료: 답변 {answered}개, 실패 {failed}개", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
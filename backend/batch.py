@@ -0,0 +1,70 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+from backend.hybrid import doc_key
+
+# 🟢 배치 질의(/chat/batch) 보조 함수
+# - 같은 질문(정규화 기준)은 한 번만 처리하고 결과를 나눠 줍니다.
+# - 검색된 청크가 많이 겹치는 질문들은 두 컨텍스트를 합쳐 한 번만 보내고 답변 LLM 한 번으로 같이 답합니다.
+#   겹침은 청크 ID 집합의 Jaccard(순위 무시)로 재고, 묶음의 첫 질문과 min_overlap 이상이면 같은 묶음에 넣습니다.
+#   (답변을 "### 답변 N" 머리줄로 나눠 받고, 개수가 안 맞으면 질문별로 다시 부릅니다.)
+ANSWER_HEADER_RE = re.compile(r"^\s*#{1,4}\s*답변\s*(\d+)\s*[:.]?\s*$", re.M)
+
+
+def unique_questions(questions: List[str]) -> Dict[str, List[int]]:
+    # 정규화한 질문 → 원래 순번들 (처음 나온 순서 유지)
+    from backend.embedding_cache import normalize_text
+
+    groups: Dict[str, List[int]] = {}
+    for i, question in enumerate(questions):
+        groups.setdefault(normalize_text(question), []).append(i)
+    return groups
+
+
+def group_by_context(contexts: Dict[int, list], max_size: int, min_overlap: float) -> List[List[int]]:
+    # 청크 ID 집합이 묶음의 첫 질문과 가장 많이 겹치는 묶음에 max_size개까지 넣습니다. (빈 컨텍스트는 묶지 않음)
+    groups: List[Tuple[frozenset, List[int]]] = []  # (첫 질문의 청크 집합, 순번들)
+    singles = []
+    for i, context in contexts.items():
+        keys = frozenset(doc_key(d) for d in context)
+        if not keys or max_size <= 1:
+            singles.append([i])
+            continue
+        best, best_overlap = None, min_overlap
+        for seed, members in groups:
+            overlap = len(keys & seed) / len(keys | seed)
+            if len(members) < max_size and overlap >= best_overlap:
+                best, best_overlap = members, overlap
+        if best is None:
+            groups.append((keys, [i]))
+        else:
+            best.append(i)
+    return [members for _, members in groups] + singles
+
+
+def merge_contexts(contexts: List[list]) -> list:
+    # 묶음의 컨텍스트를 순위별로 번갈아 합칩니다. (1위끼리, 2위끼리 ... 같은 청크는 한 번만)
+    merged, seen = [], set()
+    for rank in range(max((len(c) for c in contexts), default=0)):
+        for context in contexts:
+            if rank < len(context) and doc_key(context[rank]) not in seen:
+                seen.add(doc_key(context[rank]))
+                merged.append(context[rank])
+    return merged
+
+
+def shared_input(questions: List[str]) -> str:
+    numbered = "\n".join(f"{n}. {q}" for n, q in enumerate(questions, 1))
+    return (
+        f"다음 {len(questions)}개 질문에 각각 답하세요. 각 답변은 '### 답변 N' 한 줄(N은 질문 번호)로 시작하고, "
+        "답을 찾을 수 없는 질문에는 그 답변 자리에 거절 문장만 쓰세요.\n" + numbered
+    )
+
+
+def split_answers(text: str, count: int) -> Optional[List[str]]:
+    # "### 답변 1 ... ### 답변 2 ..." → [답변1, 답변2]. 번호가 1..count로 정확히 안 나오면 None
+    headers = list(ANSWER_HEADER_RE.finditer(text))
+    if [int(m.group(1)) for m in headers] != list(range(1, count + 1)):
+        return None
+    answers = [text[m.end() : (headers[i + 1].start() if i + 1 < len(headers) else len(text))].strip() for i, m in enumerate(headers)]
+    return answers if all(answers) else None
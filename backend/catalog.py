@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import re
+import time
+from typing import Dict, List, Optional
+
+from backend.regulations import REGULATION_NAMES, league_of
+
+# 🟢 규정집 카탈로그 (인제스트 때 만드는 빌드 산출물, API는 시작할 때 한 번 읽음)
+# - 문서마다 canonical ID(파일명에서 .pdf를 뺀 것), 표시 제목, 리그, 연도, 쪽수, 파일 해시를 담습니다.
+# - 표시 제목은 REGULATION_NAMES에 있으면 그 값, 없으면 파일명에서 만듭니다. (새 PDF를 넣어도 사전 수정 없이 검색·출처 표시 가능)
+# - 청크 메타데이터에도 doc_id / 1부터 세는 page_number / 정리된 preview / citation(조항 표기)을 미리 넣어,
+#   답변할 때 출처 카드를 만드는 문자열 작업이 없게 합니다.
+CATALOG_PATH = os.getenv("REGULATION_CATALOG_PATH", "./regulation_catalog.json")
+CATALOG_VERSION = 1
+PREVIEW_CHARS = 100
+
+YEAR_RE = re.compile(r"_(\d{4})(?:\.pdf)?$")
+TOC_LEADER_RE = re.compile(r"[·…‥]{2,}|\.{3,}")
+
+
+def doc_id_of(filename: str) -> str:
+    return os.path.splitext(os.path.basename(filename))[0]
+
+
+def display_title(filename: str) -> str:
+    filename = os.path.basename(filename)
+    if filename in REGULATION_NAMES:
+        return REGULATION_NAMES[filename]
+    # football_kleague_medical_2025.pdf → "K리그 medical (2025)"
+    stem = doc_id_of(filename)
+    year = YEAR_RE.search(stem)
+    name = stem[: year.start()] if year else stem
+    league = league_of(filename)
+    for prefix in ("football_kleague_", "baseball_kbo_"):
+        name = name.removeprefix(prefix)
+    return " ".join(x for x in (league, name.replace("_", " "), f"({year.group(1)})" if year else None) if x)
+
+
+def make_preview(text: str, limit: int = PREVIEW_CHARS) -> str:
+    # 공백·목차 점선을 정리하고, 단어 중간에서 자르지 않습니다.
+    clean = re.sub(r"\s+", " ", TOC_LEADER_RE.sub(" ", text)).strip()
+    if len(clean) <= limit:
+        return clean
+    cut = clean[:limit]
+    space = cut.rfind(" ")
+    return (cut[:space] if space > limit // 2 else cut).rstrip() + "…"
+
+
+def make_citation(metadata: dict) -> Optional[str]:
+    # 출처 카드의 조항 표기: "[별표 1] 제17조 외국인 선수"
+    if not metadata.get("article"):
+        return None
+    return " ".join(x for x in (metadata.get("appendix"), metadata["article"], metadata.get("article_title")) if x)
+
+
+def source_fields(filename: str, metadata: dict, text: str) -> dict:
+    # 인제스트 때 청크 메타데이터에 더하는 출처 카드용 값 (Pinecone/Chroma 메타데이터는 None 불가 → 있는 값만)
+    fields = {
+        "doc_id": doc_id_of(filename),
+        "page_number": int(metadata.get("page", 0)) + 1,
+        "preview": make_preview(text),
+    }
+    citation = make_citation(metadata)
+    if citation:
+        fields["citation"] = citation
+    return fields
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def catalog_entry(path: str, pages: int) -> dict:
+    filename = os.path.basename(path)
+    year = YEAR_RE.search(doc_id_of(filename))
+    return {
+        "doc_id": doc_id_of(filename),
+        "file": filename,
+        "title": display_title(filename),
+        "league": league_of(filename),
+        "year": int(year.group(1)) if year else None,
+        "pages": pages,
+        "sha256": file_sha256(path),
+    }
+
+
+def load_catalog(path: str = CATALOG_PATH) -> Optional[dict]:
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        catalog = json.load(f)
+    if catalog.get("version") != CATALOG_VERSION:
+        print(f"⚠️ 규정집 카탈로그 버전이 달라 사용하지 않습니다. 인제스트를 다시 돌려주세요. ({path})")
+        return None
+    return catalog
+
+
+def save_catalog(documents: List[dict], path: str = CATALOG_PATH) -> dict:
+    catalog = {
+        "version": CATALOG_VERSION,
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "documents": sorted(documents, key=lambda d: d["file"]),
+    }
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(catalog, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    return catalog
+
+
+def update_catalog(parsed: Dict[str, int], data_folder: str, path: str = CATALOG_PATH) -> dict:
+    # parsed: 이번에 파싱한 파일 → 쪽수. 나머지 파일은 기존 항목을 두고, 폴더에서 사라진 파일은 뺍니다.
+    present = {f for f in os.listdir(data_folder) if f.endswith(".pdf")}
+    existing = {d["file"]: d for d in (load_catalog(path) or {}).get("documents", [])}
+    documents = {f: d for f, d in existing.items() if f in present and f not in parsed}
+    for filename, pages in parsed.items():
+        documents[filename] = catalog_entry(os.path.join(data_folder, filename), pages)
+    return save_catalog(list(documents.values()), path)
+
+
+def fallback_catalog() -> dict:
+    # 카탈로그 파일이 없을 때(예전에 인제스트한 배포): 제목 사전만으로 최소한의 목록을 만듭니다.
+    documents = [
+        {"doc_id": doc_id_of(f), "file": f, "title": t, "league": league_of(f), "year": None, "pages": None, "sha256": None}
+        for f, t in REGULATION_NAMES.items()
+    ]
+    return {"version": CATALOG_VERSION, "generated_at": None, "documents": documents}
+
+
+def main():
+    # 임베딩 없이 카탈로그만 다시 만들기: python -m backend.catalog [PDF 폴더]
+    import sys
+
+    from pypdf import PdfReader
+
+    folder = sys.argv[1] if len(sys.argv) > 1 else "./data"
+    files = sorted(f for f in os.listdir(folder) if f.endswith(".pdf"))
+    catalog = save_catalog([catalog_entry(os.path.join(folder, f), len(PdfReader(os.path.join(folder, f)).pages)) for f in files])
+    print(f"📚 규정집 카탈로그 생성: {len(catalog['documents'])}개 문서 ({CATALOG_PATH})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+import bisect
+import os
+import re
+from typing import List, Optional
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from backend.tokens import count_tokens
+
+# 🟢 규정집 구조(장/절/조/항)를 따라 자르는 공용 청커
+# - 조(條) 하나를 한 조각으로 두는 것이 기본입니다. → 검색하면 조항이 통째로 나오고, 조항 번호를 메타데이터로 바로 인용할 수 있습니다.
+# - 조가 토큰 예산(CHUNK_MAX_TOKENS)보다 길면 항(①②…) 경계에서 나누고, 이어지는 조각 앞에 "제N조 제목 (계속)"을 붙입니다.
+# - 조 구조가 안 보이는 문서(라이선싱 규정 등)나 머리말은 예전처럼 문단/문장 단위로 나누되, 길이는 토큰으로 잽니다.
+# - PDF 추출 결과에는 조항 제목이 줄 중간에 붙어 나오거나 목차·본문 속 참조("제3조 제1항에 따라")가 섞여 있으므로,
+#   번호가 차례대로 이어지는 것만 제목으로 인정합니다.
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "512"))
+CHUNK_MIN_TOKENS = 40  # 장·절 제목만 있는 짧은 조각은 다음 조각 앞에 붙입니다.
+CHUNK_OVERLAP_TOKENS = 40  # 구조가 없는 본문을 나눌 때만 씁니다.
+ARTICLE_MAX_PAGES = 3  # 조항 제목에서 이만큼 넘게 떨어진 본문은 표시 없는 부록으로 보고 조항 표시를 붙이지 않습니다.
+
+HEADER_RE = re.compile(r"제\s*(\d{1,3})\s*(장|절|조)(?:\s*의\s*(\d{1,2}))?")
+# 제목이 아니라 참조인 경우: "제3조 제1항", "제9조를", "제2조의 규정에", "제5조 및 제6조"
+REFERENCE_RE = re.compile(r"\s*제\s*\d+\s*[항호조]|(?:에|의\s|을|를|은|는|과|와|이|가|로|부터|까지|내지|,|·|ㆍ|~)|\s+(?:및|또는|내지)\s")
+TOC_RE = re.compile(r"··|…|‥|\.{4,}")
+CLAUSE_RE = re.compile(r"[①-⑳]")
+BRACKET_TITLE_RE = re.compile(r"\s*[\(\[【〔<]([^\)\]】〕>\n]{1,40})[\)\]】〕>]")
+
+
+APPENDIX_RE = re.compile(r"부\s*칙|[\[【<〔]\s*별\s*[표지]\s*(\d*)\s*[\]】>〕]|(?m:^)별\s*첨\s*(\d+)")
+
+
+class _Header:
+    __slots__ = ("start", "end", "kind", "num", "branch", "label", "title")
+
+    def __init__(self, start, end, kind, num=0, branch=0, label=""):
+        self.start, self.end = start, end
+        self.kind = kind
+        self.num = num
+        self.branch = branch
+        self.label = label
+        self.title = None
+
+
+def _is_toc(text, m, next_start):
+    # 목차 줄: 제목 뒤에 쪽수만 있는 경우 ("제6조. 상벌위원회 소집 5", "제27조. 추천 13부칙…")
+    gap = text[m.end() : next_start]
+    line = gap.split("\n", 1)[0]
+    if CLAUSE_RE.search(line):
+        return False
+    return (len(gap) < 60 and re.search(r"\d\s*$", gap)) or (len(line) < 50 and re.search(r"\s\d{1,3}\s*$", line))
+
+
+def _candidates(text):
+    found = []
+    for m in HEADER_RE.finditer(text):
+        after = text[m.end() : m.end() + 80]
+        if REFERENCE_RE.match(after) or TOC_RE.search(after):
+            continue
+        # "「다른 규정」 제2조(목적)에 따라" 처럼 괄호 뒤에 조사가 붙으면 참조입니다.
+        bracket = BRACKET_TITLE_RE.match(after)
+        if bracket and REFERENCE_RE.match(after[bracket.end() :]):
+            continue
+        header = _Header(m.start(), m.end(), m[2], int(m[1]), int(m[3] or 0))
+        header.label = f"제{header.num}{header.kind}" + (f"의{header.branch}" if header.branch else "")
+        found.append((m, header, bracket is not None))
+    for m in APPENDIX_RE.finditer(text):
+        # "[별표1]과 같다", "부칙에 따로 정한다" 같은 본문 속 참조는 제외
+        if REFERENCE_RE.match(text[m.end() : m.end() + 10]):
+            continue
+        label = re.sub(r"\s+", "", m[0]).strip("[]【】<>〔〕")
+        found.append((m, _Header(m.start(), m.end(), "부칙" if label == "부칙" else "별표", label=label), False))
+    found.sort(key=lambda item: item[0].start())
+    return [
+        (header, bracketed)
+        for i, (m, header, bracketed) in enumerate(found)
+        if header.kind in ("부칙", "별표") or not _is_toc(text, m, found[i + 1][0].start() if i + 1 < len(found) else len(text))
+    ]
+
+
+def _find_headers(text):
+    headers = []
+    last_article, last_chapter, last_section = (0, 0), 0, 0
+    for h, bracketed in _candidates(text):
+        if h.kind in ("부칙", "별표"):
+            # 첫 조항보다 앞에 나오는 부칙·별표는 목차입니다.
+            if last_article == (0, 0) and not any(x.kind == "조" for x in headers):
+                continue
+            # 부칙·별표는 조항 번호를 새로 시작합니다. (부칙 제1조 시행일 …)
+            last_article, last_section = (0, 0), 0
+        elif h.kind == "조":
+            key = (h.num, h.branch)
+            in_order = last_article < key and h.num <= last_article[0] + 5
+            # 한 파일에 부속 규정이 이어 붙은 경우(예: KBO 규약 뒤의 고용규정) 제1조부터 다시 시작하는 것도 허용
+            restart = key == (1, 0) and bracketed
+            if not (in_order or restart):
+                continue
+            last_article = key
+        elif h.kind == "장":
+            if h.num != last_chapter + 1 and h.num != 1:
+                continue
+            last_chapter, last_section = h.num, 0
+        else:
+            if h.num != last_section + 1:
+                continue
+            last_section = h.num
+        headers.append(h)
+
+    # 제목: 괄호 안 글자, 아니면 다음 제목·①·줄바꿈 전까지 (길면 본문으로 보고 버림)
+    for i, h in enumerate(headers):
+        limit = headers[i + 1].start if i + 1 < len(headers) else len(text)
+        after = text[h.end : min(limit, h.end + 60)]
+        m = BRACKET_TITLE_RE.match(after)
+        if m:
+            h.title = m[1].strip()
+            continue
+        title = re.split(r"[①-⑳\n]", after, maxsplit=1)[0].strip(" .")
+        if title and len(title) <= 30 and len(title) < len(after.strip()):
+            h.title = title
+        elif h.kind != "조" and title:
+            h.title = title[:30]
+    return headers
+
+
+def _token_splitter(max_tokens, overlap):
+    return RecursiveCharacterTextSplitter(
+        chunk_size=max_tokens,
+        chunk_overlap=overlap,
+        length_function=count_tokens,
+        separators=["\n\n", "\n", "다. ", ". ", " ", ""],
+        keep_separator="end",
+    )
+
+
+def _split_article(text, max_tokens):
+    # (시작 위치, 본문) 목록. 항 단위로 묶되 예산을 넘으면 새 조각을 시작합니다.
+    cuts = [0] + [m.start() for m in CLAUSE_RE.finditer(text) if m.start() > 0] + [len(text)]
+    pieces, cur_start, cur, cur_tokens = [], 0, "", 0
+    for a, b in zip(cuts, cuts[1:]):
+        unit = text[a:b]
+        tokens = count_tokens(unit)
+        if cur and cur_tokens + tokens > max_tokens:
+            pieces.append((cur_start, cur))
+            cur, cur_tokens = "", 0
+        if tokens > max_tokens:
+            cursor = 0
+            for sub in _token_splitter(max_tokens, 0).split_text(unit):
+                cursor = max(unit.find(sub[:30], cursor), cursor)
+                pieces.append((a + cursor, sub))
+            continue
+        if not cur:
+            cur_start = a
+        cur += unit
+        cur_tokens += tokens
+    if cur.strip():
+        pieces.append((cur_start, cur))
+    return pieces
+
+
+def _split_plain(text, max_tokens):
+    pieces, cursor = [], 0
+    for sub in _token_splitter(max_tokens, CHUNK_OVERLAP_TOKENS).split_text(text):
+        cursor = max(text.find(sub[:30], cursor), cursor)
+        pieces.append((cursor, sub))
+    return pieces
+
+
+def chunk_regulation(pages: List[Document], title: Optional[str] = None, max_tokens: int = CHUNK_MAX_TOKENS) -> List[Document]:
+    """PyPDFLoader의 페이지 목록(한 파일)을 조항 단위 청크로 나눕니다."""
+    pages = [p for p in pages if p.page_content.strip()]
+    if not pages:
+        return []
+    page_starts, parts, offset = [], [], 0
+    for page in pages:
+        page_starts.append(offset)
+        parts.append(page.page_content)
+        offset += len(page.page_content) + 1
+    text = "\n".join(parts)
+
+    def page_index(position):
+        return bisect.bisect_right(page_starts, position) - 1
+
+    def metadata_at(position, state):
+        page = pages[page_index(position)]
+        meta = {**page.metadata}
+        if title:
+            meta["title"] = title
+        # Pinecone / Chroma 메타데이터에는 None을 넣을 수 없으므로 있는 값만 넣습니다.
+        meta.update({k: v for k, v in state.items() if v})
+        return meta
+
+    headers = _find_headers(text)
+    bounds = [0] + [h.start for h in headers] + [len(text)]
+    empty = {"chapter": None, "section": None, "appendix": None, "article": None, "article_title": None}
+    state = dict(empty)
+    segments = []  # (시작 위치, 본문, 상태, 조항 제목줄)
+    for i, (a, b) in enumerate(zip(bounds, bounds[1:])):
+        h = headers[i - 1] if i else None
+        if h is not None:
+            label = f"{h.label} {h.title}" if h.title else h.label
+            if h.kind in ("부칙", "별표"):
+                state = {**empty, "appendix": h.label}
+            elif h.kind == "장":
+                state = {**empty, "chapter": label}
+            elif h.kind == "절":
+                state = {**state, "section": label, "article": None, "article_title": None}
+            else:
+                state = {**state, "article": h.label, "article_title": h.title}
+        segments.append((a, text[a:b], dict(state), label if h is not None and h.kind == "조" else None))
+
+    docs, carry = [], ""
+    for start, body, seg_state, header_line in segments:
+        body = carry + body
+        start -= len(carry)
+        carry = ""
+        if not body.strip():
+            continue
+        if not seg_state["article"] and count_tokens(body) < CHUNK_MIN_TOKENS and start + len(body) < len(text):
+            carry = body
+            continue
+
+        if seg_state["article"]:
+            prefix = f"{header_line} (계속)\n"
+            pieces = _split_article(body, max_tokens - count_tokens(prefix))
+        else:
+            prefix = ""
+            pieces = _split_plain(body, max_tokens)
+        for n, (piece_start, piece) in enumerate(pieces):
+            content = piece.strip()
+            if not content:
+                continue
+            piece_state = seg_state
+            if prefix and page_index(start + piece_start) - page_index(start) > ARTICLE_MAX_PAGES:
+                piece_state = {**seg_state, "article": None, "article_title": None}
+            elif n and prefix:
+                content = prefix + content
+            docs.append(Document(page_content=content, metadata=metadata_at(start + piece_start, piece_state)))
+    if carry.strip():
+        docs.append(Document(page_content=carry.strip(), metadata=metadata_at(len(text) - len(carry), state)))
+    return docs
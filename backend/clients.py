@@ -0,0 +1,171 @@
+import asyncio
+import os
+import threading
+from typing import TYPE_CHECKING, Dict, Optional
+
+if TYPE_CHECKING:
+    import httpx
+
+# 🟢 업스트림 HTTP 클라이언트 계층 (API 서버 · app.py · 인제스트 공용)
+# - OpenAI: 프로세스당 httpx 클라이언트를 용도(chat: 라우터·답변 LLM / embeddings: 임베딩·인제스트)별로 하나씩 둡니다.
+#   (모델 객체마다 커넥션 풀을 따로 두면 TLS 핸드셰이크가 반복되고 keep-alive가 나뉩니다.)
+#   풀 하나에 다 몰지 않는 건, httpcore가 요청을 배정할 때마다 풀의 연결을 전부 훑어서 연결 수가 늘수록 CPU가 제곱으로 들기 때문입니다.
+#   (bench/upstream.py, 단일 풀 48연결에서 p50이 기본 클라이언트보다 20%쯤 느렸음) 동시 요청 상한(upstream_gate)은 둘이 같이 씁니다.
+# - keep-alive 풀 크기, 단계별 타임아웃(연결/읽기/쓰기/풀 대기)은 환경 변수로 정하고, UPSTREAM_HTTP2=1이면 HTTP/2로 붙습니다. (requirements.txt의 httpx[http2])
+# - 재시도는 OpenAI SDK의 지수 백오프 + 지터(Retry-After 존중)를 OPENAI_MAX_RETRIES번까지 씁니다.
+#   Pinecone asyncio 클라이언트는 자체 JitterRetry가 있으므로, 대신 세션을 프로세스 동안 열어 둡니다. (open_vectorstore)
+# - 업스트림별 동시 요청 상한(upstream_gate): OpenAI는 전송 계층에서, 벡터 DB는 검색 함수에서 겁니다.
+# - OPENAI_BASE_URL로 로컬 목 서버(bench/mock_openai.py)를 가리키면 네트워크 없이 시험할 수 있습니다.
+# - UPSTREAM_SHARED_CLIENTS=0이면 예전처럼 라이브러리 기본 클라이언트를 씁니다. (비교·롤백용)
+UPSTREAM_SHARED_CLIENTS = os.getenv("UPSTREAM_SHARED_CLIENTS", "1") == "1"
+# HTTP/2는 bench/upstream.py --http2(TLS + ALPN 목 서버)로 확인한 뒤 켭니다. auto: h2가 설치돼 있으면 사용 / 1: 필수 / 0: 끔
+UPSTREAM_HTTP2 = os.getenv("UPSTREAM_HTTP2", "0")
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "100"))
+UPSTREAM_KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "30"))
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "5"))
+UPSTREAM_READ_TIMEOUT = float(os.getenv("UPSTREAM_READ_TIMEOUT", "60"))
+UPSTREAM_WRITE_TIMEOUT = float(os.getenv("UPSTREAM_WRITE_TIMEOUT", "10"))
+UPSTREAM_POOL_TIMEOUT = float(os.getenv("UPSTREAM_POOL_TIMEOUT", "10"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+PINECONE_POOL_SIZE = int(os.getenv("PINECONE_POOL_SIZE", "20"))
+UPSTREAM_CONCURRENCY = {
+    "openai": int(os.getenv("OPENAI_MAX_CONCURRENCY", "64")),
+    "vector": int(os.getenv("VECTOR_MAX_CONCURRENCY", "64")),
+}
+
+_lock = threading.Lock()
+_clients: Dict[str, object] = {}
+_gates: Dict[str, asyncio.Semaphore] = {}
+
+
+def http2_enabled() -> bool:
+    if UPSTREAM_HTTP2 == "0":
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        if UPSTREAM_HTTP2 == "1":
+            raise ImportError("UPSTREAM_HTTP2=1 이려면 h2 패키지가 필요합니다. (pip install 'httpx[http2]')") from None
+        return False
+    return True
+
+
+def upstream_timeout() -> "httpx.Timeout":
+    import httpx
+
+    return httpx.Timeout(
+        connect=UPSTREAM_CONNECT_TIMEOUT,
+        read=UPSTREAM_READ_TIMEOUT,
+        write=UPSTREAM_WRITE_TIMEOUT,
+        pool=UPSTREAM_POOL_TIMEOUT,
+    )
+
+
+def upstream_limits() -> "httpx.Limits":
+    import httpx
+
+    return httpx.Limits(
+        max_connections=UPSTREAM_MAX_CONNECTIONS,
+        max_keepalive_connections=UPSTREAM_MAX_KEEPALIVE,
+        keepalive_expiry=UPSTREAM_KEEPALIVE_EXPIRY,
+    )
+
+
+def upstream_gate(name: str) -> asyncio.Semaphore:
+    gate = _gates.get(name)
+    if gate is None:
+        gate = _gates[name] = asyncio.Semaphore(UPSTREAM_CONCURRENCY[name])
+    return gate
+
+
+def openai_async_client(role: str = "chat") -> "httpx.AsyncClient":
+    # httpx는 API 서버 import 경로에서 빼 두고 처음 만들 때 불러옵니다. (전송 계층 래퍼는 backend/upstream_transport.py)
+    import httpx
+
+    from backend.upstream_transport import LimitedTransport
+
+    key = f"openai_async:{role}"
+    with _lock:
+        if key not in _clients:
+            transport = httpx.AsyncHTTPTransport(http2=http2_enabled(), limits=upstream_limits())
+            _clients[key] = httpx.AsyncClient(
+                transport=LimitedTransport(transport, "openai"), timeout=upstream_timeout(), http2=http2_enabled()
+            )
+        return _clients[key]
+
+
+def openai_sync_client(role: str = "chat") -> "httpx.Client":
+    # 동기 경로(인제스트 스레드 풀, app.py)는 연결 수 상한이 곧 동시 요청 상한입니다.
+    import httpx
+
+    key = f"openai_sync:{role}"
+    with _lock:
+        if key not in _clients:
+            _clients[key] = httpx.Client(timeout=upstream_timeout(), limits=upstream_limits(), http2=http2_enabled())
+        return _clients[key]
+
+
+def openai_kwargs(role: str = "chat", **overrides) -> dict:
+    # base_url은 OpenAI SDK가 OPENAI_BASE_URL에서 직접 읽습니다.
+    kwargs = {"max_retries": OPENAI_MAX_RETRIES}
+    if UPSTREAM_SHARED_CLIENTS:
+        kwargs.update(http_client=openai_sync_client(role), http_async_client=openai_async_client(role), timeout=upstream_timeout())
+    kwargs.update(overrides)
+    return kwargs
+
+
+def chat_model(model: str, **kwargs):
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(model=model, **openai_kwargs("chat", **kwargs))
+
+
+def embedding_client(model: str, **kwargs):
+    from langchain_openai import OpenAIEmbeddings
+
+    if os.getenv("OPENAI_BASE_URL"):
+        # OpenAI 호환 서버(목 서버 등)는 토큰 배열 입력을 못 받는 경우가 많아 문자열 그대로 보냅니다.
+        kwargs.setdefault("check_embedding_ctx_length", False)
+    return OpenAIEmbeddings(model=model, **openai_kwargs("embeddings", **kwargs))
+
+
+def pinecone_index(index_name: Optional[str] = None):
+    # 인제스트 스레드 풀이 동시에 upsert하므로 urllib3 풀(기본: 4)을 넉넉히 잡고, 같은 인덱스 객체를 재사용합니다.
+    index_name = index_name or os.getenv("PINECONE_INDEX_NAME")
+    with _lock:
+        key = f"pinecone:{index_name}"
+        if key not in _clients:
+            from pinecone import Pinecone
+
+            _clients[key] = Pinecone(api_key=os.getenv("PINECONE_API_KEY")).Index(
+                index_name, connection_pool_maxsize=PINECONE_POOL_SIZE
+            )
+        return _clients[key]
+
+
+async def open_vectorstore(vectorstore):
+    # langchain-pinecone는 비동기 검색마다 aiohttp 세션을 새로 열고 닫습니다. (요청마다 TLS 핸드셰이크)
+    # 세션을 열어 둔 채로 두면 검색이 한 커넥션 풀을 계속 씁니다. (로컬 인덱스 등 해당 없는 저장소는 그대로)
+    if UPSTREAM_SHARED_CLIENTS and hasattr(vectorstore, "__aenter__"):
+        await vectorstore.__aenter__()
+
+
+async def close_vectorstore(vectorstore, delay: float = 0.0):
+    if hasattr(vectorstore, "aclose"):
+        await asyncio.sleep(delay)
+        await vectorstore.aclose()
+
+
+async def aclose(vectorstore: Optional[object] = None):
+    # 서버 종료 때(lifespan) 공용 클라이언트를 모두 닫습니다.
+    if vectorstore is not None:
+        await close_vectorstore(vectorstore)
+    with _lock:
+        keys = [key for key in _clients if key.startswith("openai_")]
+        opened = [_clients.pop(key) for key in keys]
+    for key, client in zip(keys, opened):
+        if key.startswith("openai_async"):
+            await client.aclose()
+        else:
+            client.close()
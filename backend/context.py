@@ -0,0 +1,128 @@
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from backend.hybrid import doc_key
+from backend.sparse_index import tokenize
+from backend.tokens import count_tokens
+
+# 🟢 답변 LLM에 넘기기 전 컨텍스트 조립 (토큰 예산)
+# 1) 중복 제거: 같은 청크, 청크끼리 겹치는 문장(청크 겹침·같은 페이지 반복)은 한 번만 넣습니다.
+# 2) 낮은 점수 제거: 벡터 유사도가 CONTEXT_MIN_SCORE 미만이거나 1등의 CONTEXT_SCORE_RATIO배 미만인 청크는 뺍니다.
+#    (BM25로만 들어온 청크는 벡터 점수가 없으므로 그대로 둡니다. 1등 청크는 항상 남깁니다.)
+# 3) 골라 담기: 조항 청크는 조항 통째로, 구조 없는 긴 청크는 질문과 단어가 겹치는 문장(+제목 줄)만 남깁니다.
+# 4) 예산: PROMPT_TOKEN_BUDGET을 대화 기록(최대 HISTORY_TOKEN_SHARE)과 컨텍스트가 나눠 씁니다.
+#    기록이 덜 쓴 만큼은 컨텍스트로 넘어가고, 넘치는 청크는 문장 단위로 자르거나 뺍니다.
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "3000"))
+HISTORY_TOKEN_SHARE = float(os.getenv("HISTORY_TOKEN_SHARE", "0.3"))
+CONTEXT_MIN_SCORE = float(os.getenv("CONTEXT_MIN_SCORE", "0.2"))
+CONTEXT_SCORE_RATIO = float(os.getenv("CONTEXT_SCORE_RATIO", "0.7"))
+SELECT_MIN_TOKENS = 120  # 이보다 짧은 청크는 문장을 고르지 않고 통째로 둡니다.
+DEDUPE_MIN_CHARS = 15  # 짧은 줄("제1장 총칙" 등)은 중복이어도 남깁니다.
+
+# PDF 본문은 문장 중간에서 줄이 바뀌므로 줄바꿈 하나로는 자르지 않습니다. (마침표, 빈 줄, 항 번호 기준)
+SENTENCE_RE = re.compile(r"(?<=[.?!])\s+|\n\s*\n+|(?=[①-⑳])")
+
+
+def _sentences(text: str) -> List[str]:
+    return [s for s in SENTENCE_RE.split(text) if s and s.strip()]
+
+
+def _normalize(sentence: str) -> str:
+    return re.sub(r"\s+", "", sentence)
+
+
+def trim_history(messages: list, budget: int) -> Tuple[list, int]:
+    # 최근 대화부터 (질문, 답변) 쌍 단위로 예산 안에서 담습니다.
+    kept, used = [], 0
+    pairs = [messages[i : i + 2] for i in range(0, len(messages), 2)]
+    for pair in reversed(pairs):
+        tokens = sum(count_tokens(m.content) for m in pair)
+        if used + tokens > budget:
+            break
+        kept = pair + kept
+        used += tokens
+    return kept, used
+
+
+def _select(body: str, terms: set, budget: Optional[int] = None) -> str:
+    # 질문과 단어가 겹치는 문장만 원래 순서대로 (첫 줄은 제목이라 남김). 예산이 있으면 많이 겹치는 문장부터 채웁니다.
+    sentences = _sentences(body)
+    scored = [(len(terms & set(tokenize(s))), i, s) for i, s in enumerate(sentences)]
+    chosen, used = set(), 0
+    for overlap, i, s in sorted(scored, key=lambda x: (x[1] != 0, -x[0], x[1])):
+        if i and not overlap:
+            break
+        tokens = count_tokens(s)
+        if budget is not None and used + tokens > budget:
+            continue
+        chosen.add(i)
+        used += tokens
+    if not chosen - {0}:
+        # 겹치는 문장이 없으면 단어로는 판단할 수 없는 청크(벡터 검색이 찾은 바꿔 말하기 등)이므로
+        # 예산이 남아 있으면 통째로 두고, 예산이 모자라면 제목만 남기지 않고 뺍니다.
+        return body if budget is None else ""
+    return "\n".join(sentences[i].strip() for i in sorted(chosen))
+
+
+def assemble_context(
+    question: str,
+    docs: List[Document],
+    scores: Optional[Dict[str, float]] = None,
+    budget: int = PROMPT_TOKEN_BUDGET,
+) -> Tuple[List[Document], dict]:
+    """검색 순위대로 들어온 청크를 중복 제거·점수 컷·문장 선택 후 budget 토큰 안으로 줄입니다."""
+    scores = scores or {}
+    stats = {"context_chunks_in": len(docs), "context_tokens_in": sum(count_tokens(d.page_content) for d in docs)}
+
+    dense = [scores[doc_key(d)] for d in docs if doc_key(d) in scores]
+    floor = CONTEXT_MIN_SCORE
+    if dense and max(dense) > 0:
+        floor = max(floor, max(dense) * CONTEXT_SCORE_RATIO)
+
+    terms = set(tokenize(question))
+    seen_chunks, seen_sentences = set(), set()
+    kept, used = [], 0
+    for rank, doc in enumerate(docs):
+        key = doc_key(doc)
+        if key in seen_chunks:
+            continue
+        seen_chunks.add(key)
+        if rank and key in scores and scores[key] < floor:
+            continue
+
+        # 앞 청크에 이미 나온 문장은 뺍니다. (청크 겹침, 같은 페이지가 두 번 검색된 경우)
+        fresh = []
+        for sentence in _sentences(doc.page_content):
+            norm = _normalize(sentence)
+            if len(norm) >= DEDUPE_MIN_CHARS and norm in seen_sentences:
+                continue
+            seen_sentences.add(norm)
+            fresh.append(sentence.strip())
+        if not fresh:
+            continue
+        body = "\n".join(fresh)
+        if not doc.metadata.get("article") and count_tokens(body) > SELECT_MIN_TOKENS:
+            body = _select(body, terms)
+
+        tokens = count_tokens(body)
+        if used + tokens > budget:
+            body = _select(body, terms, budget - used)
+            tokens = count_tokens(body)
+            if not body or used + tokens > budget:
+                continue
+        kept.append(Document(id=doc.id, page_content=body, metadata=doc.metadata))
+        used += tokens
+
+    stats.update(context_chunks_out=len(kept), context_tokens_out=used)
+    return kept, stats
+
+
+def assemble_prompt(question: str, docs: List[Document], chat_history: list, scores: Optional[Dict[str, float]] = None, budget: int = PROMPT_TOKEN_BUDGET):
+    # 대화 기록이 먼저 자기 몫(최대 HISTORY_TOKEN_SHARE)을 쓰고, 남은 예산을 컨텍스트가 씁니다.
+    history, history_tokens = trim_history(chat_history, int(budget * HISTORY_TOKEN_SHARE))
+    context, stats = assemble_context(question, docs, scores, budget - history_tokens)
+    stats.update(history_turns_in=len(chat_history) // 2, history_turns_out=len(history) // 2, history_tokens=history_tokens)
+    return context, history, stats
@@ -0,0 +1,195 @@
+import fcntl
+import json
+import os
+import time
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+# 🟢 코퍼스 버전 마커
+# 인제스트/업데이트 스크립트가 끝날 때마다 버전을 올리고, 서버는 이 값이 바뀌면
+# 예전 코퍼스로 만든 캐시(의미 기반 답변 캐시 등)를 버립니다.
+CORPUS_VERSION_FILE = os.getenv(
+    "CORPUS_VERSION_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "corpus_version"),
+)
+
+_cached = {"mtime": None, "version": "0"}
+
+
+def current_corpus_version() -> str:
+    # 매 요청마다 파일을 읽지 않도록 mtime이 바뀔 때만 다시 읽습니다.
+    try:
+        mtime = os.stat(CORPUS_VERSION_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return "0"
+    if mtime != _cached["mtime"]:
+        with open(CORPUS_VERSION_FILE, encoding="utf-8") as f:
+            _cached["version"] = f.read().strip() or "0"
+        _cached["mtime"] = mtime
+    return _cached["version"]
+
+
+def bump_corpus_version(reason: str = "") -> str:
+    version = f"{time.strftime('%Y%m%d%H%M%S')}-{os.getpid()}"
+    tmp_path = CORPUS_VERSION_FILE + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(tmp_path, CORPUS_VERSION_FILE)
+    print(f"🔖 코퍼스 버전 갱신: {version}" + (f" ({reason})" if reason else ""))
+    return version
+
+
+# 🟢 블루/그린 코퍼스 버전 (python -m backend.corpus build | activate | rollback | gc | status)
+# - 새 버전은 따로 빌드합니다. (Pinecone 네임스페이스 / Chroma 컬렉션 / 로컬 인덱스 폴더 + 그 버전의 BM25 인덱스·카탈로그)
+#   서빙 중인 버전은 건드리지 않으므로 빌드 도중이나 빌드가 실패해도 검색 결과가 비지 않습니다.
+# - 빌드가 끝나면 임베딩 모델·차원·청크 수를 검증하고 ready로 표시합니다. activate는 ready 버전만 받습니다.
+# - 서버는 레지스트리 파일의 mtime이 바뀌면 새 활성 버전을 백그라운드에서 올려 예열한 뒤 참조 하나만 바꿉니다. (재시작 없음)
+# - 레지스트리 파일 하나(쓰기는 파일 잠금 + 임시 파일 바꿔치기)가 서빙 포인터입니다.
+CORPUS_DIR = os.getenv("CORPUS_DIR", "./corpus")
+CORPUS_REGISTRY_PATH = os.getenv("CORPUS_REGISTRY_PATH", os.path.join(CORPUS_DIR, "registry.json"))
+CORPUS_KEEP_VERSIONS = int(os.getenv("CORPUS_KEEP_VERSIONS", "3"))
+
+
+def new_version_id() -> str:
+    return time.strftime("v%Y%m%d-%H%M%S")
+
+
+def version_dir(version: str) -> str:
+    return os.path.join(CORPUS_DIR, version)
+
+
+def _set_active(data: dict, version: str):
+    meta = data["versions"].get(version)
+    if meta is None or meta.get("status") != "ready":
+        raise ValueError(f"활성화할 수 없는 버전입니다: {version} ({meta.get('status') if meta else '없음'})")
+    data["active"] = version
+    meta["activated"] = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+
+
+class CorpusRegistry:
+    def __init__(self, path: str = CORPUS_REGISTRY_PATH):
+        self.path = path
+
+    def mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def read(self) -> dict:
+        if not os.path.exists(self.path):
+            return {"active": None, "history": [], "versions": {}}
+        with open(self.path, encoding="utf-8") as f:
+            return json.load(f)
+
+    @contextmanager
+    def _edit(self):
+        # 여러 프로세스(빌드·롤백·GC)가 동시에 고쳐도 잃어버리는 변경이 없도록 잠그고 읽은 뒤 통째로 바꿔 씁니다.
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                data = self.read()
+                yield data
+                tmp_path = self.path + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, self.path)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def active(self) -> Tuple[Optional[str], Optional[dict]]:
+        data = self.read()
+        version = data.get("active")
+        return version, data["versions"].get(version) if version else None
+
+    def register(self, version: str, meta: dict):
+        with self._edit() as data:
+            data["versions"][version] = {**meta, "status": "building", "created": time.strftime("%Y-%m-%dT%H:%M:%S%z")}
+
+    def update(self, version: str, **fields):
+        with self._edit() as data:
+            data["versions"][version].update(fields)
+
+    def activate(self, version: str):
+        with self._edit() as data:
+            if data.get("active") == version:
+                return
+            if data.get("active"):
+                data["history"].append(data["active"])
+            _set_active(data, version)
+        bump_corpus_version(f"activate {version}")
+
+    def rollback(self) -> str:
+        # 직전에 서빙하던 ready 버전으로 돌아갑니다. (GC로 지워진 버전은 건너뜀)
+        with self._edit() as data:
+            history = data["history"]
+            while history and data["versions"].get(history[-1], {}).get("status") != "ready":
+                history.pop()
+            if not history:
+                raise ValueError("되돌릴 이전 버전이 없습니다.")
+            previous = history.pop()
+            _set_active(data, previous)
+        bump_corpus_version(f"rollback {previous}")
+        return previous
+
+    def collectable(self, keep: int = CORPUS_KEEP_VERSIONS) -> List[str]:
+        # 활성 버전과 최근 ready 버전 keep개는 남기고, 실패한 빌드와 오래된 버전을 고릅니다. (빌드 중인 버전은 건드리지 않음)
+        data = self.read()
+        ready = sorted((v for v, m in data["versions"].items() if m.get("status") == "ready"), reverse=True)
+        kept = set(ready[:keep]) | {data.get("active")}
+        return [v for v, m in data["versions"].items() if v not in kept and m.get("status") in ("ready", "failed")]
+
+    def remove(self, version: str):
+        with self._edit() as data:
+            data["versions"].pop(version, None)
+            data["history"] = [v for v in data["history"] if v != version]
+
+
+def main():
+    import argparse
+    import shutil
+
+    parser = argparse.ArgumentParser(description="책첵 코퍼스 버전 관리 (블루/그린)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="./data의 PDF로 새 버전을 빌드하고 검증합니다.")
+    build.add_argument("--target", choices=["pinecone", "chroma", "local"], default="pinecone")
+    build.add_argument("--data", default="./data")
+    build.add_argument("--activate", action="store_true", help="검증을 통과하면 바로 서빙 버전으로 전환")
+    build.add_argument("--allow-model-change", action="store_true", help="활성 버전과 다른 임베딩 모델 허용 (서버 EMBEDDING_MODEL도 같이 바꿔야 함)")
+    activate = sub.add_parser("activate", help="ready 버전을 서빙 버전으로 전환")
+    activate.add_argument("version")
+    sub.add_parser("rollback", help="직전 서빙 버전으로 되돌리기")
+    gc = sub.add_parser("gc", help="오래된 버전과 실패한 빌드를 벡터 DB와 디스크에서 지우기")
+    gc.add_argument("--keep", type=int, default=CORPUS_KEEP_VERSIONS)
+    gc.add_argument("--dry-run", action="store_true")
+    sub.add_parser("status", help="버전 목록과 서빙 버전")
+    args = parser.parse_args()
+
+    registry = CorpusRegistry()
+    if args.command == "build":
+        from backend.ingestion import build_version
+
+        build_version(args.target, data_folder=args.data, activate=args.activate, allow_model_change=args.allow_model_change)
+    elif args.command == "activate":
+        registry.activate(args.version)
+        print(f"🔀 서빙 버전 전환: {args.version}")
+    elif args.command == "rollback":
+        print(f"⏪ 서빙 버전 되돌림: {registry.rollback()}")
+    elif args.command == "gc":
+        from backend.ingestion import make_sink
+
+        for version in registry.collectable(args.keep):
+            meta = registry.read()["versions"][version]
+            print(f"🗑️ {version} ({meta.get('target')}, {meta.get('status')})" + (" [dry-run]" if args.dry_run else ""))
+            if args.dry_run:
+                continue
+            make_sink(meta["target"], version).drop()
+            shutil.rmtree(version_dir(version), ignore_errors=True)
+            registry.remove(version)
+    else:
+        print(json.dumps(registry.read(), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
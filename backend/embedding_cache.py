@@ -0,0 +1,218 @@
+import asyncio
+import fcntl
+import hashlib
+import json
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# 🟢 내용 주소 기반 임베딩 캐시 (인제스트 · 파일 업데이트 · 질의 경로 공용)
+# - 키: (임베딩 모델명, 정규화한 텍스트의 sha256)
+# - 디스크: 모델별 폴더에 float32 벡터를 이어 붙인 vectors.f32 (np.memmap으로 읽음) + 같은 순서의 keys.txt
+#   → 추가만 하는 구조라 여러 프로세스가 같이 써도 파일 잠금만으로 안전합니다. 다른 프로세스가 추가한 키는 keys.txt의 늘어난 끝부분만 읽습니다.
+# - 디스크에는 문서(청크) 임베딩만 둡니다. 질문 임베딩은 메모리 LRU에만 둡니다.
+#   (사용자 질문마다 디스크에 쓰면 요청 경로에 파일 잠금·쓰기가 끼고, 질문이 끝없이 쌓입니다)
+#   벤치 녹화처럼 질문도 남겨야 하면 persist_queries=True로 만들고, 그때 쓰기는 스레드에서 합니다.
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "./.embedding_cache")
+
+
+def normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    def __init__(self, model: str, directory: str = EMBEDDING_CACHE_DIR):
+        self.directory = os.path.join(directory, re.sub(r"[^A-Za-z0-9_.-]", "_", model))
+        os.makedirs(self.directory, exist_ok=True)
+        self._vectors_path = os.path.join(self.directory, "vectors.f32")
+        self._keys_path = os.path.join(self.directory, "keys.txt")
+        self._meta_path = os.path.join(self.directory, "meta.json")
+        self._lock_path = os.path.join(self.directory, ".lock")
+        self._thread_lock = threading.Lock()
+        self.dim = None
+        self._rows = {}
+        self._count = 0  # 읽은 키 줄 수 = 벡터 줄 수
+        self._keys_size = 0  # keys.txt에서 읽은 바이트 수 (완결된 줄까지)
+        self._mm = None
+        self._refresh()
+
+    def __len__(self):
+        return self._count
+
+    def _refresh(self):
+        # 다른 프로세스가 추가한 항목이 있을 때만, keys.txt에서 지난번 이후에 붙은 줄만 읽고 memmap을 다시 엽니다.
+        if not os.path.exists(self._keys_path) or not os.path.exists(self._meta_path):
+            return
+        keys_size = os.path.getsize(self._keys_path)
+        if keys_size == self._keys_size:
+            return
+        if keys_size < self._keys_size:
+            # 캐시 폴더를 지우고 다시 만든 경우: 처음부터 읽습니다.
+            self._rows, self._count, self._keys_size, self.dim = {}, 0, 0, None
+        if self.dim is None:
+            with open(self._meta_path, encoding="utf-8") as f:
+                self.dim = json.load(f)["dim"]
+        with open(self._keys_path, "rb") as f:
+            f.seek(self._keys_size)
+            tail = f.read(keys_size - self._keys_size)
+        # 쓰는 중인 마지막 줄(줄바꿈 전)은 다음에 읽습니다.
+        complete = tail[: tail.rfind(b"\n") + 1]
+        keys = complete.decode("utf-8").split()
+        # 벡터를 먼저 쓰고 키를 쓰므로, 벡터 줄이 모자라면(쓰기 도중) 다음번에 다시 읽습니다.
+        if self._count + len(keys) > os.path.getsize(self._vectors_path) // (self.dim * 4):
+            return
+        for key in keys:
+            self._rows[key] = self._count
+            self._count += 1
+        n = self._count
+        self._mm = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(n, self.dim)) if n else None
+        self._keys_size += len(complete)
+
+    def get_many(self, keys):
+        with self._thread_lock:
+            if any(k not in self._rows for k in keys):
+                self._refresh()
+            return {k: np.array(self._mm[self._rows[k]]) for k in keys if k in self._rows}
+
+    def put_many(self, items):
+        # items: {key: vector}
+        if not items:
+            return
+        with self._thread_lock, open(self._lock_path, "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                items = {k: v for k, v in items.items() if k not in self._rows}
+                if not items:
+                    return
+                matrix = np.asarray(list(items.values()), dtype=np.float32)
+                if self.dim is None:
+                    self.dim = matrix.shape[1]
+                    with open(self._meta_path, "w", encoding="utf-8") as f:
+                        json.dump({"dim": self.dim}, f)
+                if matrix.shape[1] != self.dim:
+                    raise ValueError(f"임베딩 차원 불일치: 캐시 {self.dim}, 입력 {matrix.shape[1]}")
+
+                # 이전에 중간에 끊긴 쓰기가 있었다면 키와 줄 수를 맞춘 뒤 이어 씁니다.
+                with open(self._vectors_path, "ab") as f:
+                    f.truncate(self._count * self.dim * 4)
+                    f.write(matrix.tobytes())
+                with open(self._keys_path, "a", encoding="utf-8") as f:
+                    f.truncate(self._keys_size)
+                    f.write("".join(f"{k}\n" for k in items))
+                self._refresh()
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+class CachedEmbeddings(Embeddings):
+    def __init__(self, underlying: Embeddings, model: str, directory: str = EMBEDDING_CACHE_DIR, lru_size: int = 2048, persist_queries: bool = False):
+        self.underlying = underlying
+        self.model = model
+        self.store = EmbeddingStore(model, directory)
+        self.lru_size = lru_size
+        self.persist_queries = persist_queries
+        self._lru = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _lru_get(self, key):
+        vector = self._lru.get(key)
+        if vector is not None:
+            self._lru.move_to_end(key)
+        return vector
+
+    def _lru_put(self, key, vector):
+        self._lru[key] = vector
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def _lookup(self, texts):
+        keys = [text_key(t) for t in texts]
+        found = self.store.get_many(list(set(keys)))
+        missing = [i for i, k in enumerate(keys) if k not in found]
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        return keys, found, missing
+
+    def _merge(self, texts, keys, found, missing, computed):
+        new = {keys[i]: vector for i, vector in zip(missing, computed)}
+        self.store.put_many(new)
+        found.update({k: np.asarray(v, dtype=np.float32) for k, v in new.items()})
+        return [found[k].tolist() for k in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found, missing = self._lookup(texts)
+        computed = self.underlying.embed_documents([texts[i] for i in missing]) if missing else []
+        return self._merge(texts, keys, found, missing, computed)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        # 파일 잠금·읽기·쓰기는 이벤트 루프를 막지 않도록 스레드에서 합니다.
+        keys, found, missing = await asyncio.to_thread(self._lookup, texts)
+        computed = await self.underlying.aembed_documents([texts[i] for i in missing]) if missing else []
+        return await asyncio.to_thread(self._merge, texts, keys, found, missing, computed)
+
+    def _stored_queries(self, keys):
+        # 질문을 디스크에도 남기는 경우(persist_queries)만 씁니다.
+        return {k: v.tolist() for k, v in self.store.get_many(keys).items()}
+
+    def _cached_queries(self, keys, stored=None):
+        vectors = [self._lru_get(k) for k in keys]
+        for i, key in enumerate(keys):
+            if vectors[i] is None and stored and key in stored:
+                vectors[i] = stored[key]
+                self._lru_put(key, vectors[i])
+        self.hits += sum(1 for v in vectors if v is not None)
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        key = text_key(text)
+        stored = self._stored_queries([key]) if self.persist_queries and self._lru_get(key) is None else None
+        vector = self._cached_queries([key], stored)[0]
+        if vector is None:
+            self.misses += 1
+            vector = self.underlying.embed_query(text)
+            self._lru_put(key, vector)
+            if self.persist_queries:
+                self.store.put_many({key: vector})
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_queries([text]))[0]
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        # 질문 임베딩: 메모리 LRU에 없는 질문만 모아 임베딩 요청 한 번으로 보냅니다. (배치 질의도 같은 캐시)
+        keys = [text_key(t) for t in texts]
+        stored = None
+        if self.persist_queries and any(k not in self._lru for k in keys):
+            stored = await asyncio.to_thread(self._stored_queries, list(set(keys)))
+        vectors = self._cached_queries(keys, stored)
+        missing = {}
+        for i, vector in enumerate(vectors):
+            if vector is None:
+                missing.setdefault(keys[i], []).append(i)
+        if not missing:
+            return vectors
+        self.misses += len(missing)
+        if len(missing) == 1:
+            computed = [await self.underlying.aembed_query(texts[next(iter(missing.values()))[0]])]
+        else:
+            computed = await self.underlying.aembed_documents([texts[ids[0]] for ids in missing.values()])
+        for (key, ids), vector in zip(missing.items(), computed):
+            self._lru_put(key, vector)
+            for i in ids:
+                vectors[i] = vector
+        if self.persist_queries:
+            await asyncio.to_thread(self.store.put_many, dict(zip(missing, computed)))
+        return vectors
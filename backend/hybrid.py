@@ -0,0 +1,40 @@
+import hashlib
+import os
+from typing import List, Optional
+
+from langchain_core.documents import Document
+
+from backend.sparse_index import SparseIndex
+
+# 🟢 하이브리드 검색: 밀집 벡터 결과 + BM25 결과를 Reciprocal Rank Fusion으로 합칩니다.
+# - 예전 MultiQueryRetriever(질문을 LLM으로 3개로 늘려 검색)를 대신합니다. → 질의당 LLM 호출 1회와 그 토큰이 빠집니다.
+# - 양쪽에서 candidates개씩 뽑아 순위만으로 합치므로 점수 척도를 맞출 필요가 없습니다.
+# - LangChain 검색기 래퍼(HybridRetriever, app.py용)는 backend/hybrid_retriever.py에 있습니다.
+#   (BaseRetriever import가 무거워 API 서버 시작 경로에서 빼 둠)
+RRF_K = 60
+
+
+def doc_key(doc: Document) -> str:
+    # 벡터 DB마다 ID 체계가 다를 수 있어(예전 업로드는 무작위 UUID) 파일·페이지·본문으로 같은 청크를 알아봅니다.
+    source = os.path.basename(doc.metadata.get("source", ""))
+    page = int(doc.metadata.get("page", 0))
+    digest = hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()[:16]
+    return f"{source}:{page}:{digest}"
+
+
+def reciprocal_rank_fusion(rankings: List[List[Document]], k: int = RRF_K, limit: Optional[int] = None) -> List[Document]:
+    scores, first_seen = {}, {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            key = doc_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+            first_seen.setdefault(key, doc)
+    ordered = sorted(scores, key=lambda key: -scores[key])
+    return [first_seen[key] for key in ordered[:limit]]
+
+
+def fuse(query: str, dense: List[Document], sparse: Optional[SparseIndex], k: int, candidates: int, filter: Optional[dict] = None) -> List[Document]:
+    # filter는 밀집 검색에 건 것과 같은 메타데이터 필터입니다. (BM25 쪽도 같은 범위에서만 뽑도록)
+    if sparse is None:
+        return dense[:k]
+    return reciprocal_rank_fusion([dense, sparse.search(query, k=candidates, filter=filter)], limit=k)
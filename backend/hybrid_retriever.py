@@ -0,0 +1,41 @@
+from typing import List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
+
+from backend.hybrid import fuse
+from backend.rerank import RerankStage
+from backend.sparse_index import SparseIndex
+
+
+class HybridRetriever(BaseRetriever):
+    """벡터 검색기 + BM25 희소 인덱스 (app.py용). 희소 인덱스가 없으면 벡터 검색만 합니다.
+
+    rerank가 있으면 후보를 candidates개까지 합친 뒤 다시 정렬해 k개 이하로 고릅니다. (backend/rerank.py)
+    """
+
+    vectorstore: VectorStore
+    sparse: Optional[SparseIndex] = None
+    k: int = 3
+    candidates: int = 20
+    rerank: Optional[RerankStage] = None
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    @property
+    def _fetch(self) -> int:
+        return self.candidates if self.sparse or self.rerank else self.k
+
+    def _select(self, query: str, dense: List[Document]) -> List[Document]:
+        fused = fuse(query, dense, self.sparse, self.candidates if self.rerank else self.k, self.candidates)
+        return self.rerank.select(query, fused, self.k).docs if self.rerank else fused
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        dense = self.vectorstore.similarity_search(query, k=self._fetch)
+        return self._select(query, dense)
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun) -> List[Document]:
+        dense = await self.vectorstore.asimilarity_search(query, k=self._fetch)
+        return self._select(query, dense)
@@ -0,0 +1,476 @@
+import hashlib
+import json
+import os
+import random
+import shutil
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import openai
+from langchain_core.documents import Document
+
+from backend import clients
+from backend.catalog import display_title, source_fields, update_catalog
+from backend.chunker import chunk_regulation
+from backend.corpus import CorpusRegistry, bump_corpus_version, new_version_id, version_dir
+from backend.embedding_cache import CachedEmbeddings
+from backend.regulations import league_of
+from backend.sparse_index import update_sparse_index
+
+# 🟢 공용 인제스트 파이프라인 (ingest.py / ingest_pinecone.py / update_file.py가 같이 씀)
+# 1. PDF 파싱은 프로세스 풀에서 파일별로 병렬 처리, 청크는 조항 단위 (backend/chunker.py)
+# 2. 청크마다 (파일, 페이지, 본문) 해시로 결정적 ID를 만들어, 다시 돌려도 같은 ID로 upsert (멱등)
+# 3. 로컬 매니페스트에 이미 올라간 청크 ID를 기록해, 안 바뀐 청크는 임베딩·업로드를 건너뜀
+# 4. 임베딩 배치는 스레드 풀에서 동시에 보내고, 429가 오면 동시성을 줄이고 지수 백오프로 재시도
+#    (고정 time.sleep 대신)
+# 5. 파싱한 청크로 BM25 희소 인덱스(./sparse_index)도 같이 갱신 (하이브리드 검색용)
+# 6. 규정집 카탈로그(제목·리그·연도·쪽수·파일 해시)를 빌드 산출물로 갱신 (backend/catalog.py, API가 한 번 읽음)
+# 7. build_version: 서빙 중인 인덱스는 건드리지 않고 새 코퍼스 버전(네임스페이스·컬렉션·폴더)에 통째로 빌드 → 검증 → 전환
+#    (backend/corpus.py, python -m backend.corpus build)
+
+DATA_FOLDER = "./data"
+DB_PATH = "./db_chroma"
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-large")
+BATCH_SIZE = 100
+MAX_CONCURRENCY = int(os.getenv("INGEST_MAX_CONCURRENCY", "4"))
+MANIFEST_PATH = "./.ingest_manifest_{target}.json"
+# 청크 메타데이터 구성이 바뀌면 올립니다. 본문이 같아 ID가 안 바뀌어도 예전 버전으로 올라간 파일은 다시 upsert 합니다.
+# (임베딩은 디스크 캐시에서 나오므로 API 비용은 들지 않습니다.)
+CHUNK_METADATA_VERSION = 3
+
+
+# --- 1. PDF 파싱 (프로세스 풀) ---
+
+def _load_pdf(file_path):
+    # 자식 프로세스에서 실행되므로 무거운 import는 여기서 합니다.
+    from langchain_community.document_loaders import PyPDFLoader
+
+    return PyPDFLoader(file_path).load()
+
+
+def split_documents(filename, pages):
+    # 조항(장/절/조/항) 구조를 따라 자르고, 조항 번호·장·문서 제목을 메타데이터로 붙입니다. (backend/chunker.py)
+    chunks = chunk_regulation(pages, title=display_title(filename))
+    # 라우터가 고른 리그·규정집으로 검색 범위를 좁힐 수 있도록 파일명과 리그도 붙입니다. (football_kleague_* / baseball_kbo_*)
+    # 출처 카드에 쓰는 문서 ID·쪽 번호·미리보기·조항 표기도 여기서 한 번 만들어 둡니다.
+    league = league_of(filename)
+    for doc in chunks:
+        doc.metadata["file"] = filename
+        if league:
+            doc.metadata["league"] = league
+        doc.metadata.update(source_fields(filename, doc.metadata, doc.page_content))
+    return chunks
+
+
+def iter_parsed_files(file_paths, workers=None):
+    # 다 끝날 때까지 기다리지 않고, 파싱이 끝난 파일부터 바로 흘려보냅니다.
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_load_pdf, path): path for path in file_paths}
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield futures[future], future.result()
+
+
+# --- 2. 결정적 청크 ID ---
+
+def chunk_id(doc: Document, seen: dict) -> str:
+    source = os.path.basename(doc.metadata.get("source", "unknown"))
+    page = int(doc.metadata.get("page", 0))
+    digest = hashlib.sha256(f"{source}\x00{page}\x00{doc.page_content}".encode("utf-8")).hexdigest()[:24]
+    # 같은 페이지에 똑같은 본문이 두 번 나오는 경우(머리말 등)만 순번으로 구분합니다.
+    n = seen.get(digest, 0)
+    seen[digest] = n + 1
+    return f"{source}:{digest}" + (f":{n}" if n else "")
+
+
+# --- 3. 매니페스트 ---
+
+class Manifest:
+    def __init__(self, target, path=None):
+        self.path = path or MANIFEST_PATH.format(target=target)
+        self.chunks = {}  # chunk_id -> source 파일명
+        self.versions = {}  # source 파일명 -> 올릴 때의 CHUNK_METADATA_VERSION
+        self.embedding_model = None  # 벡터를 만든 임베딩 모델 (로컬 인덱스로 내보낼 때 씀)
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.chunks = data["chunks"]
+            self.versions = data.get("versions", {})
+            self.embedding_model = data.get("embedding_model")
+        self._lock = threading.Lock()
+
+    def is_current(self, cid, source):
+        return cid in self.chunks and self.versions.get(source) == CHUNK_METADATA_VERSION
+
+    def mark_current(self, sources):
+        with self._lock:
+            for source in sources:
+                self.versions[source] = CHUNK_METADATA_VERSION
+
+    def ids_for(self, sources):
+        return {cid for cid, source in self.chunks.items() if source in sources}
+
+    def add(self, ids, source_of):
+        with self._lock:
+            for cid in ids:
+                self.chunks[cid] = source_of[cid]
+
+    def remove(self, ids):
+        with self._lock:
+            for cid in ids:
+                self.chunks.pop(cid, None)
+
+    def save(self):
+        with self._lock:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"chunks": self.chunks, "versions": self.versions, "embedding_model": self.embedding_model}, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+
+
+# --- 4. 벡터 DB 싱크 ---
+
+class ChromaSink:
+    def __init__(self, path=DB_PATH, collection_name="langchain"):
+        import chromadb
+
+        self._client = chromadb.PersistentClient(path=path)
+        self._name = collection_name
+        self._collection = self._client.get_or_create_collection(collection_name)
+
+    def upsert(self, ids, vectors, docs):
+        self._collection.upsert(
+            ids=ids,
+            embeddings=vectors,
+            documents=[d.page_content for d in docs],
+            metadatas=[d.metadata for d in docs],
+        )
+
+    def delete(self, ids):
+        if ids:
+            self._collection.delete(ids=list(ids))
+
+    def reset(self):
+        self._client.delete_collection(self._name)
+        self._collection = self._client.get_or_create_collection(self._name)
+
+    def count(self):
+        return self._collection.count()
+
+    def drop(self):
+        self._client.delete_collection(self._name)
+
+
+class PineconeSink:
+    def __init__(self, index_name=None, namespace=None):
+        self._index = clients.pinecone_index(index_name)
+        self.namespace = namespace
+
+    def upsert(self, ids, vectors, docs):
+        # PineconeVectorStore가 본문을 metadata["text"]에서 읽으므로 같이 저장합니다.
+        self._index.upsert(
+            vectors=[
+                (cid, vector, {**doc.metadata, "text": doc.page_content})
+                for cid, vector, doc in zip(ids, vectors, docs)
+            ],
+            namespace=self.namespace,
+            show_progress=False,
+        )
+
+    def delete(self, ids):
+        ids = list(ids)
+        for i in range(0, len(ids), 1000):
+            self._index.delete(ids=ids[i : i + 1000], namespace=self.namespace)
+
+    def reset(self):
+        self._index.delete(delete_all=True, namespace=self.namespace)
+
+    def count(self):
+        namespaces = self._index.describe_index_stats().namespaces
+        summary = namespaces.get(self.namespace or "")
+        return summary.vector_count if summary else 0
+
+    def drop(self):
+        self.reset()
+
+
+class LocalSink:
+    # 로컬 인덱스(backend/local_index.py)는 한 번에 쓰는 파일이라, 모아 두었다가 finish에서 폴더째 씁니다.
+    def __init__(self, directory):
+        self.directory = directory
+        self._rows = {}
+        self._lock = threading.Lock()
+
+    def upsert(self, ids, vectors, docs):
+        with self._lock:
+            for cid, vector, doc in zip(ids, vectors, docs):
+                self._rows[cid] = (vector, Document(id=cid, page_content=doc.page_content, metadata=doc.metadata))
+
+    def delete(self, ids):
+        with self._lock:
+            for cid in ids:
+                self._rows.pop(cid, None)
+
+    def reset(self):
+        self._rows = {}
+
+    def count(self):
+        return len(self._rows)
+
+    def finish(self, model):
+        from backend.local_index import write_index
+
+        ids = sorted(self._rows)
+        write_index(self.directory, [self._rows[i][0] for i in ids], [self._rows[i][1] for i in ids], model, "ingest")
+
+    def drop(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+# --- 5. 적응형 동시성 제한 (AIMD) ---
+
+class AdaptiveGate:
+    # 성공하면 동시성을 1씩 늘리고, 429를 받으면 절반으로 줄입니다.
+    def __init__(self, max_concurrency):
+        self.max_concurrency = max_concurrency
+        self.limit = max_concurrency
+        self._active = 0
+        self._cond = threading.Condition()
+
+    def __enter__(self):
+        with self._cond:
+            while self._active >= self.limit:
+                self._cond.wait()
+            self._active += 1
+
+    def __exit__(self, *exc):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    def on_success(self):
+        with self._cond:
+            self.limit = min(self.max_concurrency, self.limit + 1)
+            self._cond.notify_all()
+
+    def on_rate_limited(self):
+        with self._cond:
+            self.limit = max(1, self.limit // 2)
+
+
+def _is_rate_limited(error):
+    return isinstance(error, openai.RateLimitError) or getattr(error, "status_code", None) == 429
+
+
+def embed_with_retry(embeddings, texts, gate, max_attempts=8):
+    for attempt in range(max_attempts):
+        try:
+            with gate:
+                vectors = embeddings.embed_documents(texts)
+            gate.on_success()
+            return vectors
+        except Exception as e:
+            if not _is_rate_limited(e) or attempt == max_attempts - 1:
+                raise
+            gate.on_rate_limited()
+            delay = min(60, 2 ** attempt) * (0.5 + random.random())
+            print(f"⏳ 429 Rate limit → 동시성 {gate.limit}로 낮추고 {delay:.1f}초 후 재시도")
+            time.sleep(delay)
+
+
+# --- 6. 전체 흐름 ---
+
+def make_embeddings():
+    # 재시도는 embed_with_retry가 직접 하므로 클라이언트 자체 재시도는 끕니다. (커넥션 풀·타임아웃은 API 서버와 같은 설정)
+    # 디스크 임베딩 캐시를 거치므로 --rebuild나 다른 타깃(chroma ↔ pinecone)으로 올릴 때도 같은 본문은 다시 과금되지 않습니다.
+    return CachedEmbeddings(clients.embedding_client(EMBEDDING_MODEL, max_retries=0), model=EMBEDDING_MODEL)
+
+
+def make_sink(target, version=None):
+    # version이 있으면 그 버전 전용 위치에 씁니다. (Pinecone 네임스페이스 / Chroma 컬렉션 / 로컬 인덱스 폴더)
+    if target == "pinecone":
+        return PineconeSink(namespace=version)
+    if target == "local":
+        if not version:
+            raise ValueError("local 타깃은 코퍼스 버전으로만 빌드합니다. (python -m backend.corpus build --target local)")
+        return LocalSink(os.path.join(version_dir(version), "local_index"))
+    return ChromaSink(collection_name=f"langchain_{version}" if version else "langchain")
+
+
+def run_ingestion(target="chroma", files=None, data_folder=DATA_FOLDER, rebuild=False, sink=None, embeddings=None, version=None):
+    # version을 주면 corpus/<version>/ 아래에 매니페스트·BM25 인덱스·카탈로그를 따로 두고, 코퍼스 버전은 올리지 않습니다. (전환은 activate가 함)
+    if not os.path.exists(data_folder):
+        print(f"❌ '{data_folder}' 폴더가 없습니다!")
+        return
+
+    all_files = sorted(f for f in os.listdir(data_folder) if f.endswith(".pdf"))
+    targets = files or all_files
+    missing = [f for f in targets if f not in all_files]
+    if missing:
+        print(f"❌ 오류: {missing} 파일이 실제 폴더에 없습니다!")
+        return
+    if not targets:
+        print(f"❌ '{data_folder}' 폴더에 PDF 파일이 없습니다!")
+        return
+
+    sink = sink or make_sink(target, version)
+    embeddings = embeddings or make_embeddings()
+    directory = version_dir(version) if version else None
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    manifest = Manifest(target, os.path.join(directory, "manifest.json") if directory else None)
+    if rebuild:
+        print("🧹 기존 벡터와 매니페스트를 비우고 처음부터 다시 만듭니다.")
+        sink.reset()
+        manifest.chunks = {}
+        manifest.versions = {}
+    # 청크 ID·is_current는 본문만 보므로, 다른 모델로 만든 매니페스트에 이어 올리면 안 바뀐 청크는 옛 모델 벡터로 남습니다.
+    # 그래서 모델 기록은 매니페스트가 빈 상태(처음·--rebuild)에서 시작할 때만 적고, 기록과 모델이 다르면 멈춥니다.
+    model = getattr(embeddings, "model", None) or EMBEDDING_MODEL
+    if not manifest.chunks:
+        manifest.embedding_model = model
+    elif manifest.embedding_model is None:
+        print("⚠️ 매니페스트에 임베딩 모델 기록이 없습니다. (기록 전에 올린 벡터) 한 번 --rebuild로 돌리면 모델이 기록됩니다.")
+    elif manifest.embedding_model != model:
+        print(
+            f"❌ 이 벡터는 {manifest.embedding_model}로 만들었는데 지금 임베딩 모델은 {model}입니다. "
+            "안 바뀐 청크가 옛 모델 벡터로 남으므로, 모델을 바꾸려면 --rebuild로 처음부터 다시 만드세요."
+        )
+        return
+
+    print(f"📂 처리할 규정집: {targets}")
+    gate = AdaptiveGate(MAX_CONCURRENCY)
+    stats = {"chunks": 0, "skipped": 0, "embedded": 0, "deleted": 0, "dim": None}
+    current_ids = set()
+    source_of = {}
+    parsed_chunks = {}
+    page_counts = {}
+    dim_lock = threading.Lock()
+
+    def process_batch(ids, docs):
+        vectors = embed_with_retry(embeddings, [d.page_content for d in docs], gate)
+        # 차원이 섞인 벡터가 한 인덱스에 들어가면 검색이 조용히 틀어지므로 바로 멈춥니다.
+        with dim_lock:
+            dims = {len(v) for v in vectors} | ({stats["dim"]} if stats["dim"] else set())
+            if len(dims) != 1:
+                raise ValueError(f"임베딩 차원이 섞였습니다: {sorted(dims)} ({EMBEDDING_MODEL})")
+            stats["dim"] = dims.pop()
+        sink.upsert(ids, vectors, docs)
+        manifest.add(ids, source_of)
+        manifest.save()
+        return len(ids)
+
+    started = time.time()
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as pool:
+        futures = []
+        pending_ids, pending_docs = [], []
+
+        for path, pages in iter_parsed_files([os.path.join(data_folder, f) for f in targets]):
+            filename = os.path.basename(path)
+            chunks = split_documents(filename, pages)
+            page_counts[filename] = len(pages)
+            print(f"🚀 파싱 완료: {filename} ({len(pages)}페이지 → {len(chunks)}개 조각)")
+
+            seen = {}
+            for doc in chunks:
+                cid = chunk_id(doc, seen)
+                current_ids.add(cid)
+                source_of[cid] = filename
+                parsed_chunks[cid] = doc
+                stats["chunks"] += 1
+                if manifest.is_current(cid, filename):
+                    stats["skipped"] += 1
+                    continue
+                pending_ids.append(cid)
+                pending_docs.append(doc)
+                if len(pending_ids) >= BATCH_SIZE:
+                    futures.append(pool.submit(process_batch, pending_ids, pending_docs))
+                    pending_ids, pending_docs = [], []
+
+        if pending_ids:
+            futures.append(pool.submit(process_batch, pending_ids, pending_docs))
+        for i, future in enumerate(futures, 1):
+            stats["embedded"] += future.result()
+            print(f"📦 배치 저장 완료 ({i}/{len(futures)})")
+
+    # 파일에서 사라진 청크(수정·삭제된 부분)는 벡터 DB에서도 지웁니다.
+    scope = set(targets) if files else set(manifest.chunks.values())
+    stale = manifest.ids_for(scope) - current_ids
+    sink.delete(stale)
+    manifest.remove(stale)
+    manifest.mark_current(targets)
+    manifest.save()
+    stats["deleted"] = len(stale)
+
+    if hasattr(sink, "finish"):
+        sink.finish(EMBEDDING_MODEL)
+
+    # 희소 인덱스는 임베딩 여부와 상관없이 이번에 파싱한 본문으로 다시 씁니다. (임베딩 API 호출 없음)
+    sparse_kwargs = {"directory": os.path.join(directory, "sparse_index")} if directory else {}
+    sparse = update_sparse_index(parsed_chunks, set(targets) if files else None, **sparse_kwargs)
+    print(f"🔎 BM25 희소 인덱스 갱신: {len(sparse)}개 조각")
+    catalog_kwargs = {"path": os.path.join(directory, "regulation_catalog.json")} if directory else {}
+    catalog = update_catalog(page_counts, data_folder, **catalog_kwargs)
+    print(f"📚 규정집 카탈로그 갱신: {len(catalog['documents'])}개 문서")
+
+    print(
+        f"🎉 완료! 조각 {stats['chunks']}개 중 새로 임베딩 {stats['embedded']}개, "
+        f"변경 없음 {stats['skipped']}개, 삭제 {stats['deleted']}개 ({time.time() - started:.1f}초)"
+    )
+    if not version and (stats["embedded"] or stats["deleted"]):
+        # 서버의 의미 기반 답변 캐시가 예전 코퍼스 답변을 버리도록 버전을 올립니다.
+        bump_corpus_version(f"{target} {', '.join(files) if files else 'all'}")
+    return stats
+
+
+# --- 7. 블루/그린 버전 빌드 ---
+
+def build_version(target="pinecone", data_folder=DATA_FOLDER, activate=False, allow_model_change=False, sink=None, embeddings=None):
+    # 새 버전 위치에 전체 코퍼스를 올립니다. 안 바뀐 본문은 임베딩 디스크 캐시에서 나오므로 API 비용은 바뀐 부분만 듭니다.
+    registry = CorpusRegistry()
+    active, active_meta = registry.active()
+    if active_meta and active_meta["embedding_model"] != EMBEDDING_MODEL and not allow_model_change:
+        raise ValueError(
+            f"활성 버전 {active}은 {active_meta['embedding_model']}로 만들었는데 지금 EMBEDDING_MODEL은 {EMBEDDING_MODEL}입니다. "
+            "모델을 바꾸려면 --allow-model-change를 주고 서버의 EMBEDDING_MODEL도 같이 바꾸세요."
+        )
+
+    version = new_version_id()
+    sink = sink or make_sink(target, version)
+    registry.register(version, {"target": target, "embedding_model": EMBEDDING_MODEL, "data_folder": data_folder})
+    print(f"🏗️ 코퍼스 버전 빌드 시작: {version} ({target}, {EMBEDDING_MODEL})")
+    try:
+        stats = run_ingestion(target, data_folder=data_folder, sink=sink, embeddings=embeddings, version=version)
+        if not stats:
+            raise ValueError("인제스트가 중단됐습니다.")
+        _validate_version(stats, sink, active_meta)
+    except Exception as e:
+        registry.update(version, status="failed", error=str(e))
+        print(f"❌ 코퍼스 버전 {version} 빌드 실패: {e}")
+        raise
+
+    registry.update(version, status="ready", dim=stats["dim"], chunks=stats["chunks"])
+    print(f"✅ 코퍼스 버전 {version} 준비 완료: 조각 {stats['chunks']}개, {stats['dim']}차원")
+    if activate:
+        registry.activate(version)
+        print(f"🔀 서빙 버전 전환: {active or '(없음)'} → {version}")
+    return version
+
+
+def _validate_version(stats, sink, active_meta, wait=30):
+    if not stats["chunks"]:
+        raise ValueError("청크가 하나도 없습니다.")
+    if active_meta and active_meta["embedding_model"] == EMBEDDING_MODEL and stats["dim"] != active_meta.get("dim"):
+        raise ValueError(f"같은 모델({EMBEDDING_MODEL})인데 차원이 다릅니다: {stats['dim']} (활성 버전 {active_meta.get('dim')})")
+    # Pinecone은 upsert 직후 통계가 늦게 반영되므로 잠깐 기다리며 청크 수를 맞춰 봅니다.
+    deadline = time.time() + wait
+    while True:
+        count = sink.count()
+        if count == stats["chunks"] or time.time() > deadline:
+            break
+        time.sleep(2)
+    if count != stats["chunks"]:
+        raise ValueError(f"벡터 수가 청크 수와 다릅니다: {count} != {stats['chunks']}")
@@ -0,0 +1,60 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException
+
+
+# 🟢 업스트림(OpenAI/Pinecone) 동시 호출 상한 + 백프레셔
+# - 동시에 진행 중인 요청은 max_inflight개까지만 업스트림을 호출합니다.
+# - 대기열이 max_queue를 넘으면 바로 429, 대기 시간이 max_wait를 넘으면 503을 돌려줍니다.
+#   (둘 다 Retry-After 헤더 포함 → 무한정 쌓이는 대기열 대신 클라이언트가 재시도)
+class UpstreamLimiter:
+    def __init__(self, max_inflight: int, max_queue: int, max_wait: float, retry_after: int):
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.retry_after = retry_after
+        self._semaphore = asyncio.Semaphore(max_inflight)
+        self._waiting = 0
+        self._inflight = 0
+
+    @property
+    def inflight(self) -> int:
+        return self._inflight
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    def _reject(self, status_code: int, detail: str):
+        return HTTPException(
+            status_code=status_code,
+            detail=detail,
+            headers={"Retry-After": str(self.retry_after)},
+        )
+
+    async def acquire(self):
+        if self._semaphore.locked() and self._waiting >= self.max_queue:
+            raise self._reject(429, "요청이 많아 잠시 후 다시 시도해 주세요.")
+
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            raise self._reject(503, "서버가 혼잡합니다. 잠시 후 다시 시도해 주세요.")
+        finally:
+            self._waiting -= 1
+        self._inflight += 1
+
+    def release(self):
+        self._inflight -= 1
+        self._semaphore.release()
+
+    # 스트리밍처럼 응답 수명이 함수 밖으로 이어질 때는 acquire()/release()를 직접 쓰세요.
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
@@ -0,0 +1,290 @@
+import argparse
+import json
+import os
+import shutil
+from typing import Any, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from backend.corpus import bump_corpus_version
+from backend.regulations import league_of
+from backend.sparse_index import update_sparse_index
+
+# 🟢 프로세스 내 로컬 벡터 인덱스 (Pinecone 대신 쓸 수 있는 검색 백엔드)
+# - 규정집 18개 분량의 청크 벡터는 RAM에 충분히 들어가므로, 시작할 때 float32 행렬 하나로 올려두고
+#   질문 벡터와의 내적 한 번으로 top-k를 뽑습니다. (요청마다 Pinecone 왕복 없음)
+# - 디스크: vectors.f32 (정규화된 벡터를 이어 붙인 파일, np.memmap 가능) + docs.jsonl (같은 순서의 본문·메타데이터)
+#   + meta.json (임베딩 모델, 차원, 출처)
+# - source / league 필터는 로드할 때 미리 만든 행 마스크로 처리합니다.
+# - 만들기: python -m backend.local_index export --from chroma|pinecone [--serve]
+#   meta.json의 임베딩 모델은 벡터를 올린 쪽 기록(코퍼스 버전 네임스페이스면 레지스트리, 아니면 인제스트 매니페스트)에서 가져옵니다.
+#   기록이 없으면(매니페스트에 모델을 적기 전에 올린 벡터) --embedding-model로 직접 지정해야 합니다.
+#   BM25 인덱스는 --out/sparse_index에 같이 쓰고, 서빙 중인 인덱스는 --serve를 줄 때만 바꿉니다.
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", "./local_index")
+FILTER_FIELDS = ("source", "file", "league")
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+class LocalVectorIndex:
+    def __init__(self, vectors, docs: List[Document], model: Optional[str] = None):
+        if len(vectors) != len(docs):
+            raise ValueError(f"벡터 {len(vectors)}개와 문서 {len(docs)}개의 수가 다릅니다.")
+        self.vectors = vectors
+        self.docs = docs
+        self.model = model
+        self.dim = vectors.shape[1] if len(docs) else 0
+
+        # 필드 → 값 → 행 마스크 (source는 경로가 아니라 파일명 기준)
+        self._masks = {field: {} for field in ("source", "league")}
+        for field, values in (
+            ("source", [os.path.basename(d.metadata.get("source", "")) for d in docs]),
+            ("league", [league_of(d.metadata.get("source", "")) for d in docs]),
+        ):
+            values = np.asarray(values, dtype=object)
+            for value in set(values) - {None, ""}:
+                self._masks[field][value] = values == value
+
+    def __len__(self):
+        return len(self.docs)
+
+    @classmethod
+    def load(cls, directory: str = LOCAL_INDEX_DIR, mmap: bool = False) -> "LocalVectorIndex":
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        docs = []
+        with open(os.path.join(directory, "docs.jsonl"), encoding="utf-8") as f:
+            for line in f:
+                row = json.loads(line)
+                docs.append(Document(id=row["id"], page_content=row["text"], metadata=row["metadata"]))
+        path = os.path.join(directory, "vectors.f32")
+        shape = (meta["count"], meta["dim"])
+        if mmap:
+            vectors = np.memmap(path, dtype=np.float32, mode="r", shape=shape)
+        else:
+            vectors = np.fromfile(path, dtype=np.float32).reshape(shape)
+        return cls(vectors, docs, model=meta.get("model"))
+
+    def _rows(self, filter):
+        # {"source": "a.pdf"}, {"file": "a.pdf"}, {"league": ["KBO", "K리그"]}, {"league": {"$in": [...]}} 형태를 지원합니다.
+        if not filter:
+            return None
+        mask = np.ones(len(self.docs), dtype=bool)
+        for field, condition in filter.items():
+            if field not in FILTER_FIELDS:
+                raise ValueError(f"로컬 인덱스는 {FILTER_FIELDS} 필터만 지원합니다: {field}")
+            field = "source" if field == "file" else field
+            if isinstance(condition, dict):
+                condition = condition.get("$in", condition.get("$eq"))
+            values = condition if isinstance(condition, (list, tuple, set)) else [condition]
+            if field == "source":
+                values = [os.path.basename(v) for v in values]
+            field_mask = np.zeros(len(self.docs), dtype=bool)
+            for value in values:
+                if value in self._masks[field]:
+                    field_mask |= self._masks[field][value]
+            mask &= field_mask
+        return np.flatnonzero(mask)
+
+    def search(self, vector, k: int = 4, filter: Optional[dict] = None) -> List[Tuple[Document, float]]:
+        if not self.docs:
+            return []
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        rows = self._rows(filter)
+        if rows is None:
+            scores = self.vectors @ query
+        elif len(rows):
+            scores = self.vectors[rows] @ query
+        else:
+            return []
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return [
+            (self.docs[rows[i] if rows is not None else i], float(scores[i]))
+            for i in top
+        ]
+
+
+def write_index(directory: str, vectors, docs: List[Document], model: str, origin: str):
+    # 임시 폴더에 다 쓴 뒤 폴더째 바꿔치기해서, 읽는 쪽이 반쯤 쓰인 인덱스를 보지 않게 합니다.
+    matrix = _normalize_rows(np.asarray(vectors, dtype=np.float32))
+    tmp_dir = directory.rstrip("/") + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    matrix.tofile(os.path.join(tmp_dir, "vectors.f32"))
+    with open(os.path.join(tmp_dir, "docs.jsonl"), "w", encoding="utf-8") as f:
+        for doc in docs:
+            f.write(json.dumps({"id": doc.id, "text": doc.page_content, "metadata": doc.metadata}, ensure_ascii=False) + "\n")
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"model": model, "dim": int(matrix.shape[1]), "count": len(docs), "origin": origin}, f)
+
+    old_dir = directory.rstrip("/") + ".old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(directory):
+        os.replace(directory, old_dir)
+    os.replace(tmp_dir, directory)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+class LocalVectorStore(VectorStore):
+    """LocalVectorIndex를 LangChain VectorStore로 감싼 읽기 전용 검색기."""
+
+    def __init__(self, index: LocalVectorIndex, embedding: Embeddings):
+        self.index = index
+        self.embedding = embedding
+
+    @classmethod
+    def load(cls, embedding: Embeddings, directory: str = LOCAL_INDEX_DIR, mmap: bool = False, model: Optional[str] = None):
+        index = LocalVectorIndex.load(directory, mmap=mmap)
+        if model and index.model and index.model != model:
+            raise ValueError(f"로컬 인덱스 임베딩 모델({index.model})이 질의 모델({model})과 다릅니다. 다시 export 하세요.")
+        print(f"📦 로컬 벡터 인덱스 로드: {len(index)}개 청크, {index.dim}차원 ({directory})")
+        return cls(index, embedding)
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, **kwargs: Any) -> List[str]:
+        raise NotImplementedError("로컬 인덱스는 읽기 전용입니다. python -m backend.local_index export 로 다시 만드세요.")
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None, **kwargs: Any):
+        metadatas = metadatas or [{} for _ in texts]
+        docs = [Document(id=str(i), page_content=t, metadata=m) for i, (t, m) in enumerate(zip(texts, metadatas))]
+        vectors = _normalize_rows(np.asarray(embedding.embed_documents(list(texts)), dtype=np.float32))
+        return cls(LocalVectorIndex(vectors, docs), embedding)
+
+    def _select_relevance_score_fn(self):
+        # 정규화된 내적(코사인 유사도, -1~1)을 0~1로 옮깁니다.
+        return lambda score: (score + 1) / 2
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4, filter: Optional[dict] = None, **kwargs: Any):
+        return self.index.search(embedding, k=k, filter=filter)
+
+    async def asimilarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4, filter: Optional[dict] = None, **kwargs: Any):
+        # PineconeVectorStore와 같은 이름·반환값 ([(Document, 코사인 유사도)])
+        return self.index.search(embedding, k=k, filter=filter)
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, filter: Optional[dict] = None, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.index.search(embedding, k=k, filter=filter)]
+
+    async def asimilarity_search_by_vector(self, embedding: List[float], k: int = 4, filter: Optional[dict] = None, **kwargs: Any) -> List[Document]:
+        # 수천 행 × 3072차원 내적은 1ms 안팎이라 스레드로 넘기지 않고 바로 계산합니다.
+        return self.similarity_search_by_vector(embedding, k=k, filter=filter)
+
+    def similarity_search_with_score(self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any):
+        return self.index.search(self.embedding.embed_query(query), k=k, filter=filter)
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any) -> List[Document]:
+        return self.similarity_search_by_vector(self.embedding.embed_query(query), k=k, filter=filter)
+
+    async def asimilarity_search(self, query: str, k: int = 4, filter: Optional[dict] = None, **kwargs: Any) -> List[Document]:
+        vector = await self.embedding.aembed_query(query)
+        return self.similarity_search_by_vector(vector, k=k, filter=filter)
+
+
+# --- 내보내기 (Chroma / Pinecone → 로컬 인덱스) ---
+
+def export_from_chroma(path, collection_name="langchain", page_size=1000):
+    import chromadb
+
+    collection = chromadb.PersistentClient(path=path).get_collection(collection_name)
+    vectors, docs = [], []
+    offset = 0
+    while True:
+        page = collection.get(include=["embeddings", "documents", "metadatas"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        for cid, vector, text, metadata in zip(page["ids"], page["embeddings"], page["documents"], page["metadatas"]):
+            vectors.append(vector)
+            docs.append(Document(id=cid, page_content=text or "", metadata=metadata or {}))
+        offset += len(page["ids"])
+    return vectors, docs
+
+
+def export_from_pinecone(index_name=None, namespace=None, fetch_size=100):
+    from backend import clients
+
+    index = clients.pinecone_index(index_name)
+    vectors, docs = [], []
+    for id_page in index.list(namespace=namespace):
+        for i in range(0, len(id_page), fetch_size):
+            fetched = index.fetch(ids=id_page[i : i + fetch_size], namespace=namespace).vectors
+            for cid, record in fetched.items():
+                metadata = dict(record.metadata or {})
+                text = metadata.pop("text", "")
+                vectors.append(record.values)
+                docs.append(Document(id=cid, page_content=text, metadata=metadata))
+    return vectors, docs
+
+
+def source_embedding_model(origin: str, namespace: Optional[str] = None) -> Optional[str]:
+    # 지금 EMBEDDING_MODEL 환경 변수가 아니라, 그 벡터를 올릴 때 쓴 모델을 찾습니다.
+    from backend.corpus import CorpusRegistry
+    from backend.ingestion import Manifest
+
+    if namespace:
+        meta = CorpusRegistry().read()["versions"].get(namespace)
+        if meta:
+            return meta.get("embedding_model")
+        return None
+    return Manifest(origin).embedding_model
+
+
+def main():
+    from backend.ingestion import DB_PATH
+
+    parser = argparse.ArgumentParser(description="책첵 로컬 벡터 인덱스")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="Chroma 또는 Pinecone의 벡터를 로컬 인덱스로 내보냅니다.")
+    export.add_argument("--from", dest="origin", choices=["chroma", "pinecone"], default="pinecone")
+    export.add_argument("--out", default=LOCAL_INDEX_DIR)
+    export.add_argument("--chroma-path", default=DB_PATH)
+    export.add_argument("--namespace", default=None)
+    export.add_argument("--embedding-model", default=None, help="벡터를 만든 임베딩 모델 (레지스트리·매니페스트에 기록이 없을 때)")
+    export.add_argument("--serve", action="store_true", help="서빙 중인 BM25 인덱스(SPARSE_INDEX_DIR)도 바꾸고 코퍼스 버전을 올림")
+    args = parser.parse_args()
+
+    recorded = source_embedding_model(args.origin, args.namespace)
+    model = args.embedding_model or recorded
+    if model is None:
+        print(f"❌ {args.origin} 벡터를 만든 임베딩 모델 기록이 없습니다. --embedding-model로 지정하세요.")
+        return
+    if recorded and model != recorded:
+        print(f"❌ --embedding-model({model})이 기록된 모델({recorded})과 다릅니다.")
+        return
+
+    if args.origin == "chroma":
+        vectors, docs = export_from_chroma(args.chroma_path)
+    else:
+        vectors, docs = export_from_pinecone(namespace=args.namespace)
+    if not docs:
+        print(f"❌ {args.origin}에서 가져온 벡터가 없습니다.")
+        return
+
+    # 실행할 때마다 같은 순서가 되도록 ID로 정렬합니다.
+    order = sorted(range(len(docs)), key=lambda i: docs[i].id)
+    write_index(args.out, [vectors[i] for i in order], [docs[i] for i in order], model, args.origin)
+    print(f"🎉 {args.origin} → {args.out}: {len(docs)}개 청크 ({len(vectors[0])}차원, {model})")
+    # 같은 본문으로 BM25 희소 인덱스도 만들어 둡니다. 기본은 --out 아래에만 쓰고 (시험용으로 내보내도 서빙 인덱스는 그대로),
+    # --serve일 때만 서빙 중인 인덱스를 바꾸고 의미 캐시가 비워지도록 코퍼스 버전을 올립니다.
+    chunks = {doc.id: doc for doc in docs}
+    update_sparse_index(chunks, directory=os.path.join(args.out, "sparse_index"))
+    if args.serve:
+        update_sparse_index(chunks)
+        bump_corpus_version(f"local export from {args.origin}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,50 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel, Field
 from fastapi.middleware.cors import CORSMiddleware
-from langchain_openai import ChatOpenAI
-from langchain_openai import OpenAIEmbeddings
-from langchain_pinecone import PineconeVectorStore
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.runnables.history import RunnableWithMessageHistory
-from langchain_community.chat_message_histories import ChatMessageHistory
-from langchain.chains import create_history_aware_retriever, create_retrieval_chain
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain.retrievers import MultiQueryRetriever
 from dotenv import load_dotenv
+from backend.limiter import UpstreamLimiter
+from backend.regulations import league_of
+from backend.catalog import CATALOG_PATH, fallback_catalog, load_catalog
+from backend.corpus import CorpusRegistry, current_corpus_version, version_dir
+from backend.preclassifier import KeywordPreclassifier
+from backend.semantic_cache import SemanticCache
+from backend.session_store import MemorySessionStore, SQLiteSessionStore
+from backend.vectorstores import VECTOR_BACKEND, load_vectorstore
+from backend.sparse_index import SPARSE_INDEX_DIR, SparseIndex
+from backend.hybrid import doc_key, fuse
+from backend.rerank import RERANK_CANDIDATES, LexicalReranker, RerankStage, load_rerank_stage
+from backend.refusal import REFUSAL_PRECHECK, Thresholds, load_thresholds, precheck
+from backend.context import assemble_prompt
+from backend.batch import group_by_context, merge_contexts, shared_input, split_answers, unique_questions
+from backend.tokens import count_tokens
+from backend import clients, metrics
+from backend.metrics import span
+from contextlib import asynccontextmanager
+from typing import List, NamedTuple, Optional
+import asyncio
+import hashlib
+import json
 import os
+import threading
 import time
 
 # 1. 환경 변수 로드
 load_dotenv()
 
 # 2. FastAPI 앱 생성
-app = FastAPI(title="책첵 API", description="K리그/KBO 규정 RAG 챗봇 서버")
+# 🟢 [신규] 무거운 초기화(OpenAI 클라이언트, 벡터 DB 연결, 체인 구성)는 import 때 하지 않고
+#    lifespan에서 백그라운드로 시작합니다. 워커는 바로 떠서 /health/live에 응답하고, 준비가 끝나면 /health/ready가 200이 됩니다.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    task = _start_warmup()
+    yield
+    if not task.done():
+        task.cancel()
+    await clients.aclose(corpus and corpus.vectorstore)
+
+app = FastAPI(title="책첵 API", description="K리그/KBO 규정 RAG 챗봇 서버", lifespan=lifespan)
 
 # 3. CORS 설정
 app.add_middleware(
@@ -29,87 +55,146 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 4. ✨ 파일명 -> 실제 규정명 번역 사전 (사용자 맞춤형)
-REGULATION_NAMES = {
-    "baseball_kbo_leagueregulations_2025.pdf": "2025 KBO 리그 규정",
-    "baseball_kbo_officialbaseballrule_2025.pdf": "2025 공식야구규칙",
-    "baseball_kbo_rule_2025.pdf": "2025 KBO 규약",
-    "football_kleague_arbitration_2018.pdf": "K리그 중재위원회 운영 규정",
-    "football_kleague_articles_2018.pdf": "K리그 정관",
-    "football_kleague_cleanfinancial_2024.pdf": "K리그 재정건전화 규정",
-    "football_kleague_cleanfinancial2_2024.pdf": "K리그 클럽 재정건전화 준수 세칙",
-    "football_kleague_club_2018.pdf": "K리그 제1장 클럽 규정",
-    "football_kleague_clublicesing_2024.pdf": "K리그 클럽 라이센싱 규정",
-    "football_kleague_comissioner_2018.pdf": "K리그 총재선거관리규정",
-    "football_kleague_ethics_2021.pdf": "K리그 윤리강령",
-    "football_kleague_game_2018.pdf": "K리그 제3장 경기",
-    "football_kleague_marketing_2018.pdf": "K리그 제5장 마케팅",
-    "football_kleague_penalty_2018.pdf": "K리그 제6장 상벌",
-    "football_kleague_player_2018.pdf": "K리그 제2장 선수",
-    "football_kleague_proclubbteam_2021.pdf": "K리그 프로클럽 B팀 운영 세칙",
-    "football_kleague_stadium_2024.pdf": "K리그 경기장 시설기준 가이드라인",
-    "football_kleague_youthclubsystem_2018.pdf": "K리그 유소년 클럽 시스템 운영 세칙"
-}
-
-# 5. 데이터베이스 로드
-embeddings = OpenAIEmbeddings(model="text-embedding-3-large")
-index_name = os.getenv("PINECONE_INDEX_NAME")
-vectorstore = PineconeVectorStore.from_existing_index(
-    index_name=index_name,
-    embedding=embeddings
-)
+# 4. 데이터베이스 로드 (initialize()에서)
+# 같은 질문(정규화 기준)은 메모리 LRU → 디스크 캐시 순으로 찾아 임베딩 API 왕복을 건너뜁니다.
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-large")
+embeddings = None
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "1") == "1"
+
+# 5. ✨ 서빙 코퍼스 (벡터 DB + BM25 인덱스 + 규정집 카탈로그를 한 묶음으로)
+# - 코퍼스 레지스트리(backend/corpus.py)에 활성 버전이 있으면 그 버전을 씁니다. (블루/그린, 재시작 없이 전환)
+#   없으면(레지스트리 도입 전 배포) 기본 네임스페이스 + ./sparse_index + ./regulation_catalog.json을 씁니다.
+# - 검색 백엔드는 VECTOR_BACKEND로 고릅니다. (pinecone: 원격 인덱스 / local: 프로세스 내 NumPy 인덱스)
+# - 카탈로그 파일이 없으면(카탈로그 도입 전 인제스트) backend/regulations.py의 제목 사전으로 대신합니다.
+class ServingCorpus(NamedTuple):
+    version: Optional[str]
+    vectorstore: object
+    sparse_index: Optional[SparseIndex]
+    catalog: dict
+    titles: dict                # 파일명 → 표시 제목
+    catalog_body: bytes
+    catalog_etag: str
+
+def _load_corpus(version: Optional[str] = None, meta: Optional[dict] = None) -> ServingCorpus:
+    if meta is not None:
+        # 다른 모델로 만든 버전을 지금 모델의 질의 벡터로 찾으면 에러 없이 엉뚱한 결과가 나오므로 거부합니다.
+        if meta.get("embedding_model") != EMBEDDING_MODEL:
+            raise ValueError(f"코퍼스 {version}의 임베딩 모델({meta.get('embedding_model')})이 서버({EMBEDDING_MODEL})와 다릅니다.")
+        if meta.get("target") != VECTOR_BACKEND:
+            raise ValueError(f"코퍼스 {version}은 {meta.get('target')}용인데 서버 VECTOR_BACKEND는 {VECTOR_BACKEND}입니다.")
+    directory = version_dir(version) if version else None
+    vectorstore = load_vectorstore(embeddings, model=EMBEDDING_MODEL, version=version)
+    sparse_index = None
+    if HYBRID_RETRIEVAL:
+        sparse_index = SparseIndex.load(os.path.join(directory, "sparse_index") if directory else SPARSE_INDEX_DIR)
+    catalog = load_catalog(os.path.join(directory, "regulation_catalog.json") if directory else CATALOG_PATH) or fallback_catalog()
+    body = json.dumps(catalog, ensure_ascii=False).encode("utf-8")
+    return ServingCorpus(
+        version=version,
+        vectorstore=vectorstore,
+        sparse_index=sparse_index,
+        catalog=catalog,
+        titles={d["file"]: d["title"] for d in catalog["documents"]},
+        catalog_body=body,
+        catalog_etag='"' + hashlib.sha256(body).hexdigest()[:16] + '"',
+    )
+
+corpus_registry = CorpusRegistry()
+_registry_mtime = None
+corpus: Optional[ServingCorpus] = None
+
+# 모델·k 등 튜닝 값은 환경 변수로 바꿉니다. (bench/rag_eval.py로 바꾸기 전후를 비교)
+ROUTER_MODEL = os.getenv("ROUTER_MODEL", "gpt-4.1-nano")
+ANSWER_MODEL = os.getenv("ANSWER_MODEL", "gpt-4.1-nano")
 
 # 🟢 [신규] 라우터 출력 스키마 정의
+# domain이 'K리그' / 'KBO'면 그대로 리그로 쓰고, 규정집까지 확실하면 document에 파일명을 받아 검색 범위를 좁힙니다.
 class RouteQuery(BaseModel):
     domain: str = Field(description="분류 결과: 'K리그', 'KBO', '미지원스포츠', '비관련'")
+    document: Optional[str] = Field(default=None, description="질문이 특정 규정집 하나에 해당하면 그 파일명, 아니면 null")
+    confidence: float = Field(default=1.0, description="분류 확신도 (0~1)")
+
+# 🟢 [신규] 대화 기록이 필요한 질문은 분류와 질문 재구성을 한 번의 호출로 받습니다.
+class RouteAndRewrite(RouteQuery):
+    standalone_question: Optional[str] = Field(default=None, description="이전 대화 없이도 뜻이 통하도록 다시 쓴 질문")
 
 # 🟢 [신규] 의도 분류 라우터 체인
-def get_router_chain():
+# with_history=True면 대화 기록까지 보고 분류하면서 독립 질문도 같이 돌려줍니다. (검색 전 LLM 호출은 턴당 최대 1번)
+def get_router_chain(titles: dict, with_history: bool = False):
+    from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
     # 라우팅은 속도가 생명이니 가장 빠르고 저렴한 모델을 씁니다.
-    llm = ChatOpenAI(model="gpt-4.1-nano", temperature=0) 
+    llm = clients.chat_model(ROUTER_MODEL, temperature=0)
+    catalog = "\n".join(f"        - {filename}: {title}" for filename, title in titles.items())
     prompt = ChatPromptTemplate.from_messages([
-        ("system", """당신은 질문 분류기입니다. 질문의 '종목'만 보고 다음 중 하나로 분류하세요:
-        - 스포츠관련: K리그, KBO, 야구, 축구, 농구, 배구 등 모든 스포츠 관련 질문
+        ("system", """당신은 질문 분류기입니다. 질문의 '종목'을 보고 domain을 다음 중 하나로 분류하세요:
+        - K리그: 프로축구(K리그) 규정에 관한 질문
+        - KBO: 프로야구(KBO) 규정·야구 규칙에 관한 질문
+        - 미지원스포츠: 그 밖의 종목·기관(농구, 배구, 해외 리그, 국가대표 등)에 관한 질문
         - 비관련: 일상 대화, 요리, 날씨 등 스포츠와 무관한 질문
-        """),
+
+        domain이 K리그 또는 KBO이고 질문이 아래 규정집 중 하나에만 해당한다고 확신하면 document에 그 파일명을 적고, 아니면 비워 두세요.
+""" + catalog + """
+
+        confidence에는 분류가 맞을 확률(0~1)을 적으세요.
+        """ + ("""
+        질문이 이전 대화를 가리키면(그거, 그럼, 생략된 주어 등) 채팅 기록을 보고 분류하고,
+        standalone_question에 이전 대화 없이도 뜻이 통하는 질문을 적으세요. (리그·규정 이름을 넣어서)
+        """ if with_history else "")),
+        *([MessagesPlaceholder("chat_history")] if with_history else []),
         ("human", "{question}")
     ])
     # LLM이 무조건 RouteQuery 형식(JSON)으로만 대답하게 강제합니다.
-    return prompt | llm.with_structured_output(RouteQuery)
+    return prompt | llm.with_structured_output(RouteAndRewrite if with_history else RouteQuery)
 
-router_chain = get_router_chain()
+router_chain = None
+history_router_chain = None
 
-session_store = {}
+# 🟢 [신규] 뻔한 질문은 라우터 LLM 없이 로컬에서 바로 분류 (규정집 목록으로 만들므로 initialize()에서)
+preclassifier: Optional[KeywordPreclassifier] = None
 
-def get_session_history(session_id: str):
-    if session_id not in session_store:
-        session_store[session_id] = ChatMessageHistory()
-    return session_store[session_id]
+# 🟢 [신규] 투기적 실행: 라우터 응답을 기다리는 동안 임베딩 + 범위 없는 후보 검색을 미리 시작
+# 라우팅이 끝나면 그 후보를 리그·규정집 메타데이터로 거르고, 남은 게 k개보다 적을 때만 범위 검색을 다시 합니다.
+# 답변 캐시는 라우팅 결과(도메인·범위)로 구획을 정한 뒤 조회합니다.
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "1") == "1"
+LOCAL_PRECLASSIFY = os.getenv("LOCAL_PRECLASSIFY", "1") == "1"
+# 🟢 [신규] 대화 기록이 있어도 질문이 그 자체로 완결돼 있으면(지시어 없음 + 리그·조항 명시) 재구성을 건너뜁니다.
+LOCAL_REWRITE_SKIP = os.getenv("LOCAL_REWRITE_SKIP", "1") == "1"
+
+# 🟢 [신규] 크기 제한이 있는 대화 기록 저장소 (LRU + 유휴 TTL + 세션당 턴/토큰 상한)
+# SESSION_STORE_PATH를 주면 여러 uvicorn 워커가 SQLite 파일 하나로 기록을 공유합니다.
+_session_limits = dict(
+    idle_ttl=float(os.getenv("SESSION_IDLE_TTL", "3600")),
+    max_turns=int(os.getenv("SESSION_MAX_TURNS", "10")),
+    max_tokens=int(os.getenv("SESSION_MAX_TOKENS", "2000")),
+)
+if os.getenv("SESSION_STORE_PATH"):
+    session_store = SQLiteSessionStore(
+        os.getenv("SESSION_STORE_PATH"),
+        max_sessions=int(os.getenv("SESSION_MAX_SESSIONS", "10000")),
+        busy_timeout=float(os.getenv("SESSION_BUSY_TIMEOUT", "2")),
+        **_session_limits,
+    )
+else:
+    session_store = MemorySessionStore(
+        max_sessions=int(os.getenv("SESSION_MAX_SESSIONS", "1000")),
+        **_session_limits,
+    )
+# /metrics로도 내보냅니다. (긁을 때마다 저장소에서 셈, SQLite면 모든 워커가 공유하는 파일 기준)
+metrics.Gauge(
+    "chaekcheck_sessions", "대화 기록 저장소 크기 (sessions / turns / history_tokens)", ("kind",),
+    collect=lambda: {(k,): v for k, v in session_store.stats().items() if k in ("sessions", "turns", "history_tokens")},
+)
+metrics.Counter("chaekcheck_sessions_evicted", "TTL·개수 상한으로 지운 세션 수 (워커별)", collect=lambda: {(): session_store.evicted})
 
 # 6. RAG 체인 (가드레일 & 조항 명시 프롬프트 장착)
 def get_rag_chain():
-    llm = ChatOpenAI(model="gpt-4.1-nano", temperature=0)
-
-    base_retriever = vectorstore.as_retriever(
-        search_type="similarity",
-        search_kwargs={"k": 5}
-    )
+    from langchain.chains.combine_documents import create_stuff_documents_chain
+    from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
-    contextualize_q_system_prompt = """
-    주어진 채팅 기록과 최신 질문을 보고,
-    이전 대화와 관련이 있다면 독립적인 질문으로 재구성하세요.
-    """
-    contextualize_q_prompt = ChatPromptTemplate.from_messages(
-        [
-            ("system", contextualize_q_system_prompt),
-            MessagesPlaceholder("chat_history"),
-            ("human", "{input}"),
-        ]
-    )
-    history_aware_retriever = create_history_aware_retriever(
-        llm, base_retriever, contextualize_q_prompt
-    )
+    llm = clients.chat_model(ANSWER_MODEL, temperature=0)
 
+    # 히스토리를 반영한 '독립 질문'은 history_router_chain이 분류와 함께 만들어 줍니다.
     qa_system_prompt = """
     당신은 스포츠 규정에 대해 친절하고 정확하게 알려주는 전문 AI 에이전트 '책첵(Chaek-Check)'입니다.
 
@@ -132,90 +217,848 @@ def get_rag_chain():
         ]
     )
     question_answer_chain = create_stuff_documents_chain(llm, qa_prompt)
-    rag_chain = create_retrieval_chain(history_aware_retriever, question_answer_chain)
-    return rag_chain
+    # 프롬프트 토큰 수를 실제로 보낼 모양 그대로 세기 위해 프롬프트도 같이 돌려줍니다.
+    return question_answer_chain, qa_prompt
+
+answer_chain = answer_prompt = None
+
+# 🟢 [신규] 컨텍스트 압축 + 토큰 예산 (backend/context.py)
+# 중복·저점수 청크를 빼고 관련 문장·조항만 남긴 뒤, PROMPT_TOKEN_BUDGET을 대화 기록과 컨텍스트가 나눠 씁니다.
+CONTEXT_COMPRESSION = os.getenv("CONTEXT_COMPRESSION", "1") == "1"
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "5"))
+
+# 🟢 [신규] 하이브리드 검색 (밀집 벡터 + BM25, RRF로 합침)
+# 희소 인덱스는 인제스트 때 만들어 둔 것(서빙 코퍼스의 sparse_index)을 읽기만 합니다. 없으면 벡터 검색만 합니다.
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+
+# 🟢 [신규] 리그·규정집 범위 검색
+# 라우터가 고른 리그(파일명 접두어 기준, 인제스트 때 메타데이터 "league"/"file"로 저장)로 사전 필터를 겁니다.
+# 확신도가 낮으면 범위를 넓히고, 걸러낸 결과가 비면(예전에 올린 인덱스 등) 필터 없이 다시 찾습니다.
+SCOPED_RETRIEVAL = os.getenv("SCOPED_RETRIEVAL", "1") == "1"
+SCOPE_LEAGUE_MIN_CONFIDENCE = float(os.getenv("SCOPE_LEAGUE_MIN_CONFIDENCE", "0.6"))
+SCOPE_DOCUMENT_MIN_CONFIDENCE = float(os.getenv("SCOPE_DOCUMENT_MIN_CONFIDENCE", "0.85"))
+# 범위를 좁히면 후보끼리 경쟁이 덜하므로 더 적은 청크만 답변 LLM에 넘깁니다.
+SCOPED_RETRIEVAL_K = int(os.getenv("SCOPED_RETRIEVAL_K", "4"))
+
+# 🟢 [신규] 재정렬 + 적응형 k (backend/rerank.py)
+# 켜져 있으면 후보를 RERANK_CANDIDATES개까지 뽑아 다시 정렬하고, 위의 k를 상한으로 필요한 만큼만 답변 LLM에 넘깁니다.
+rerank_stage: Optional[RerankStage] = None
+
+# 🟢 [신규] 검색 근거로 하는 거절 사전 판정 (backend/refusal.py)
+# 벡터 유사도와 단어 겹침이 모두 기준 미만이면 답변 LLM을 부르지 않고 NO_EVIDENCE_ANSWER를 돌려줍니다.
+# 서빙 중인 임베딩 모델로 보정한 기준값(refusal_thresholds.json)이 있을 때만 켜집니다.
+refusal_thresholds: Optional[Thresholds] = None
+
+# 🟢 [신규] 의미 기반 답변 캐시 (독립 질문 임베딩 기준)
+answer_cache = None
+if os.getenv("SEMANTIC_CACHE", "1") == "1":
+    answer_cache = SemanticCache(
+        threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95")),
+        ttl=float(os.getenv("SEMANTIC_CACHE_TTL", "86400")),
+        max_entries=int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2000")),
+        path=os.getenv("SEMANTIC_CACHE_PATH") or None,
+        busy_timeout=float(os.getenv("SEMANTIC_CACHE_BUSY_TIMEOUT", "2")),
+        # 실제로 서빙 중인 코퍼스 버전으로 답변을 구분합니다. (전환이 끝난 워커부터 새 버전 캐시를 씀)
+        version_fn=lambda: (corpus and corpus.version) or current_corpus_version(),
+    )
+
+# 🟢 [신규] 계측: 단계별 지연 시간 → /metrics (Prometheus), OTEL_EXPORTER_OTLP_ENDPOINT가 있으면 OTel 트레이스도
+metrics.setup_tracing()
+metrics.Counter(
+    "chaekcheck_cache_lookups", "캐시 조회 수 (적중/실패)", ("cache", "result"),
+    collect=lambda: {
+        **({("answer", "hit"): answer_cache.hits, ("answer", "miss"): answer_cache.misses} if answer_cache is not None else {}),
+        **({("embedding", "hit"): embeddings.hits, ("embedding", "miss"): embeddings.misses} if embeddings is not None else {}),
+    },
+)
 
-rag_chain_instance = get_rag_chain()
+# 7. 업스트림 동시 호출 제한 (워커 프로세스당)
+upstream_limiter = UpstreamLimiter(
+    max_inflight=int(os.getenv("CHAT_MAX_INFLIGHT", "32")),
+    max_queue=int(os.getenv("CHAT_MAX_QUEUE", "64")),
+    max_wait=float(os.getenv("CHAT_MAX_WAIT", "5")),
+    retry_after=int(os.getenv("CHAT_RETRY_AFTER", "2")),
+)
 
 class ChatRequest(BaseModel):
     message: str
-    session_id: str = "default_session"
+    # 세션 ID가 없으면 대화 기록 없이 한 번짜리 질문으로 처리합니다. (모든 사용자가 기록을 공유하지 않도록)
+    session_id: Optional[str] = None
+    # True면 응답에 단계별 소요 시간(ms)을 같이 돌려줍니다. (CHAT_DEBUG=0이면 무시)
+    debug: bool = False
+
+CHAT_DEBUG = os.getenv("CHAT_DEBUG", "1") == "1"
+
+# 🟢 [신규] 초기화 & 예열
+# - initialize(): 임베딩 클라이언트 → 서빙 코퍼스(벡터 DB 연결, BM25 인덱스, 카탈로그) → 라우터·답변 체인 순으로 만듭니다.
+#   한 번만 실행되고, lifespan이 없는 환경(httpx ASGITransport, 벤치)에서는 첫 요청이 대신 시작합니다.
+# - 예열: 임베딩 한 번 + 벡터 검색 한 번으로 커넥션 풀과 인덱스 페이지를 미리 데워, 첫 사용자 요청이 그 비용을 떠안지 않게 합니다.
+# - 준비 전에 온 요청은 STARTUP_WAIT초까지 기다렸다가 처리하고, 넘기면 503 + Retry-After를 돌려줍니다.
+STARTUP_WAIT = float(os.getenv("STARTUP_WAIT", "30"))
+_init_lock = threading.Lock()
+_startup = {"task": None, "error": None, "started": time.time(), "ready_s": None}
+
+def initialize():
+    global embeddings, corpus, _registry_mtime, router_chain, history_router_chain, preclassifier, answer_chain, answer_prompt, rerank_stage, refusal_thresholds
+    with _init_lock:
+        if corpus is not None:
+            return
+        from backend.embedding_cache import CachedEmbeddings
+
+        # 라우터·답변 LLM과 임베딩은 backend/clients.py의 공용 커넥션 풀 하나를 같이 씁니다.
+        embeddings = CachedEmbeddings(clients.embedding_client(EMBEDDING_MODEL), model=EMBEDDING_MODEL)
+        _registry_mtime = corpus_registry.mtime()
+        serving = _load_corpus(*corpus_registry.active())
+        router_chain = get_router_chain(serving.titles)
+        history_router_chain = get_router_chain(serving.titles, with_history=True)
+        preclassifier = KeywordPreclassifier(serving.titles)
+        answer_chain, answer_prompt = get_rag_chain()
+        rerank_stage = load_rerank_stage(serving.sparse_index)
+        refusal_thresholds = load_thresholds(EMBEDDING_MODEL) if REFUSAL_PRECHECK else None
+        # 준비 완료 표시를 겸하므로 마지막에 넣습니다.
+        corpus = serving
+
+async def _warm_up():
+    try:
+        await asyncio.to_thread(initialize)
+    except Exception as e:
+        _startup["error"] = f"{type(e).__name__}: {e}"
+        print(f"❌ 서버 초기화 실패: {_startup['error']}")
+        raise
+    _startup["error"] = None
+    _startup["ready_s"] = round(time.time() - _startup["started"], 3)
+    try:
+        await clients.open_vectorstore(corpus.vectorstore)
+        vector = await embeddings.aembed_query(CORPUS_PROBE_QUERY)
+        hits = await _dense_search(corpus.vectorstore, vector, RERANK_CANDIDATES if rerank_stage is not None else 1, None)
+        if rerank_stage is not None:
+            # 쌍당 시간을 재 둬야 첫 요청부터 재정렬 예산을 확인합니다.
+            await asyncio.to_thread(rerank_stage.warm_up, CORPUS_PROBE_QUERY, [doc for doc, _ in hits])
+    except Exception as e:
+        # 예열은 최선만 다합니다. (실패해도 준비 상태는 유지, 첫 요청이 연결을 맺음)
+        print(f"⚠️ 예열 실패: {e}")
+    print(f"✅ 서버 준비 완료 ({_startup['ready_s']}초, 코퍼스 {corpus.version or '(기본)'})")
+
+def _start_warmup() -> asyncio.Task:
+    # 실패한 초기화는 다음 요청 때 다시 시도합니다.
+    task = _startup["task"]
+    if task is None or (task.done() and corpus is None):
+        task = _startup["task"] = asyncio.create_task(_warm_up())
+    return task
+
+async def _ensure_ready():
+    if corpus is not None:
+        return
+    try:
+        await asyncio.wait_for(asyncio.shield(_start_warmup()), STARTUP_WAIT)
+    except Exception:
+        pass
+    if corpus is None:
+        raise HTTPException(status_code=503, detail="서버를 준비하는 중입니다. 잠시 후 다시 시도해 주세요.", headers={"Retry-After": "2"})
 
 @app.get("/")
 def read_root():
     return {"status": "ok", "message": "책첵 API 서버가 정상 작동 중입니다."}
 
+@app.get("/health/live")
+def liveness():
+    # 프로세스가 요청을 받을 수 있으면 200 (초기화 여부와 무관, 재시작 판단용)
+    return {"status": "ok"}
+
+@app.get("/health/ready")
+def readiness():
+    # 초기화가 끝나 질의를 처리할 수 있을 때만 200 (로드밸런서 트래픽 투입 판단용)
+    if corpus is None:
+        status = "error" if _startup["error"] else "starting"
+        return JSONResponse({"status": status, "error": _startup["error"]}, status_code=503, headers={"Retry-After": "2"})
+    return {"status": "ready", "corpus": corpus.version, "startup_s": _startup["ready_s"]}
+
+@app.get("/stats/sessions")
+def session_stats():
+    # 워커별 세션 수와 대화 기록 크기 (메모리 상한 조정용)
+    return session_store.stats()
+
+@app.get("/catalog")
+async def catalog_endpoint(request: Request):
+    # 규정집 목록 (프론트엔드용). 내용이 바뀔 때만 ETag가 바뀌므로 브라우저·CDN이 캐시해도 됩니다.
+    await _ensure_ready()
+    serving = corpus
+    headers = {"ETag": serving.catalog_etag, "Cache-Control": "public, max-age=300"}
+    if request.headers.get("if-none-match") == serving.catalog_etag:
+        return Response(status_code=304, headers=headers)
+    return Response(serving.catalog_body, media_type="application/json", headers=headers)
+
+@app.get("/stats/corpus")
+def corpus_stats():
+    # 이 워커가 서빙 중인 코퍼스 버전과 레지스트리의 활성 버전 (전환 확인용)
+    active, meta = corpus_registry.active()
+    return {"serving": corpus and corpus.version, "active": active, "active_meta": meta, "switching": _corpus_switch is not None}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    # Prometheus 텍스트 형식 (워커 프로세스별 값)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# 8. 답변 문구 & 거절 판별
+UNRELATED_ANSWER = "죄송합니다. 저는 스포츠 규정 전문 에이전트 '책첵'입니다. 스포츠 규정과 관련된 질문에만 답변해 드릴 수 있습니다. 🙇‍♂️"
+UNSUPPORTED_ANSWER = "질문해주신 종목(또는 기관)의 규정은 현재 책첵(Chaek-Check)에 업데이트를 준비하고 있습니다! 🙇‍♂️ 현재 베타 버전에서는 K리그 및 KBO 관련 공식 규정을 중심으로 팩트체크를 지원하고 있습니다. 조금만 기다려 주시면 더 다양한 스포츠 규정으로 찾아뵙겠습니다."
+DOMAIN_REFUSALS = {"비관련": UNRELATED_ANSWER, "미지원스포츠": UNSUPPORTED_ANSWER}
+REFUSAL_MARKER = "명확한 조항을 찾을 수 없습니다"
+# 답변 프롬프트의 '우아한 거절' 문장과 같습니다. (사전 판정으로 거절할 때 LLM 대신 돌려줌)
+NO_EVIDENCE_ANSWER = "현재 책첵(Chaek-Check) 데이터 내에서는 해당 질문에 대한 명확한 조항을 찾을 수 없습니다. 🙇‍♂️"
+# 응답의 refusal_reason: domain (라우터가 비관련·미지원 종목으로 분류) / no_evidence (사전 판정) / model (답변 LLM이 거절)
+
+async def _classify(message: str, chat_history: Optional[list] = None) -> RouteQuery:
+    if chat_history:
+        # 분류 + 질문 재구성을 한 번에 하는 호출이라 rewrite 단계로 따로 셉니다.
+        with span("rewrite"):
+            return await history_router_chain.ainvoke({"question": message, "chat_history": chat_history})
+    with span("router"):
+        return await router_chain.ainvoke({"question": message})
+
+def _needs_rewrite(message: str, chat_history: list) -> bool:
+    if not chat_history:
+        return False
+    return not (LOCAL_REWRITE_SKIP and preclassifier.is_self_contained(message))
+
+def _scope(route: RouteQuery) -> Optional[dict]:
+    # 라우터 결과 → 메타데이터 필터. 규정집은 리그가 맞고 확신도가 충분할 때만 씁니다.
+    if not SCOPED_RETRIEVAL or route.domain not in ("K리그", "KBO") or route.confidence < SCOPE_LEAGUE_MIN_CONFIDENCE:
+        return None
+    scope = {"league": route.domain}
+    document = os.path.basename(route.document or "")
+    if document in corpus.titles and league_of(document) == route.domain and route.confidence >= SCOPE_DOCUMENT_MIN_CONFIDENCE:
+        scope["file"] = document
+    return scope
+
+class Retrieval(NamedTuple):
+    question: str               # 히스토리를 반영한 독립 질문
+    vector: list                # 독립 질문 임베딩 (캐시 키)
+    context: list               # 검색된 청크 (캐시 적중 시 빈 리스트)
+    cached: Optional[dict]      # 캐시 적중 시 저장돼 있던 answer / sources / is_refusal
+    scope: Optional[dict] = None  # 실제로 검색에 쓴 메타데이터 필터 (없으면 전체 검색)
+    scores: Optional[dict] = None  # doc_key → 벡터 유사도 (컨텍스트 압축의 저점수 컷용)
+    speculative: Optional[tuple] = None  # (검색한 서빙 코퍼스, 범위 없는 밀집 검색 결과, 요청한 개수) — 투기적 실행일 때만
+    partition: str = ""         # 답변 캐시 구획 (_cache_partition)
+
+async def _prepare(question: str) -> Retrieval:
+    # 임베딩은 한 번만 구해 캐시 조회와 벡터 검색에 같이 씁니다.
+    with span("embed"):
+        vector = await embeddings.aembed_query(question)
+    return Retrieval(question, vector, [], None)
+
+def _cache_partition(domain: str, scope: Optional[dict]) -> str:
+    # 답변 캐시는 라우팅한 도메인 + 검색 범위별로 나눕니다. (비슷한 질문이라도 리그·규정집이 다르면 답이 다름)
+    return "|".join([domain] + [f"{field}={value}" for field, value in sorted((scope or {}).items())])
+
+async def _lookup(prepared: Retrieval, partition: str) -> Retrieval:
+    with span("cache_lookup"):
+        cached = await answer_cache.alookup(prepared.vector, partition) if answer_cache is not None else None
+    return prepared._replace(cached=cached, partition=partition)
+
+async def _speculate(question: str) -> Retrieval:
+    # 라우터를 기다리는 동안: 임베딩 → 범위 없이 후보를 넉넉히 검색 (캐시는 라우팅 결과로 구획을 정한 뒤 조회)
+    prepared = await _prepare(question)
+    serving = corpus
+    fetch = RERANK_CANDIDATES if rerank_stage is not None else HYBRID_CANDIDATES
+    with span("vector_search"):
+        hits = await _dense_search(serving.vectorstore, prepared.vector, fetch, None)
+    return prepared._replace(speculative=(serving, hits, fetch))
+
+def _in_scope(doc, filter: dict) -> bool:
+    # 벡터 DB 필터와 같은 기준: file은 파일명, league는 메타데이터(없으면 파일명 접두어)
+    file = os.path.basename(doc.metadata.get("source", "")) or doc.metadata.get("file", "")
+    values = {"file": file, "league": doc.metadata.get("league") or league_of(file)}
+    return all(values.get(field) == value for field, value in filter.items())
+
+async def _dense_search(vectorstore, vector: list, k: int, filter: Optional[dict]):
+    # 유사도 점수까지 받을 수 있는 벡터 DB(Pinecone, 로컬 인덱스)는 점수도 같이 받습니다.
+    kwargs = {"filter": filter} if filter else {}
+    async with clients.upstream_gate("vector"):
+        if hasattr(vectorstore, "asimilarity_search_by_vector_with_score"):
+            return await vectorstore.asimilarity_search_by_vector_with_score(vector, k=k, **kwargs)
+        return [(doc, None) for doc in await vectorstore.asimilarity_search_by_vector(vector, k=k, **kwargs)]
+
+async def _rerank(question: str, candidates: list, k: int) -> list:
+    # CPU를 쓰는 추론이라 이벤트 루프를 막지 않도록 스레드에서 돌립니다.
+    with span("rerank"):
+        result = await asyncio.to_thread(rerank_stage.select, question, candidates, k, metrics.request_elapsed())
+    metrics.rerank_outcomes.inc(outcome=result.outcome)
+    return result.docs
+
+async def _search(prepared: Retrieval, scope: Optional[dict]) -> Retrieval:
+    if prepared.cached is not None:
+        return prepared._replace(speculative=None)
+    # 검색 도중 코퍼스가 바뀌어도 한 요청은 한 버전의 벡터·BM25 인덱스만 보도록 처음에 한 번 잡아 둡니다.
+    serving = corpus
+    candidates = RERANK_CANDIDATES if rerank_stage is not None else HYBRID_CANDIDATES
+    # 규정집 → 리그 → 전체 순으로 넓혀 가며, 결과가 나오는 가장 좁은 범위를 씁니다.
+    attempts = [scope] if scope else []
+    if scope and "file" in scope:
+        attempts.append({"league": scope["league"]})
+    # 투기적으로 미리 찾은 후보는 같은 코퍼스 버전일 때만 씁니다.
+    speculative, exhaustive = None, False
+    if prepared.speculative and prepared.speculative[0] is serving:
+        _, speculative, fetched = prepared.speculative
+        # 요청한 개수보다 적게 나왔으면 코퍼스 전체를 본 것이라 거른 결과가 곧 범위 검색 결과입니다.
+        exhaustive = len(speculative) < fetched
+    for filter in attempts + [None]:
+        k = SCOPED_RETRIEVAL_K if filter else RETRIEVAL_K
+        hits = None
+        if speculative is not None:
+            # 범위 없는 상위 후보 중 범위 안의 것 = 범위 검색 결과의 앞부분 (순위가 같음)
+            hits = [hit for hit in speculative if _in_scope(hit[0], filter)] if filter else speculative
+            if filter and len(hits) < k and not exhaustive:
+                hits = None
+        if hits is None:
+            with span("vector_search"):
+                fetch = candidates if serving.sparse_index or rerank_stage is not None else k
+                hits = await _dense_search(serving.vectorstore, prepared.vector, fetch, filter)
+        if hits or filter is None:
+            dense = [doc for doc, _ in hits]
+            scores = {doc_key(doc): score for doc, score in hits if score is not None}
+            with span("sparse_fusion"):
+                limit = candidates if rerank_stage is not None else k
+                context = fuse(prepared.question, dense, serving.sparse_index, limit, candidates, filter=filter)
+            if rerank_stage is not None:
+                context = await _rerank(prepared.question, context, k)
+            metrics.context_chunks.observe(len(context))
+            return prepared._replace(context=context, scope=filter, scores=scores, speculative=None)
+
+def _answer_inputs(retrieval: Retrieval, retrieval_input: dict):
+    # 답변 LLM 입력을 예산 안으로 줄이고, 보낼 프롬프트의 토큰 수를 같이 돌려줍니다.
+    with span("context"):
+        context, chat_history = retrieval.context, retrieval_input["chat_history"]
+        usage = {}
+        if CONTEXT_COMPRESSION:
+            context, chat_history, usage = assemble_prompt(retrieval.question, context, chat_history, retrieval.scores)
+        inputs = {**retrieval_input, "chat_history": chat_history, "context": context}
+        messages = answer_prompt.format_messages(
+            input=inputs["input"], chat_history=chat_history, context="\n\n".join(d.page_content for d in context)
+        )
+        usage["prompt_tokens"] = sum(count_tokens(m.content) for m in messages)
+    metrics.tokens.inc(usage["prompt_tokens"], kind="prompt")
+    return inputs, usage
+
+def _count_completion(usage: dict, answer: str):
+    usage["completion_tokens"] = count_tokens(answer)
+    metrics.tokens.inc(usage["completion_tokens"], kind="completion")
+
+def _no_evidence(retrieval: Retrieval) -> bool:
+    # 캐시에 없는 질문만 판정합니다. 사전 판정 거절은 기준을 다시 맞추면 바뀌므로 캐시에 넣지 않습니다.
+    if refusal_thresholds is None or retrieval.cached is not None:
+        return False
+    with span("refusal_check"):
+        check = precheck(retrieval.question, retrieval.context, retrieval.scores, corpus.sparse_index, refusal_thresholds)
+    metrics.refusal_prechecks.inc(decision="refused" if check.refuse else "passed")
+    return check.refuse
+
+async def _remember(retrieval: Retrieval, answer: str, sources: list, is_refusal: bool):
+    if answer_cache is not None:
+        await answer_cache.astore(retrieval.vector, {"answer": answer, "sources": sources, "is_refusal": is_refusal}, retrieval.partition)
+
+# 🟢 [신규] 서빙 코퍼스 전환 (블루/그린, 재시작 없음)
+# 요청마다 레지스트리 파일의 mtime만 봅니다. (stat 한 번) 바뀌었으면 새 활성 버전을 백그라운드에서 올려
+# 질의 벡터 차원과 검색 결과를 확인(겸 예열)한 뒤 corpus 참조 하나만 바꿉니다. 그동안 요청은 지금 버전으로 처리합니다.
+# 검증에 실패하면 지금 버전을 그대로 쓰고, 레지스트리가 다시 바뀔 때 다시 시도합니다.
+CORPUS_PROBE_QUERY = os.getenv("CORPUS_PROBE_QUERY", "K리그 선수 등록 규정")
+CORPUS_CLOSE_DELAY = float(os.getenv("CORPUS_CLOSE_DELAY", "60"))
+_corpus_switch: Optional[asyncio.Task] = None
+
+def _follow_registry():
+    global _registry_mtime, _corpus_switch
+    mtime = corpus_registry.mtime()
+    if mtime == _registry_mtime or _corpus_switch is not None:
+        return
+    _registry_mtime = mtime
+    _corpus_switch = asyncio.create_task(_switch_corpus())
+
+async def _switch_corpus():
+    global _corpus_switch
+    version = serving = None
+    try:
+        version, meta = corpus_registry.active()
+        if version is None or version == corpus.version:
+            return
+        started = time.perf_counter()
+        serving = await asyncio.to_thread(_load_corpus, version, meta)
+        await clients.open_vectorstore(serving.vectorstore)
+        vector = await embeddings.aembed_query(CORPUS_PROBE_QUERY)
+        if meta.get("dim") and len(vector) != meta["dim"]:
+            raise ValueError(f"질의 벡터 차원 {len(vector)} != 코퍼스 {meta['dim']}")
+        if not await _dense_search(serving.vectorstore, vector, 1, None):
+            raise ValueError("검색 결과가 비었습니다.")
+        previous = _install_corpus(serving)
+        serving = None
+        print(f"🔀 서빙 코퍼스 전환: {previous or '(기본)'} → {version} ({time.perf_counter() - started:.1f}초)")
+    except Exception as e:
+        print(f"⚠️ 코퍼스 {version} 전환 실패, {corpus.version or '(기본)'} 유지: {e}")
+        if serving is not None:
+            await clients.close_vectorstore(serving.vectorstore)
+    finally:
+        _corpus_switch = None
+
+def _install_corpus(serving: ServingCorpus) -> Optional[str]:
+    # await 없이 한 번에 바꾸므로 이벤트 루프 안의 요청은 바뀌기 전이나 후 중 하나만 봅니다.
+    global corpus, router_chain, history_router_chain, preclassifier
+    previous, corpus = corpus, serving
+    # 이전 버전으로 검색 중인 요청이 끝날 시간을 준 뒤 그 벡터 DB 세션을 닫습니다.
+    asyncio.create_task(clients.close_vectorstore(previous.vectorstore, delay=CORPUS_CLOSE_DELAY))
+    if serving.titles != previous.titles:
+        # 라우터 프롬프트와 사전 분류기는 규정집 목록으로 만들어지므로 목록이 바뀌었을 때만 다시 만듭니다.
+        router_chain = get_router_chain(serving.titles)
+        history_router_chain = get_router_chain(serving.titles, with_history=True)
+        preclassifier = KeywordPreclassifier(serving.titles)
+    if rerank_stage is not None and isinstance(rerank_stage.reranker, LexicalReranker):
+        # 단어 가중치(IDF)는 서빙 코퍼스의 BM25 인덱스에서 가져옵니다.
+        rerank_stage.reranker.sparse = serving.sparse_index
+    return previous.version
+
+async def _route_and_retrieve(message: str, retrieval_input: dict):
+    # 1. 🟢 [신규 로직] DB 검색 전에 질문 의도부터 파악 (라우팅)
+    #    - 로컬 사전 분류기가 확신하면 라우터 LLM을 아예 건너뜁니다.
+    #    - 아니면 라우터와 임베딩 + 범위 없는 후보 검색을 동시에 시작하고, 거절 도메인이면 취소합니다.
+    #    - 이전 대화를 가리키는 질문은 라우터 한 번으로 분류 + 독립 질문 재구성을 같이 받고, 그 질문으로 임베딩합니다.
+    #    - 라우터가 고른 리그·규정집 범위는 미리 찾은 후보를 거르는 데 쓰고, 남은 게 모자랄 때만 범위 검색을 다시 합니다.
+    _follow_registry()
+    retrieval_task = None
+    try:
+        chat_history = retrieval_input["chat_history"]
+        question = message
+        if _needs_rewrite(message, chat_history):
+            route = await _classify(message, chat_history)
+            question = getattr(route, "standalone_question", None) or message
+        else:
+            with span("preclassify"):
+                domain = preclassifier.classify(message) if LOCAL_PRECLASSIFY else None
+            if domain is not None:
+                route = RouteQuery(domain=domain)
+            else:
+                if SPECULATIVE_RETRIEVAL:
+                    retrieval_task = asyncio.create_task(_speculate(question))
+                route = await _classify(message)
+
+        if route.domain in DOMAIN_REFUSALS:
+            return route.domain, None
+        prepared = await retrieval_task if retrieval_task is not None else await _prepare(question)
+        scope = _scope(route)
+        return route.domain, await _search(await _lookup(prepared, _cache_partition(route.domain, scope)), scope)
+    finally:
+        # 거절 도메인이거나 도중에 실패했다면 미리 시작한 검색은 버립니다.
+        if retrieval_task is not None and not retrieval_task.done():
+            retrieval_task.cancel()
+
+def _source_card(doc) -> dict:
+    meta = doc.metadata
+    if "doc_id" in meta:
+        # 인제스트 때 만들어 둔 값 그대로 (backend/catalog.py source_fields)
+        source = {"file": meta["title"], "raw_file": meta["file"], "page": meta["page_number"], "preview": meta["preview"]}
+        if "citation" in meta:
+            source["article"] = meta["citation"]
+        return source
+    # 메타데이터 버전 3 이전에 올린 청크: 예전처럼 요청마다 만듭니다.
+    raw_source = os.path.basename(meta.get("source", "Unknown"))
+    source = {
+        "file": corpus.titles.get(raw_source, raw_source.replace(".pdf", "")),
+        "raw_file": raw_source,
+        "page": int(meta.get("page", 0)) + 1,
+        "preview": doc.page_content[:100],
+    }
+    # 조항 단위로 자른 청크는 조항 번호를 같이 넘겨, LLM이 찾지 않아도 정확히 인용할 수 있게 합니다.
+    if meta.get("article"):
+        source["article"] = " ".join(x for x in (meta.get("appendix"), meta["article"], meta.get("article_title")) if x)
+    return source
+
+def _build_sources(context) -> list:
+    # 출처(Source) 가공 및 전달 (같은 문서·쪽은 한 번만, 최대 3개)
+    sources = []
+    seen = set()
+    for doc in context:
+        source = _source_card(doc)
+        key = (source["raw_file"], source["page"])
+        if key not in seen:
+            seen.add(key)
+            sources.append(source)
+            if len(sources) == 3:
+                break
+    return sources
+
 @app.post("/chat")
-def chat_endpoint(request: ChatRequest):
+async def chat_endpoint(request: ChatRequest):
     start_time = time.time()
-    
+    await _ensure_ready()
+
+    # 🟢 스레드풀 대신 이벤트 루프에서 처리하고, 업스트림 호출 수는 리미터로 제한합니다.
+    #    (혼잡 시 429/503 + Retry-After 는 500으로 감싸지 않도록 try 밖에서 처리)
+    async with upstream_limiter.slot():
+        with metrics.request_span("/chat"):
+            return await _answer(request, start_time)
+
+async def _answer(request: ChatRequest, start_time: float):
     try:
-        # 1. 🟢 [신규 로직] DB 검색 전에 질문 의도부터 파악 (라우팅)
-        classification = router_chain.invoke({"question": request.message})
-        domain = classification.domain
+        retrieval_input = {"input": request.message, "chat_history": await session_store.amessages(request.session_id)}
+        domain, retrieval = await _route_and_retrieve(request.message, retrieval_input)
 
-        final_answer = ""
         sources = []
-        is_refusal = False
-
+        usage = {"prompt_tokens": 0, "completion_tokens": 0}
         # 2. 🟢 [신규 로직] 라우팅 결과에 따른 완벽한 분기 처리 (Early Return)
-        if domain == "비관련":
-            final_answer = "죄송합니다. 저는 스포츠 규정 전문 에이전트 '책첵'입니다. 스포츠 규정과 관련된 질문에만 답변해 드릴 수 있습니다. 🙇‍♂️"
-            is_refusal = True
-            
-        elif domain == "미지원스포츠":
-            final_answer = "질문해주신 종목(또는 기관)의 규정은 현재 책첵(Chaek-Check)에 업데이트를 준비하고 있습니다! 🙇‍♂️ 현재 베타 버전에서는 K리그 및 KBO 관련 공식 규정을 중심으로 팩트체크를 지원하고 있습니다. 조금만 기다려 주시면 더 다양한 스포츠 규정으로 찾아뵙겠습니다."
-            is_refusal = True
-            
+        if domain in DOMAIN_REFUSALS:
+            final_answer = DOMAIN_REFUSALS[domain]
+            refusal_reason = "domain"
+            metrics.annotate(outcome="domain_refusal")
+        elif retrieval.cached is not None:
+            # 🟢 [신규] 비슷한 질문에 대한 답이 캐시에 있으면 검색·답변 LLM을 건너뜁니다.
+            final_answer = retrieval.cached["answer"]
+            sources = retrieval.cached["sources"]
+            # 캐시에는 답변 LLM이 만든 답만 들어갑니다.
+            refusal_reason = "model" if retrieval.cached["is_refusal"] else None
+            await session_store.aappend_turn(request.session_id, request.message, final_answer)
+            metrics.annotate(outcome="cached")
+        elif _no_evidence(retrieval):
+            # 🟢 [신규] 검색 근거가 기준 미만이면 답변 LLM 없이 거절합니다.
+            final_answer = NO_EVIDENCE_ANSWER
+            refusal_reason = "no_evidence"
+            await session_store.aappend_turn(request.session_id, request.message, final_answer)
+            metrics.annotate(outcome="no_evidence")
         else:
-            conversational_rag_chain = RunnableWithMessageHistory(
-                rag_chain_instance,
-                get_session_history,
-                input_messages_key="input",
-                history_messages_key="chat_history",
-                output_messages_key="answer",
-            )
-            
-            result = conversational_rag_chain.invoke(
-                {"input": request.message},
-                config={"configurable": {"session_id": request.session_id}}
-            )
-            
-            raw_answer = result["answer"]
-            final_answer = raw_answer
-            
-            # 🟢 [수정된 로직] RAG가 정답을 못 찾고 '우아한 거절'을 했을 때 출처 카드를 차단합니다!
-            is_refusal = "명확한 조항을 찾을 수 없습니다" in final_answer
+            inputs, usage = _answer_inputs(retrieval, retrieval_input)
+            with span("answer"):
+                final_answer = await answer_chain.ainvoke(inputs)
+            _count_completion(usage, final_answer)
+            await session_store.aappend_turn(request.session_id, request.message, final_answer)
 
-            # 출처(Source) 가공 및 전달
-            sources = []
+            # 🟢 [수정된 로직] RAG가 정답을 못 찾고 '우아한 거절'을 했을 때 출처 카드를 차단합니다!
+            is_refusal = REFUSAL_MARKER in final_answer
+            refusal_reason = "model" if is_refusal else None
             # 🚨 [수정된 로직] is_refusal이 아닐 때(정상 답변일 때)만 출처를 만듭니다!
-            if "context" in result and not is_refusal: 
-                seen = set()
-                for doc in result["context"]:
-                    raw_source = os.path.basename(doc.metadata.get("source", "Unknown"))
-                    clean_source = REGULATION_NAMES.get(raw_source, raw_source.replace(".pdf", ""))
-                    page = int(doc.metadata.get("page", 0)) + 1
-                    key = f"{clean_source}-{page}"
-                    
-                    if key not in seen:
-                        seen.add(key)
-                        sources.append({
-                            "file": clean_source,
-                            "raw_file": raw_source,
-                            "page": page,
-                            "preview": doc.page_content[:100]
-                        })
-                sources = sources[:3]  # 최대 5개 출처까지만 전달
-                        
+            if not is_refusal:
+                with span("sources"):
+                    sources = _build_sources(inputs["context"])
+            await _remember(retrieval, final_answer, sources, is_refusal)
+            metrics.annotate(outcome="refusal" if is_refusal else "answered")
+
         end_time = time.time()  # 🟢 3. 모든 작업이 끝난 후 스톱워치 종료!
         generation_time = round(end_time - start_time, 2)  # 소수점 둘째 자리까지 반올림 (예: 3.45)
         
-        return {
+        response = {
             "answer": final_answer,
             "sources": sources,
-            "generation_time": generation_time
+            # 🟢 [신규] 거절 여부를 답변 문구가 아니라 필드로 (refusal_reason: domain / no_evidence / model)
+            "is_refusal": refusal_reason is not None,
+            "refusal_reason": refusal_reason,
+            "generation_time": generation_time,
+            # 🟢 [신규] 답변 LLM 토큰 (프롬프트는 tiktoken으로 센 값, 캐시·거절 응답은 0)
+            "usage": usage,
         }
+        if request.debug and CHAT_DEBUG:
+            # 🟢 [신규] 단계별 소요 시간(ms). 투기적 실행 중인 단계는 겹쳐서 돌기 때문에 합이 전체보다 클 수 있습니다.
+            response["debug"] = {"stages_ms": metrics.breakdown()}
+        return response
         
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        metrics.annotate(outcome="error")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# 9. 🟢 [신규] SSE 스트리밍 엔드포인트
+# 이벤트 순서: sources (검색 직후) → token (여러 번) → [withdraw_sources] → done (타이밍 포함)
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _release_once():
+    released = False
+
+    def release():
+        # 스트림이 정상 종료되든, 시작도 못 하고 끊기든 슬롯은 정확히 한 번만 반납합니다.
+        nonlocal released
+        if not released:
+            released = True
+            upstream_limiter.release()
+
+    return release
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    start_time = time.time()
+    await _ensure_ready()
+    # 혼잡하면 스트림을 열기 전에 429/503을 돌려줍니다. 슬롯은 스트림이 끝날 때 반납합니다.
+    await upstream_limiter.acquire()
+    release = _release_once()
+
+    return StreamingResponse(
+        _stream_answer(request, start_time, release),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(release),
+    )
+
+async def _stream_answer(request: ChatRequest, start_time: float, release):
+    timings = {}
+
+    def mark(name):
+        timings[name] = round(time.time() - start_time, 3)
+
+    def done(payload):
+        # debug 요청이면 done 이벤트에 단계별 소요 시간도 붙입니다.
+        if request.debug and CHAT_DEBUG:
+            payload["debug"] = {"stages_ms": metrics.breakdown()}
+        return _sse("done", payload)
+
+    try:
+        with metrics.request_span("/chat/stream"):
+            retrieval_input = {"input": request.message, "chat_history": await session_store.amessages(request.session_id)}
+            domain, retrieval = await _route_and_retrieve(request.message, retrieval_input)
+            mark("retrieval")
+
+            if domain in DOMAIN_REFUSALS:
+                metrics.annotate(outcome="domain_refusal")
+                yield _sse("token", {"text": DOMAIN_REFUSALS[domain]})
+                mark("total")
+                yield done({"is_refusal": True, "refusal_reason": "domain", "cached": False, "timings": timings})
+                return
+
+            if retrieval.cached is not None:
+                metrics.annotate(outcome="cached")
+                cached = retrieval.cached
+                if cached["sources"]:
+                    yield _sse("sources", {"sources": cached["sources"]})
+                yield _sse("token", {"text": cached["answer"]})
+                await session_store.aappend_turn(request.session_id, request.message, cached["answer"])
+                mark("total")
+                yield done({"is_refusal": cached["is_refusal"], "refusal_reason": "model" if cached["is_refusal"] else None, "cached": True, "timings": timings})
+                return
+
+            if _no_evidence(retrieval):
+                # 검색 근거가 기준 미만: 출처 카드 없이 거절 문구만 보냅니다. (답변 LLM 호출 없음)
+                metrics.annotate(outcome="no_evidence")
+                yield _sse("token", {"text": NO_EVIDENCE_ANSWER})
+                await session_store.aappend_turn(request.session_id, request.message, NO_EVIDENCE_ANSWER)
+                mark("total")
+                yield done({"is_refusal": True, "refusal_reason": "no_evidence", "cached": False, "timings": timings})
+                return
+
+            inputs, usage = _answer_inputs(retrieval, retrieval_input)
+            with span("sources"):
+                sources = _build_sources(inputs["context"])
+            yield _sse("sources", {"sources": sources})
+
+            # 토큰을 받는 대로 흘려보내면서, 답변이 '우아한 거절'로 바뀌면 출처 카드를 회수합니다.
+            answer = ""
+            is_refusal = False
+            with span("answer"):
+                async for chunk in answer_chain.astream(inputs):
+                    if not chunk:
+                        continue
+                    if not answer:
+                        mark("first_token")
+                    answer += chunk
+                    yield _sse("token", {"text": chunk})
+                    if not is_refusal and REFUSAL_MARKER in answer:
+                        is_refusal = True
+                        if sources:
+                            yield _sse("withdraw_sources", {})
+
+            await session_store.aappend_turn(request.session_id, request.message, answer)
+            await _remember(retrieval, answer, [] if is_refusal else sources, is_refusal)
+            _count_completion(usage, answer)
+            metrics.annotate(outcome="refusal" if is_refusal else "answered")
+            mark("total")
+            yield done({"is_refusal": is_refusal, "refusal_reason": "model" if is_refusal else None, "cached": False, "timings": timings, "usage": usage})
+
+    except Exception as e:
+        yield _sse("error", {"detail": str(e)})
+    finally:
+        release()
+
+# 10. 🟢 [신규] 배치 질의 엔드포인트 (클럽 라이선스 체크리스트처럼 질문 여러 개를 한 번에)
+# - 질문마다 대화 기록 없이 독립적으로 답합니다. (재구성 호출 없음)
+# - 로컬 사전 분류로 못 정한 질문만 라우터를 동시에 부르고, 그동안 모든 질문을 임베딩 요청 한 번으로 보냅니다.
+# - 벡터 검색은 동시에 돌리고, 검색된 청크가 BATCH_SHARED_OVERLAP(Jaccard) 이상 겹치는 질문은 컨텍스트를 합쳐
+#   한 번만 보내 답변 LLM 한 번으로 같이 답합니다. (합친 컨텍스트도 CONTEXT_COMPRESSION 예산 안으로 줄임)
+# - 결과는 끝나는 순서대로 NDJSON 한 줄씩 보냅니다. (index가 요청 순번, 마지막 줄은 {"done": true, ...})
+# - 검색 근거가 기준 미만인 질문(거절 사전 판정)은 묶음에서 빼고 바로 거절합니다. (완료 줄의 no_evidence)
+# - 리미터 슬롯은 배치 전체로 쥐지 않고 업스트림 호출(라우터·임베딩·답변)마다 하나씩 씁니다. (배치가 동시에 부르는 만큼 셈)
+#   배치 안의 동시 호출은 BATCH_CONCURRENCY개로 제한합니다.
+# - 라우터·검색·답변 중 한 질문이 실패해도 그 질문만 {"index", "question", "error"} 줄로 보내고 나머지는 계속 답합니다.
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "100"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "16"))
+BATCH_SHARED_CONTEXT_MAX = int(os.getenv("BATCH_SHARED_CONTEXT_MAX", "4"))
+BATCH_SHARED_OVERLAP = float(os.getenv("BATCH_SHARED_OVERLAP", "0.5"))
+
+class BatchRequest(BaseModel):
+    questions: List[str] = Field(min_length=1, max_length=BATCH_MAX_QUESTIONS)
+
+@app.post("/chat/batch")
+async def chat_batch_endpoint(request: BatchRequest):
+    start_time = time.time()
+    await _ensure_ready()
+    # 혼잡하면 /chat처럼 바로 429/503으로 돌려보냅니다. (슬롯은 호출마다 다시 잡으므로 여기서는 바로 반납)
+    async with upstream_limiter.slot():
+        pass
+    return StreamingResponse(
+        _batch_answers(request.questions, start_time),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def _batch_route(texts: List[str], gate: asyncio.Semaphore, stats: dict) -> list:
+    # → 질문별 RouteQuery, 라우터 호출이 실패한 질문은 그 예외
+    with span("preclassify"):
+        routes = [RouteQuery(domain=d) if d else None for d in (preclassifier.classify(t) if LOCAL_PRECLASSIFY else None for t in texts)]
+    pending = [i for i, route in enumerate(routes) if route is None]
+
+    async def route_one(text):
+        try:
+            async with gate, upstream_limiter.slot():
+                return await router_chain.ainvoke({"question": text})
+        except Exception as e:
+            return e
+
+    if pending:
+        with span("router"):
+            routed = await asyncio.gather(*(route_one(texts[i]) for i in pending))
+        for i, route in zip(pending, routed):
+            routes[i] = route
+    stats["router_calls"] = len(pending)
+    return routes
+
+async def _batch_embed(texts: List[str]) -> List[list]:
+    # 캐시에 없는 질문만 모아 임베딩 API 한 번으로 보냅니다. (CachedEmbeddings.aembed_queries, 질문은 메모리 LRU에만)
+    with span("embed"):
+        async with upstream_limiter.slot():
+            return await embeddings.aembed_queries(texts)
+
+async def _batch_retrieve(texts: List[str], stats: dict):
+    # → (질문별 라우팅 결과, 검색 결과). 라우터나 검색이 실패한 질문은 검색 결과 자리에 그 예외가 들어갑니다.
+    _follow_registry()
+    gate = asyncio.Semaphore(BATCH_CONCURRENCY)
+    routes, vectors = await asyncio.gather(_batch_route(texts, gate, stats), _batch_embed(texts))
+
+    async def one(question, route, vector):
+        if isinstance(route, Exception):
+            return route
+        if route.domain in DOMAIN_REFUSALS:
+            return None
+        scope = _scope(route)
+        prepared = await _lookup(Retrieval(question, vector, [], None), _cache_partition(route.domain, scope))
+        try:
+            async with gate:
+                return await _search(prepared, scope)
+        except Exception as e:
+            return e
+
+    retrievals = await asyncio.gather(*(one(t, r, v) for t, r, v in zip(texts, routes, vectors)))
+    return routes, retrievals
+
+async def _batch_answer_one(retrieval: Retrieval, gate: asyncio.Semaphore, stats: dict) -> dict:
+    inputs, usage = _answer_inputs(retrieval, {"input": retrieval.question, "chat_history": []})
+    async with gate, upstream_limiter.slot():
+        with span("answer"):
+            answer = await answer_chain.ainvoke(inputs)
+    stats["answer_calls"] += 1
+    _count_completion(usage, answer)
+    is_refusal = REFUSAL_MARKER in answer
+    sources = [] if is_refusal else _build_sources(inputs["context"])
+    await _remember(retrieval, answer, sources, is_refusal)
+    return {"answer": answer, "sources": sources, "is_refusal": is_refusal, "refusal_reason": "model" if is_refusal else None, "cached": False, "usage": usage}
+
+async def _batch_answer_group(group: List[int], retrievals: List[Retrieval], gate: asyncio.Semaphore, stats: dict) -> dict:
+    # 질문 하나면 평소처럼, 여럿이면 공유 컨텍스트로 한 번에 답하고 나눠 받습니다. (실패하면 질문별로)
+    if len(group) > 1:
+        first = retrievals[group[0]]
+        questions = [retrievals[i].question for i in group]
+        context = merge_contexts([retrievals[i].context for i in group])
+        scores = {}
+        for i in group:
+            for key, score in (retrievals[i].scores or {}).items():
+                scores[key] = max(score, scores.get(key, score))
+        shared = first._replace(question=" ".join(questions), context=context, scores=scores)
+        inputs, usage = _answer_inputs(shared, {"input": shared_input(questions), "chat_history": []})
+        async with gate, upstream_limiter.slot():
+            with span("answer"):
+                text = await answer_chain.ainvoke(inputs)
+        stats["answer_calls"] += 1
+        answers = split_answers(text, len(group))
+        if answers is not None:
+            stats["shared_groups"] += 1
+            sources = _build_sources(inputs["context"])
+            results = {}
+            for i, answer in zip(group, answers):
+                is_refusal = REFUSAL_MARKER in answer
+                item_usage = {"prompt_tokens": usage["prompt_tokens"] // len(group), "shared": len(group)}
+                _count_completion(item_usage, answer)
+                await _remember(retrievals[i], answer, [] if is_refusal else sources, is_refusal)
+                results[i] = {
+                    "answer": answer,
+                    "sources": [] if is_refusal else sources,
+                    "is_refusal": is_refusal,
+                    "refusal_reason": "model" if is_refusal else None,
+                    "cached": False,
+                    "usage": item_usage,
+                }
+            return results
+    results = await asyncio.gather(*(_batch_answer_one(retrievals[i], gate, stats) for i in group))
+    return dict(zip(group, results))
+
+async def _batch_answers(questions: List[str], start_time: float):
+    def line(data) -> str:
+        return json.dumps(data, ensure_ascii=False) + "\n"
+
+    stats = {"router_calls": 0, "answer_calls": 0, "shared_groups": 0, "no_evidence": 0, "errors": 0}
+    try:
+        with metrics.request_span("/chat/batch"):
+            unique = unique_questions(questions)
+            indices = list(unique.values())
+            texts = [questions[ids[0]] for ids in indices]
+            routes, retrievals = await _batch_retrieve(texts, stats)
+
+            def emit(u, result):
+                # 같은 질문이 여러 번 들어왔으면 원래 순번마다 한 줄씩
+                elapsed = round(time.time() - start_time, 2)
+                return "".join(line({"index": i, "question": questions[i], **result, "elapsed": elapsed}) for i in indices[u])
+
+            pending = {}
+            for u, (route, retrieval) in enumerate(zip(routes, retrievals)):
+                if isinstance(retrieval, Exception):
+                    stats["errors"] += 1
+                    yield emit(u, {"error": str(retrieval)})
+                elif route.domain in DOMAIN_REFUSALS:
+                    yield emit(u, {"answer": DOMAIN_REFUSALS[route.domain], "sources": [], "is_refusal": True, "refusal_reason": "domain", "cached": False})
+                elif retrieval.cached is not None:
+                    yield emit(u, {**retrieval.cached, "refusal_reason": "model" if retrieval.cached["is_refusal"] else None, "cached": True})
+                elif _no_evidence(retrieval):
+                    # 근거가 없는 질문은 묶음에서 빼 답변 LLM에 보내지 않습니다.
+                    stats["no_evidence"] += 1
+                    yield emit(u, {"answer": NO_EVIDENCE_ANSWER, "sources": [], "is_refusal": True, "refusal_reason": "no_evidence", "cached": False})
+                else:
+                    pending[u] = retrieval.context
+
+            gate = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+            async def answer_group(group):
+                # 한 묶음이 실패해도 나머지 질문은 계속 답합니다.
+                try:
+                    return await _batch_answer_group(group, retrievals, gate, stats)
+                except Exception as e:
+                    stats["errors"] += len(group)
+                    return {u: {"error": str(e)} for u in group}
+
+            tasks = [asyncio.ensure_future(answer_group(g)) for g in group_by_context(pending, BATCH_SHARED_CONTEXT_MAX, BATCH_SHARED_OVERLAP)]
+            try:
+                for task in asyncio.as_completed(tasks):
+                    for u, result in (await task).items():
+                        yield emit(u, result)
+            finally:
+                # 클라이언트가 끊었으면 남은 답변 호출은 버립니다.
+                for task in tasks:
+                    task.cancel()
+            metrics.annotate(outcome="error" if stats["errors"] else "answered")
+
+            yield line({
+                "done": True,
+                "questions": len(questions),
+                "unique_questions": len(texts),
+                **stats,
+                "generation_time": round(time.time() - start_time, 2),
+            })
+    except Exception as e:
+        yield line({"error": str(e)})
@@ -0,0 +1,191 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+# 🟢 단계별 지연 시간 계측 (/metrics, 선택적으로 OpenTelemetry)
+# - span("router") 처럼 단계를 감싸면 Prometheus 히스토그램에 기록하고, 요청별 내역(breakdown)에도 더합니다.
+# - Prometheus 텍스트 형식은 직접 만듭니다. (히스토그램·카운터·게이지만 쓰므로 prometheus_client 의존성 없이)
+# - OTEL_EXPORTER_OTLP_ENDPOINT가 있으면 같은 단계를 OpenTelemetry 스팬으로도 내보냅니다. (requirements.txt의 OTel SDK)
+# - 값은 워커 프로세스별입니다. 워커가 여럿이면 워커마다 긁거나 워커 1개로 띄워 보세요.
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _labels(names, values) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{str(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), buckets=STAGE_BUCKETS):
+        self.name, self.help, self.labelnames, self.buckets = name, help, labelnames, buckets
+        self._series = {}  # label 값 → [버킷별 개수..., 합계, 개수]
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            series = self._series.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames + ('le',), key + (bound,))} {count}")
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames + ('le',), key + ('+Inf',))} {series[-1]}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {series[-2]}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+class Counter:
+    kind, suffix = "counter", "_total"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (), collect: Optional[Callable[[], Dict[tuple, float]]] = None):
+        # collect를 주면 긁을 때마다 그 함수가 돌려주는 값(다른 객체가 세고 있는 누적값)을 그대로 씁니다.
+        self.name, self.help, self.labelnames, self.collect = name, help, labelnames, collect
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            values = dict(self._values)
+        if self.collect is not None:
+            values.update(self.collect())
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{self.suffix}{_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    # 현재 값(세션 수 등). 보통 collect로 긁을 때마다 읽어 옵니다.
+    kind, suffix = "gauge", ""
+
+
+REGISTRY: List = []
+
+
+def render() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+stage_seconds = Histogram("chaekcheck_stage_seconds", "단계별 소요 시간 (초)", ("stage",))
+request_seconds = Histogram("chaekcheck_request_seconds", "요청 전체 소요 시간 (초)", ("endpoint", "outcome"))
+tokens = Counter("chaekcheck_tokens", "답변 LLM 토큰 수 (tiktoken 기준)", ("kind",))
+rerank_outcomes = Counter("chaekcheck_rerank", "재정렬 단계 결과 (applied / skipped_budget / skipped_deadline / error)", ("outcome",))
+refusal_prechecks = Counter("chaekcheck_refusal_precheck", "검색 근거 거절 사전 판정 (refused = 답변 LLM 호출 생략)", ("decision",))
+context_chunks = Histogram("chaekcheck_context_chunks", "답변 LLM에 넘긴 청크 수", buckets=(1, 2, 3, 4, 5, 6, 8, 10))
+
+
+# --- 요청별 내역 & OpenTelemetry ---
+
+_request: ContextVar[Optional[dict]] = ContextVar("chaekcheck_request", default=None)
+_tracer = None
+
+
+def setup_tracing(service_name: str = "chaekcheck-api"):
+    # OTEL_EXPORTER_OTLP_ENDPOINT가 없으면 아무것도 하지 않습니다. (SDK import도 안 함)
+    global _tracer
+    if not os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT"):
+        return None
+    from opentelemetry import trace
+    from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+
+    provider = TracerProvider(resource=Resource.create({"service.name": os.getenv("OTEL_SERVICE_NAME", service_name)}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    trace.set_tracer_provider(provider)
+    _tracer = trace.get_tracer("chaekcheck")
+    return _tracer
+
+
+@contextmanager
+def request_span(endpoint: str):
+    # 요청 하나의 루트. 안에서 부르는 span()은 여기 내역에 더해지고, OTel에서는 이 스팬의 자식이 됩니다.
+    # (asyncio 태스크는 생성 시점의 컨텍스트를 복사하므로 투기적 태스크의 단계도 같은 내역에 모입니다.)
+    state = {"stages": {}, "outcome": "ok", "root": None, "started": time.perf_counter()}
+    if _tracer is not None:
+        state["root"] = _tracer.start_span(endpoint)
+    token = _request.set(state)
+    try:
+        yield state
+    except BaseException:
+        state["outcome"] = "error"
+        raise
+    finally:
+        try:
+            _request.reset(token)
+        except ValueError:
+            pass  # 스트림이 끊겨 다른 컨텍스트에서 제너레이터가 닫힌 경우
+        request_seconds.observe(time.perf_counter() - state["started"], endpoint=endpoint, outcome=state["outcome"])
+        if state["root"] is not None:
+            state["root"].set_attribute("chaekcheck.outcome", state["outcome"])
+            state["root"].end()
+
+
+@contextmanager
+def span(stage: str, **attributes):
+    state = _request.get()
+    otel_span = None
+    if _tracer is not None:
+        from opentelemetry import trace
+
+        # 스트리밍 제너레이터 안에서도 쓰므로 현재 컨텍스트에 붙이지(attach) 않고 부모만 지정합니다.
+        parent = trace.set_span_in_context(state["root"]) if state and state["root"] is not None else None
+        otel_span = _tracer.start_span(stage, context=parent, attributes=attributes or None)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        stage_seconds.observe(elapsed, stage=stage)
+        if state is not None:
+            state["stages"][stage] = state["stages"].get(stage, 0.0) + elapsed
+        if otel_span is not None:
+            otel_span.end()
+
+
+def annotate(**attributes):
+    # 현재 요청의 결과 표시 (outcome 등) + OTel 루트 스팬 속성
+    state = _request.get()
+    if state is None:
+        return
+    if "outcome" in attributes:
+        state["outcome"] = attributes["outcome"]
+    if state["root"] is not None:
+        for key, value in attributes.items():
+            state["root"].set_attribute(f"chaekcheck.{key}", value)
+
+
+def request_elapsed() -> Optional[float]:
+    # 현재 요청이 시작된 뒤 지난 시간 (초). 요청 밖(벤치, 스크립트)이면 None
+    state = _request.get()
+    return None if state is None else time.perf_counter() - state["started"]
+
+
+def breakdown() -> Dict[str, float]:
+    # 현재 요청의 단계별 소요 시간 (ms)
+    state = _request.get()
+    if state is None:
+        return {}
+    return {stage: round(seconds * 1000, 1) for stage, seconds in state["stages"].items()}
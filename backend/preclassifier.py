@@ -0,0 +1,124 @@
+import re
+
+from backend.regulations import LEAGUE_BY_PREFIX, league_of
+
+# 🟢 로컬 사전 분류기 (라우터 LLM 호출 생략용)
+# 리그명·구단 정식 명칭·규정집 이름처럼 한쪽 리그에만 걸리는 "뻔한" 질문은 LLM 없이 바로 분류합니다.
+# "축구", "투수", "홈런", 연고지·모기업·애칭("울산", "삼성", "이글스")처럼 다른 종목·리그에도 쓰이는 말만 있으면
+# None을 돌려주고 라우터에 맡깁니다. (그런 말은 is_self_contained에서 질문이 주제를 밝혔는지 볼 때만 씁니다)
+
+# 리그 / 구단 정식 명칭 (분류에 씀)
+LEAGUE_TERMS = {
+    "K리그": [
+        "k리그", "케이리그", "kleague", "k league", "프로축구", "프로축구연맹", "k리그1", "k리그2",
+        "울산hd", "울산현대", "전북현대", "포항스틸러스", "fc서울", "수원fc", "수원삼성블루윙즈", "수원삼성",
+        "인천유나이티드", "대구fc", "광주fc", "강원fc", "제주유나이티드", "대전하나시티즌", "대전하나",
+        "김천상무", "부산아이파크", "전남드래곤즈", "성남fc", "부천fc", "fc안양", "경남fc", "충남아산",
+        "서울이랜드", "천안시티", "충북청주", "안산그리너스",
+    ],
+    "KBO": [
+        "kbo", "프로야구", "퓨처스리그", "공식야구규칙",
+        "두산베어스", "lg트윈스", "ssg랜더스", "키움히어로즈", "kt위즈", "nc다이노스", "기아타이거즈",
+        "kia타이거즈", "롯데자이언츠", "삼성라이온즈", "한화이글스",
+    ],
+}
+
+# 종목 일반 용어·애칭 (분류에는 쓰지 않음)
+SPORT_TERMS = {
+    "K리그": [
+        "축구", "축구연맹", "승강", "강등", "승격", "b팀", "k3", "유스", "유소년", "라이센싱", "라이선스",
+        "재정건전", "오프사이드", "페널티킥", "코너킥", "골키퍼", "울산", "전북", "포항", "안양",
+    ],
+    "KBO": [
+        "야구", "투수", "타자", "포수", "이닝", "홈런", "볼넷", "스트라이크", "타석", "도루", "번트",
+        "사용구", "샐러리캡", "퓨처스", "보상선수", "신인드래프트", "육성선수",
+        "두산", "베어스", "트윈스", "ssg", "랜더스", "키움", "히어로즈", "위즈", "다이노스", "kia",
+        "타이거즈", "롯데", "자이언츠", "라이온즈", "한화", "이글스",
+    ],
+}
+
+# 이런 단어가 섞여 있으면 미지원 종목일 수 있으니 판단을 라우터에 넘깁니다.
+UNSUPPORTED_TERMS = [
+    "농구", "배구", "kbl", "wkbl", "v리그", "lck", "e스포츠", "리그오브레전드", "mlb", "메이저리그",
+    "npb", "epl", "프리미어리그", "라리가", "분데스리가", "챔피언스리그", "uefa", "fifa",
+    "월드컵", "afc", "kfa", "국가대표", "골프", "테니스", "배드민턴", "ufc",
+]
+
+# 이전 대화를 가리키는 표현 (지시어·접속어·생략). 이런 말이 있으면 질문을 재구성해야 검색이 됩니다.
+ANAPHORA_RE = re.compile(
+    r"그거|그것|그건|그게|그걸|이거|이것|이건|이게|저거|저것|거기|여기|그때|그럼|그러면|그렇다면|그런데|근데|"
+    r"그리고|그래서|그밖|나머지|마찬가지|반대로|방금|아까|위에서|앞에서|앞서|말한|말씀|해당|"
+    r"(?:^|\s)(?:그|이|저|위|앞|같은|다른|또)\s|더 자세히|자세히|예를 들|왜\s*\?*$"
+)
+ARTICLE_MENTION_RE = re.compile(r"제?\s*\d+\s*조")
+SELF_CONTAINED_MIN_CHARS = 8  # 공백 뺀 길이. "야구는?" 같은 생략형은 앞 대화 없이는 뜻이 안 통합니다.
+
+# 규정명에서 키워드로 쓰기엔 너무 일반적인 단어 (다른 종목 질문에도 흔히 등장)
+GENERIC_TITLE_TOKENS = {
+    "규정", "세칙", "운영", "규약", "가이드라인", "시스템", "준수", "제도", "기준",
+    "리그", "경기", "경기장", "선수", "정관", "상벌", "마케팅", "윤리강령", "시설기준",
+    "클럽", "프로클럽", "유소년", "라이센싱", "중재위원회",
+}
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", "", text).lower()
+
+
+def _pattern(words):
+    return re.compile("|".join(re.escape(t) for t in sorted(words, key=len, reverse=True)))
+
+
+def _title_terms(regulation_names: dict) -> dict:
+    # "K리그 클럽 라이센싱 규정" → {"클럽", "라이센싱"} 처럼 규정명에서 리그별 키워드를 뽑습니다.
+    terms = {league: set() for league in LEAGUE_BY_PREFIX.values()}
+    for filename, title in regulation_names.items():
+        league = league_of(filename)
+        if league is None:
+            continue
+        for token in re.split(r"\s+", title):
+            token = token.lower()
+            if (
+                len(token) < 2
+                or token in GENERIC_TITLE_TOKENS
+                or re.fullmatch(r"\d{4}|제\d+장", token)
+            ):
+                continue
+            terms[league].add(token)
+
+    # 양쪽 리그 규정명에 모두 나오는 단어는 구분력이 없으니 제외
+    shared = set.intersection(*terms.values())
+    return {league: words - shared for league, words in terms.items()}
+
+
+class KeywordPreclassifier:
+    def __init__(self, regulation_names: dict):
+        vocabulary = {league: {_normalize(t) for t in words} for league, words in LEAGUE_TERMS.items()}
+        for league, words in _title_terms(regulation_names).items():
+            vocabulary[league] |= {_normalize(t) for t in words}
+
+        self._patterns = {league: _pattern(words) for league, words in vocabulary.items()}
+        self._topics = _pattern({_normalize(t) for words in SPORT_TERMS.values() for t in words})
+        self._unsupported = re.compile("|".join(re.escape(_normalize(t)) for t in UNSUPPORTED_TERMS))
+
+    def classify(self, question: str):
+        text = _normalize(question)
+        if self._unsupported.search(text):
+            return None
+
+        hits = [league for league, pattern in self._patterns.items() if pattern.search(text)]
+        if len(hits) == 1:
+            return hits[0]
+        return None
+
+    def is_self_contained(self, question: str) -> bool:
+        # 이전 대화 없이도 검색할 수 있는 질문인지 (→ 히스토리 재구성 LLM 호출 생략)
+        # 지시어·접속어가 없고, 리그·구단·규정 용어나 "제N조"를 직접 언급해야 합니다.
+        if ANAPHORA_RE.search(question.strip()):
+            return False
+        text = _normalize(question)
+        if len(text) < SELF_CONTAINED_MIN_CHARS:
+            return False
+        if ARTICLE_MENTION_RE.search(question) or self._topics.search(text):
+            return True
+        return any(p.search(text) for p in self._patterns.values())
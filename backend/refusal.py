@@ -0,0 +1,77 @@
+import json
+import os
+from typing import Dict, List, NamedTuple, Optional
+
+from langchain_core.documents import Document
+
+from backend.sparse_index import SparseIndex, tokenize
+
+# 🟢 검색 근거로 하는 거절 사전 판정 (답변 LLM 호출 전)
+# - 코퍼스로 답할 수 없는 게 분명한 질문은 답변 LLM을 부르지 않고 정해진 거절 문구를 바로 돌려줍니다.
+# - 신호 두 개가 모두 기준 미만일 때만 거절합니다. (하나라도 넘으면 평소처럼 답변 LLM이 판단)
+#   · top_score: 밀집 검색 1등의 벡터 유사도 (코사인)
+#   · overlap: 질문 단어가 컨텍스트 청크 하나에 나오는 비율의 최댓값 (BM25 인덱스의 IDF 가중, 코퍼스에 없는 단어는 가장 무겁게)
+# - 기준값은 라벨 붙은 질문 세트로 맞춥니다. (python -m bench.refusal --write → REFUSAL_THRESHOLDS_PATH)
+#   유사도 분포는 임베딩 모델마다 다르므로, 보정 파일의 임베딩 모델이 서빙 중인 모델과 같을 때만 판정을 켭니다.
+#   (보정 파일이 없거나 모델이 다르면 판정하지 않음) REFUSAL_MIN_SCORE·REFUSAL_MIN_OVERLAP을 둘 다 주면 그 값으로 켭니다.
+# - REFUSAL_PRECHECK=0이면 보정 파일이 있어도 끕니다.
+# - 벡터 유사도를 주지 않는 저장소(Chroma 등)에서는 판정하지 않습니다.
+REFUSAL_PRECHECK = os.getenv("REFUSAL_PRECHECK", "auto") != "0"
+REFUSAL_THRESHOLDS_PATH = os.getenv("REFUSAL_THRESHOLDS_PATH", "./refusal_thresholds.json")
+
+
+class Thresholds(NamedTuple):
+    min_score: float    # 1등 벡터 유사도가 이보다 낮고
+    min_overlap: float  # 단어 겹침도 이보다 낮으면 거절
+    source: str         # file / env
+
+
+class RefusalCheck(NamedTuple):
+    refuse: bool
+    top_score: Optional[float]
+    overlap: float
+
+
+def load_thresholds(embedding_model: str, path: str = REFUSAL_THRESHOLDS_PATH) -> Optional[Thresholds]:
+    # 보정한 기준값이 없으면 None (판정하지 않음)
+    if os.getenv("REFUSAL_MIN_SCORE") and os.getenv("REFUSAL_MIN_OVERLAP"):
+        return Thresholds(float(os.getenv("REFUSAL_MIN_SCORE")), float(os.getenv("REFUSAL_MIN_OVERLAP")), "env")
+    try:
+        with open(path, encoding="utf-8") as f:
+            saved = json.load(f)
+        if saved.get("embedding_model") == embedding_model:
+            return Thresholds(float(saved["min_score"]), float(saved["min_overlap"]), "file")
+        print(f"⚠️ 거절 기준 파일의 임베딩 모델({saved.get('embedding_model')})이 {embedding_model}과 달라 거절 사전 판정을 끕니다.")
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"⚠️ 거절 기준 파일을 읽지 못해 거절 사전 판정을 끕니다: {e}")
+    return None
+
+
+def term_overlap(question: str, docs: List[Document], sparse: Optional[SparseIndex] = None) -> float:
+    terms = set(tokenize(question))
+    if not terms or not docs:
+        return 0.0
+    if sparse is not None:
+        rarest = float(sparse.idf.max(initial=1.0))
+        weights = {t: float(sparse.idf[sparse.vocab[t]]) if t in sparse.vocab else rarest for t in terms}
+    else:
+        weights = dict.fromkeys(terms, 1.0)
+    total = sum(weights.values()) or 1.0
+    return max(sum(w for t, w in weights.items() if t in present) / total for present in (set(tokenize(d.page_content)) for d in docs))
+
+
+def signals(question: str, docs: List[Document], scores: Optional[Dict[str, float]], sparse: Optional[SparseIndex] = None):
+    top_score = max(scores.values()) if scores else None
+    return top_score, term_overlap(question, docs, sparse)
+
+
+def precheck(question: str, docs: List[Document], scores: Optional[Dict[str, float]], sparse: Optional[SparseIndex], thresholds: Thresholds) -> RefusalCheck:
+    top_score, overlap = signals(question, docs, scores, sparse)
+    if not docs:
+        # 검색 결과가 아예 없으면 답변 LLM에 넘길 근거도 없습니다.
+        return RefusalCheck(True, top_score, overlap)
+    if top_score is None:
+        return RefusalCheck(False, None, overlap)
+    return RefusalCheck(top_score < thresholds.min_score and overlap < thresholds.min_overlap, top_score, overlap)
@@ -0,0 +1,37 @@
+import os
+from typing import Optional
+
+# ✨ 파일명 -> 실제 규정명 번역 사전 (사용자 맞춤형)
+# API 출처 표시와 인제스트(청크 메타데이터의 문서 제목)가 같이 씁니다.
+REGULATION_NAMES = {
+    "baseball_kbo_leagueregulations_2025.pdf": "2025 KBO 리그 규정",
+    "baseball_kbo_officialbaseballrule_2025.pdf": "2025 공식야구규칙",
+    "baseball_kbo_rule_2025.pdf": "2025 KBO 규약",
+    "football_kleague_arbitration_2018.pdf": "K리그 중재위원회 운영 규정",
+    "football_kleague_articles_2018.pdf": "K리그 정관",
+    "football_kleague_cleanfinancial_2024.pdf": "K리그 재정건전화 규정",
+    "football_kleague_cleanfinancial2_2024.pdf": "K리그 클럽 재정건전화 준수 세칙",
+    "football_kleague_club_2018.pdf": "K리그 제1장 클럽 규정",
+    "football_kleague_clublicesing_2024.pdf": "K리그 클럽 라이센싱 규정",
+    "football_kleague_comissioner_2018.pdf": "K리그 총재선거관리규정",
+    "football_kleague_ethics_2021.pdf": "K리그 윤리강령",
+    "football_kleague_game_2018.pdf": "K리그 제3장 경기",
+    "football_kleague_marketing_2018.pdf": "K리그 제5장 마케팅",
+    "football_kleague_penalty_2018.pdf": "K리그 제6장 상벌",
+    "football_kleague_player_2018.pdf": "K리그 제2장 선수",
+    "football_kleague_proclubbteam_2021.pdf": "K리그 프로클럽 B팀 운영 세칙",
+    "football_kleague_stadium_2024.pdf": "K리그 경기장 시설기준 가이드라인",
+    "football_kleague_youthclubsystem_2018.pdf": "K리그 유소년 클럽 시스템 운영 세칙"
+}
+
+
+# 파일명 접두어로 리그를 정합니다. (인제스트 때 청크 메타데이터 "league"로 저장 → 검색 사전 필터)
+LEAGUE_BY_PREFIX = {
+    "football_kleague": "K리그",
+    "baseball_kbo": "KBO",
+}
+
+
+def league_of(source: str) -> Optional[str]:
+    filename = os.path.basename(source or "")
+    return next((v for k, v in LEAGUE_BY_PREFIX.items() if filename.startswith(k)), None)
@@ -0,0 +1,267 @@
+import argparse
+import json
+import math
+import os
+import threading
+import time
+from typing import List, NamedTuple, Optional
+
+from langchain_core.documents import Document
+
+from backend.sparse_index import SparseIndex, tokenize
+
+# 🟢 재정렬(rerank) 단계 + 적응형 k
+# - 하이브리드 검색(RRF)으로 후보를 RERANK_CANDIDATES개까지 싸게 넉넉히 뽑은 뒤, 질문-청크 쌍마다 점수를 매겨 다시 정렬합니다.
+# - 점수를 후보 전체에 대한 확률(softmax)로 바꿔, 누적 확률이 RERANK_MASS를 넘는 가장 작은 k만 답변 LLM에 넘깁니다.
+#   정답 청크에 확률이 몰리는 쉬운 질문은 RERANK_MIN_K개까지 줄고, 애매한 질문은 원래 k(RETRIEVAL_K 등)까지 씁니다.
+# - 재정렬기
+#   · onnx: RERANK_MODEL_DIR에 model.onnx + tokenizer.json이 있으면 다국어 교차 인코더를 CPU로 돌립니다.
+#     질문·규정이 한국어라 영어 MS MARCO로만 학습한 모델(ms-marco-MiniLM 등)은 쓰지 않습니다. 만들기: python -m backend.rerank export
+#     (기본 mmarco-mMiniLMv2-L12: 후보 20개를 CPU 예산 안에 재정렬할 수 있는 크기. GPU나 예산이 넉넉하면 --model BAAI/bge-reranker-v2-m3)
+#   · lexical: 질문 단어의 IDF 가중 커버리지 + 단어 쌍 근접 + 조항 제목 일치로 매기는 가벼운 재정렬기 (모델 파일 없음)
+#     혼자서는 1등을 자주 틀리므로 융합 순위를 RERANK_LEXICAL_PRIOR만큼 섞습니다. (bench/rag_eval.py --rerank lexical로 조정)
+#   RERANK=auto(기본)면 모델 폴더가 있을 때만 onnx, 없으면 재정렬을 하지 않습니다.
+# - 쌍은 길이순으로 RERANK_BATCH_SIZE개씩 묶어(패딩 최소화) 추론하고, 쌍당 시간을 이동 평균으로 재 둡니다.
+#   서버가 뜰 때(warm_up) 한 번 재 두므로 첫 요청부터 예산을 확인합니다.
+#   예상 시간이 RERANK_BUDGET_MS를 넘으면 예산에 맞는 앞쪽 후보만 재정렬하고, 그마저 원래 k개보다 적거나
+#   요청 시작부터 RERANK_DEADLINE_MS를 넘길 것 같으면 재정렬을 건너뛰고 융합 순위 그대로 씁니다.
+RERANK = os.getenv("RERANK", "auto")  # auto / onnx / lexical / off
+RERANK_MODEL_DIR = os.getenv("RERANK_MODEL_DIR", "./rerank_model")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))
+RERANK_MIN_K = int(os.getenv("RERANK_MIN_K", "2"))
+RERANK_MASS = float(os.getenv("RERANK_MASS", "0.8"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+RERANK_MAX_LENGTH = int(os.getenv("RERANK_MAX_LENGTH", "384"))
+RERANK_THREADS = int(os.getenv("RERANK_THREADS", "2"))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "150"))
+RERANK_DEADLINE_MS = float(os.getenv("RERANK_DEADLINE_MS", "2000"))
+RERANK_LEXICAL_PRIOR = float(os.getenv("RERANK_LEXICAL_PRIOR", "0.2"))
+COST_SMOOTHING = 0.2  # 쌍당 시간 이동 평균 가중치
+EXPORT_MODEL = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+
+
+class LexicalReranker:
+    """질문 단어가 청크에 얼마나(IDF 가중), 얼마나 붙어서, 조항 제목에 나오는지로 매기는 재정렬기."""
+
+    name = "lexical"
+    temperature = 0.1  # 점수가 0~1 남짓이라 softmax를 날카롭게
+    prior = RERANK_LEXICAL_PRIOR
+
+    def __init__(self, sparse: Optional[SparseIndex] = None):
+        self.sparse = sparse
+
+    def _weight(self, term: str) -> float:
+        if self.sparse is None:
+            return 1.0
+        i = self.sparse.vocab.get(term)
+        # 코퍼스에 없는 단어는 가장 드문 단어만큼 무겁게 봅니다.
+        return float(self.sparse.idf[i]) if i is not None else float(self.sparse.idf.max(initial=1.0))
+
+    def score(self, question: str, docs: List[Document]) -> List[float]:
+        terms = list(dict.fromkeys(tokenize(question)))
+        weights = {t: self._weight(t) for t in terms}
+        total = sum(weights.values()) or 1.0
+        pairs = set(zip(terms, terms[1:]))
+        scores = []
+        for doc in docs:
+            words = tokenize(doc.page_content)
+            present = set(words)
+            heading = set(tokenize(" ".join(str(doc.metadata.get(f, "")) for f in ("article_title", "citation"))))
+            coverage = sum(w for t, w in weights.items() if t in present) / total
+            title = sum(w for t, w in weights.items() if t in heading) / total
+            adjacent = len(pairs & set(zip(words, words[1:]))) / len(pairs) if pairs else 0.0
+            scores.append(coverage + 0.5 * adjacent + 0.3 * title)
+        return scores
+
+
+class OnnxCrossEncoder:
+    """ONNX로 내보낸 교차 인코더 (입력: input_ids / attention_mask / [token_type_ids], 출력: 관련도 로짓)."""
+
+    name = "onnx"
+    temperature = 1.0
+    prior = 0.0
+
+    def __init__(self, directory: str = RERANK_MODEL_DIR, max_length: int = RERANK_MAX_LENGTH, threads: int = RERANK_THREADS):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(os.path.join(directory, "model.onnx"), options, providers=["CPUExecutionProvider"])
+        self.inputs = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = Tokenizer.from_file(os.path.join(directory, "tokenizer.json"))
+        try:
+            with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+            print(f"📦 재정렬 모델: {meta['model']}@{meta['revision'][:12]}{' (int8)' if meta.get('quantized') else ''}")
+        except (OSError, ValueError, KeyError):
+            pass
+        self.tokenizer.enable_truncation(max_length=max_length)
+        if self.tokenizer.padding is None:
+            pad = next((t for t in ("[PAD]", "<pad>") if self.tokenizer.token_to_id(t) is not None), "[PAD]")
+            self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id(pad) or 0, pad_token=pad)
+
+    def score(self, question: str, docs: List[Document]) -> List[float]:
+        import numpy as np
+
+        encodings = self.tokenizer.encode_batch([(question, doc.page_content) for doc in docs])
+        feed = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+        }
+        if "token_type_ids" in self.inputs:
+            feed["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+        logits = self.session.run(None, feed)[0]
+        # 로짓이 하나면 그 값, 둘(무관/관련)이면 관련 쪽
+        return (logits.reshape(len(docs), -1)[:, -1]).astype(float).tolist()
+
+
+def load_reranker(sparse: Optional[SparseIndex] = None):
+    if RERANK == "off":
+        return None
+    if RERANK == "lexical":
+        return LexicalReranker(sparse)
+    if RERANK == "onnx" or os.path.exists(os.path.join(RERANK_MODEL_DIR, "model.onnx")):
+        return OnnxCrossEncoder()
+    return None
+
+
+def adaptive_k(scores: List[float], temperature: float, mass: float = RERANK_MASS, min_k: int = RERANK_MIN_K, max_k: int = 5) -> int:
+    # scores는 내림차순. softmax 누적 확률이 mass를 넘는 가장 작은 k (min_k ~ max_k)
+    if not scores:
+        return 0
+    top = scores[0]
+    weights = [math.exp((s - top) / temperature) for s in scores]
+    total = sum(weights)
+    cumulative = 0.0
+    for k, weight in enumerate(weights, start=1):
+        cumulative += weight / total
+        if cumulative >= mass:
+            break
+    return max(min(min_k, len(scores)), min(k, max_k))
+
+
+class Reranked(NamedTuple):
+    docs: List[Document]
+    scores: Optional[List[float]]  # 고른 청크의 재정렬 점수 (건너뛰었으면 None)
+    outcome: str                   # applied / skipped_budget / skipped_deadline / error
+
+
+class RerankStage:
+    def __init__(self, reranker, batch_size: int = RERANK_BATCH_SIZE, budget_ms: float = RERANK_BUDGET_MS, deadline_ms: float = RERANK_DEADLINE_MS):
+        self.reranker = reranker
+        self.batch_size = batch_size
+        self.budget = budget_ms / 1000
+        self.deadline = deadline_ms / 1000
+        self.pair_cost: Optional[float] = None  # 쌍당 초 (이동 평균, 첫 호출 전에는 모름)
+        self._lock = threading.Lock()
+
+    def _score(self, question: str, docs: List[Document]) -> List[float]:
+        # 길이가 비슷한 쌍끼리 묶어야 배치 안의 패딩이 줄어듭니다. (점수는 원래 순서로 되돌림)
+        order = sorted(range(len(docs)), key=lambda i: len(docs[i].page_content))
+        scores = [0.0] * len(docs)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start : start + self.batch_size]
+            for i, score in zip(batch, self.reranker.score(question, [docs[i] for i in batch])):
+                scores[i] = score
+        return scores
+
+    def warm_up(self, question: str, docs: List[Document]):
+        # 서버가 뜰 때 실제 후보로 한 번 재정렬해 쌍당 시간을 재 둡니다. (없으면 첫 요청은 예산 확인 없이 전부 재정렬)
+        # 첫 실행은 메모리 할당 등으로 느리므로 한 쌍으로 먼저 돌리고 잽니다.
+        if not docs:
+            return
+        self._score(question, docs[:1])
+        started = time.perf_counter()
+        self._score(question, docs)
+        with self._lock:
+            self.pair_cost = (time.perf_counter() - started) / len(docs)
+
+    def select(self, question: str, docs: List[Document], k: int, elapsed: Optional[float] = None) -> Reranked:
+        # docs: 융합 순위의 후보 (앞쪽이 더 유력), k: 재정렬하지 않을 때 쓸 개수이자 적응형 k의 상한
+        n = len(docs)
+        if self.pair_cost:
+            n = min(n, int(self.budget / self.pair_cost))
+            if n < min(k, len(docs)):
+                # 건너뛸 때마다 추정치를 조금씩 낮춰, 한 번 느렸던 측정 때문에 계속 건너뛰지 않게 합니다.
+                self.pair_cost *= 1 - COST_SMOOTHING
+                return Reranked(docs[:k], None, "skipped_budget")
+            if elapsed is not None and elapsed + n * self.pair_cost > self.deadline:
+                return Reranked(docs[:k], None, "skipped_deadline")
+        candidates = docs[:n]
+        started = time.perf_counter()
+        try:
+            scores = self._score(question, candidates)
+        except Exception as e:
+            print(f"⚠️ 재정렬 실패, 융합 순위를 그대로 씁니다: {e}")
+            return Reranked(docs[:k], None, "error")
+        if candidates:
+            cost = (time.perf_counter() - started) / len(candidates)
+            with self._lock:
+                self.pair_cost = cost if self.pair_cost is None else (1 - COST_SMOOTHING) * self.pair_cost + COST_SMOOTHING * cost
+        # 약한 재정렬기는 융합 순위도 일부 믿도록 1/(순위)만큼 더합니다.
+        scores = [score + self.reranker.prior / (1 + i) for i, score in enumerate(scores)]
+        order = sorted(range(len(candidates)), key=lambda i: -scores[i])
+        chosen = adaptive_k([scores[i] for i in order], self.reranker.temperature, max_k=k)
+        return Reranked([candidates[i] for i in order[:chosen]], [scores[i] for i in order[:chosen]], "applied")
+
+
+def load_rerank_stage(sparse: Optional[SparseIndex] = None) -> Optional[RerankStage]:
+    reranker = load_reranker(sparse)
+    return RerankStage(reranker) if reranker is not None else None
+
+
+def export_cross_encoder(model: str, out: str, revision: Optional[str] = None, quantize: bool = False) -> dict:
+    # 내보낼 때만 필요합니다: pip install "optimum[onnxruntime]" transformers torch (서빙은 onnxruntime + tokenizers만)
+    from huggingface_hub import HfApi
+    from optimum.onnxruntime import ORTModelForSequenceClassification
+    from transformers import AutoTokenizer
+
+    # 브랜치·태그 대신 커밋 해시로 고정해, 같은 명령이면 같은 가중치를 받습니다.
+    revision = HfApi().model_info(model, revision=revision).sha
+    os.makedirs(out, exist_ok=True)
+    ORTModelForSequenceClassification.from_pretrained(model, revision=revision, export=True).save_pretrained(out)
+    AutoTokenizer.from_pretrained(model, revision=revision).save_pretrained(out)  # tokenizer.json
+    path = os.path.join(out, "model.onnx")
+    if quantize:
+        # 가중치만 int8로 (CPU 추론 2~3배 빠름, 순위는 거의 같음)
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(path, path + ".int8", weight_type=QuantType.QInt8, use_external_data_format=os.path.exists(path + "_data"))
+        os.replace(path + ".int8", path)
+    meta = {
+        "model": model,
+        "revision": revision,
+        "quantized": quantize,
+        "exported_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    with open(os.path.join(out, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    return meta
+
+
+def main():
+    parser = argparse.ArgumentParser(description="책첵 재정렬 모델")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="Hugging Face의 다국어 교차 인코더를 ONNX로 내보냅니다.")
+    export.add_argument("--model", default=EXPORT_MODEL, help="예: BAAI/bge-reranker-v2-m3 (크고 정확, GPU 권장)")
+    export.add_argument("--revision", default=None, help="커밋 해시 (없으면 지금 main의 커밋으로 고정해 meta.json에 남김)")
+    export.add_argument("--out", default=RERANK_MODEL_DIR)
+    export.add_argument("--quantize", action="store_true", help="int8 동적 양자화")
+    args = parser.parse_args()
+
+    meta = export_cross_encoder(args.model, args.out, args.revision, args.quantize)
+    # 내보낸 모델로 바로 점수를 매겨 봅니다. (관련 있는 조항이 더 높아야 정상)
+    reranker = OnnxCrossEncoder(args.out)
+    docs = [
+        Document(page_content="제17조(외국인 선수) 구단은 외국인 선수를 3명까지 보유할 수 있으며, 경기에는 2명까지 출전할 수 있다."),
+        Document(page_content="제9조(유니폼) 홈 클럽과 원정 클럽의 유니폼 색상은 명확히 구분되어야 한다."),
+    ]
+    relevant, unrelated = reranker.score("외국인 선수는 몇 명까지 보유할 수 있나요?", docs)
+    print(f"🎉 {meta['model']}@{meta['revision'][:12]} → {args.out} (관련 {relevant:.3f} / 무관 {unrelated:.3f})")
+    if relevant <= unrelated:
+        print("⚠️ 관련 조항 점수가 더 낮습니다. 출력 로짓 순서나 모델을 확인하세요.")
+
+
+if __name__ == "__main__":
+    main()
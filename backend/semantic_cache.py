@@ -0,0 +1,216 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+
+from backend.corpus import current_corpus_version
+
+# 🟢 의미 기반 답변 캐시
+# - 키: (히스토리 반영 후) 독립 질문의 임베딩. 코사인 유사도가 threshold 이상이면 같은 질문으로 봅니다.
+# - 값: chat_endpoint가 돌려주는 answer / sources / is_refusal 그대로
+# - partition: 라우팅한 도메인·검색 범위. 같은 partition 안에서만 찾으므로 "KBO X"가 "K리그 X"의 답을 받지 않습니다.
+#   partition마다 벡터 행렬을 미리 잡아 두고 행을 채워 넣습니다. (저장할 때마다 행렬을 다시 쌓지 않음)
+# - TTL + LRU로 크기를 제한하고, 코퍼스 버전이 바뀌면(update_file.py 등) 통째로 비웁니다.
+# - path를 주면 SQLite에 write-through로 저장해 재시작이나 다른 워커와도 캐시를 공유합니다.
+#   다른 워커가 넣은 항목은 마지막으로 읽은 id 다음부터 가져옵니다. (시계가 어긋나도 빠뜨리지 않음)
+#   조회·저장마다 SQLite를 읽고 쓰므로, 비동기 핸들러는 alookup / astore(스레드에서 실행)를 씁니다.
+
+
+class _Partition:
+    # 벡터를 미리 잡아 둔 행렬에 차례로 채우고, 모자라면 두 배로 늘립니다. 지울 때는 마지막 행을 그 자리로 옮깁니다.
+    def __init__(self, dim, capacity=64):
+        self.matrix = np.empty((capacity, dim), dtype=np.float32)
+        self.keys = []  # 행 번호 → 키
+
+    def add(self, key, vector):
+        row = len(self.keys)
+        if row == len(self.matrix):
+            grown = np.empty((2 * row, self.matrix.shape[1]), dtype=np.float32)
+            grown[:row] = self.matrix
+            self.matrix = grown
+        self.matrix[row] = vector
+        self.keys.append(key)
+        return row
+
+    def remove(self, row):
+        # → 자리를 옮긴 키 (없으면 None)
+        last = len(self.keys) - 1
+        moved = self.keys.pop()
+        if row == last:
+            return None
+        self.matrix[row] = self.matrix[last]
+        self.keys[row] = moved
+        return moved
+
+    def scores(self, vector):
+        return self.matrix[: len(self.keys)] @ vector
+
+
+class SemanticCache:
+    def __init__(self, threshold=0.95, ttl=86400, max_entries=2000, path=None, version_fn=current_corpus_version, busy_timeout=2.0):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.version_fn = version_fn
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()  # key -> (partition, payload, created), 뒤쪽일수록 최근 사용
+        self._partitions = {}  # partition -> _Partition
+        self._rows = {}  # key -> partition 행렬의 행 번호
+        self._version = version_fn()
+        self._lock = threading.Lock()
+
+        self._db = None
+        self._synced_id = 0
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False, timeout=busy_timeout)
+            # partition이 없던 예전 테이블은 범위를 구분할 수 없어 버립니다.
+            self._db.execute("DROP TABLE IF EXISTS semantic_cache")
+            self._db.execute(
+                """CREATE TABLE IF NOT EXISTS answer_cache (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    key TEXT NOT NULL UNIQUE,
+                    corpus_version TEXT NOT NULL,
+                    partition TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    vector BLOB NOT NULL,
+                    payload TEXT NOT NULL
+                )"""
+            )
+            self._db.commit()
+            self._purge_other_versions()
+            self._sync()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _check_version(self):
+        version = self.version_fn()
+        if version != self._version:
+            self._version = version
+            self._entries.clear()
+            self._partitions.clear()
+            self._rows.clear()
+            self._purge_other_versions()
+
+    def _purge_other_versions(self):
+        if self._db is not None:
+            self._db.execute("DELETE FROM answer_cache WHERE corpus_version != ?", (self._version,))
+            self._db.commit()
+
+    def _add(self, key, partition, vector, payload, created):
+        if partition not in self._partitions:
+            self._partitions[partition] = _Partition(len(vector))
+        self._rows[key] = self._partitions[partition].add(key, vector)
+        self._entries[key] = (partition, payload, created)
+
+    def _drop(self, key):
+        partition, _, _ = self._entries.pop(key)
+        row = self._rows.pop(key)
+        moved = self._partitions[partition].remove(row)
+        if moved is not None:
+            self._rows[moved] = row
+
+    def _sync(self):
+        # 다른 워커가 SQLite에 새로 넣은 항목만 가져옵니다.
+        if self._db is None:
+            return
+        rows = self._db.execute(
+            "SELECT id, key, partition, created, vector, payload FROM answer_cache WHERE corpus_version = ? AND id > ? ORDER BY id",
+            (self._version, self._synced_id),
+        ).fetchall()
+        for row_id, key, partition, created, blob, payload in rows:
+            if key not in self._entries:
+                self._add(key, partition, np.frombuffer(blob, dtype=np.float32), json.loads(payload), created)
+            self._synced_id = row_id
+        if rows:
+            self._evict()
+
+    def _delete(self, key):
+        self._drop(key)
+        if self._db is not None:
+            self._db.execute("DELETE FROM answer_cache WHERE key = ?", (key,))
+            self._db.commit()
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries:
+            key = next(iter(self._entries))
+            self._drop(key)
+            if self._db is not None:
+                self._db.execute("DELETE FROM answer_cache WHERE key = ?", (key,))
+        if self._db is not None:
+            self._db.commit()
+
+    def lookup(self, vector, partition=""):
+        with self._lock:
+            self._check_version()
+            self._sync()
+            bucket = self._partitions.get(partition)
+            if bucket is None or not bucket.keys:
+                self.misses += 1
+                return None
+
+            # 기준을 넘는 항목을 유사도 순으로 보며, TTL이 지난 항목은 지우고 다음 항목을 봅니다.
+            scores = bucket.scores(self._normalize(vector))
+            above = np.flatnonzero(scores >= self.threshold)
+            now = time.time()
+            expired, payload, hit = [], None, None
+            for row in above[np.argsort(-scores[above])]:
+                key = bucket.keys[row]
+                _, payload, created = self._entries[key]
+                if now - created > self.ttl:
+                    expired.append(key)
+                    continue
+                hit = key
+                break
+            for key in expired:
+                self._delete(key)
+            if hit is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(hit)
+            self.hits += 1
+            return payload
+
+    def store(self, vector, payload, partition=""):
+        with self._lock:
+            self._check_version()
+            key = uuid.uuid4().hex
+            created = time.time()
+            vector = self._normalize(vector)
+            self._add(key, partition, vector, payload, created)
+
+            if self._db is not None:
+                cursor = self._db.execute(
+                    "INSERT INTO answer_cache (key, corpus_version, partition, created, vector, payload) VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, self._version, partition, created, vector.tobytes(), json.dumps(payload, ensure_ascii=False)),
+                )
+                self._db.commit()
+                if cursor.lastrowid == self._synced_id + 1:
+                    # 그 사이 다른 워커가 넣은 게 없으면 다음 동기화에서 자기 항목을 다시 읽지 않습니다.
+                    self._synced_id = cursor.lastrowid
+            self._evict()
+
+    async def alookup(self, vector, partition=""):
+        # SQLite를 쓰면 디스크 I/O와 다른 워커의 쓰기 잠금을 기다리므로 스레드에서, 메모리만 쓰면 바로 합니다.
+        if self._db is None:
+            return self.lookup(vector, partition)
+        return await asyncio.to_thread(self.lookup, vector, partition)
+
+    async def astore(self, vector, payload, partition=""):
+        if self._db is None:
+            self.store(vector, payload, partition)
+        else:
+            await asyncio.to_thread(self.store, vector, payload, partition)
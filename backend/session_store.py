@@ -0,0 +1,208 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from backend.tokens import count_tokens
+
+# 🟢 크기가 제한된 대화 기록 저장소
+# - 세션 수: LRU + 유휴 TTL (idle_ttl초 동안 안 쓰인 세션은 삭제)
+# - 세션당: 최근 max_turns턴, max_tokens토큰까지만 유지 (오래된 턴부터 잘라냄)
+#   → 대화가 길어져도 워커 메모리와 프롬프트 토큰이 일정 수준 이상 늘지 않습니다.
+# - MemorySessionStore: 워커 프로세스 안에만 저장 (기본값)
+# - SQLiteSessionStore: 파일 하나를 여러 uvicorn 워커가 같이 씀 (SESSION_STORE_PATH)
+#   다른 워커가 쓰기 잠금을 쥐고 있으면 기다려야 하므로, 비동기 핸들러는 amessages / aappend_turn(스레드에서 실행)을 씁니다.
+
+
+def _trim(turns, max_turns, max_tokens):
+    # turns: [(human, ai, tokens), ...] 오래된 순. 최신 턴은 항상 하나는 남깁니다.
+    while len(turns) > 1 and (len(turns) > max_turns or sum(t[2] for t in turns) > max_tokens):
+        turns.pop(0)
+    return turns
+
+
+class MemorySessionStore:
+    def __init__(self, max_sessions=1000, idle_ttl=3600, max_turns=10, max_tokens=2000):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self._sessions = OrderedDict()  # session_id -> (turns, last_access), 뒤쪽일수록 최근 사용
+        self.evicted = 0
+        # 이벤트 루프(대화)와 스레드풀(/metrics, /stats/sessions)이 같이 건드리므로 잠그고 씁니다.
+        self._lock = threading.Lock()
+
+    def _evict(self):
+        now = time.time()
+        while self._sessions:
+            session_id, (_, last_access) = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.max_sessions and now - last_access <= self.idle_ttl:
+                break
+            del self._sessions[session_id]
+            self.evicted += 1
+
+    def messages(self, session_id):
+        if not session_id:
+            return []
+        with self._lock:
+            self._evict()
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return []
+            self._sessions.move_to_end(session_id)
+            self._sessions[session_id] = (entry[0], time.time())
+            turns = list(entry[0])
+        result = []
+        for human, ai, _ in turns:
+            result += [HumanMessage(content=human), AIMessage(content=ai)]
+        return result
+
+    def append_turn(self, session_id, human, ai):
+        if not session_id:
+            return
+        tokens = count_tokens(human) + count_tokens(ai)
+        with self._lock:
+            turns, _ = self._sessions.pop(session_id, ([], 0))
+            turns.append((human, ai, tokens))
+            self._sessions[session_id] = (_trim(turns, self.max_turns, self.max_tokens), time.time())
+            self._evict()
+
+    def stats(self):
+        # 읽기만 합니다. (유휴 TTL이 지난 세션은 세지 않고, 지우는 건 대화 경로의 _evict가 함)
+        cutoff = time.time() - self.idle_ttl
+        with self._lock:
+            live = [t for t, last_access in self._sessions.values() if last_access >= cutoff]
+            turns = [len(t) for t in live]
+            tokens = [sum(x[2] for x in t) for t in live]
+        return {
+            "backend": "memory",
+            "sessions": len(live),
+            "turns": sum(turns),
+            "history_tokens": sum(tokens),
+            "max_session_tokens": max(tokens, default=0),
+            "evicted": self.evicted,
+        }
+
+    async def amessages(self, session_id):
+        return self.messages(session_id)
+
+    async def aappend_turn(self, session_id, human, ai):
+        self.append_turn(session_id, human, ai)
+
+
+class SQLiteSessionStore:
+    def __init__(self, path, max_sessions=10000, idle_ttl=3600, max_turns=10, max_tokens=2000, busy_timeout=2.0):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_turns = max_turns
+        self.max_tokens = max_tokens
+        self.evicted = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=busy_timeout)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS sessions_last_access ON sessions (last_access);
+            CREATE TABLE IF NOT EXISTS turns (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                human TEXT NOT NULL,
+                ai TEXT NOT NULL,
+                tokens INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS turns_session ON turns (session_id, id);
+            """
+        )
+        self._db.commit()
+
+    def _evict(self):
+        cutoff = time.time() - self.idle_ttl
+        stale = {r[0] for r in self._db.execute("SELECT session_id FROM sessions WHERE last_access < ?", (cutoff,))}
+        # 최근 max_sessions개를 뺀 나머지(가장 오래된 세션들)
+        stale |= {r[0] for r in self._db.execute(
+            "SELECT session_id FROM sessions ORDER BY last_access DESC LIMIT -1 OFFSET ?", (self.max_sessions,)
+        )}
+        for session_id in stale:
+            self._db.execute("DELETE FROM turns WHERE session_id = ?", (session_id,))
+            self._db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        self.evicted += len(stale)
+
+    def _expire(self, session_id):
+        # 청소(_evict)를 기다리지 않고, 읽거나 쓸 때 유휴 TTL이 지난 세션은 바로 비웁니다.
+        row = self._db.execute("SELECT last_access FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if row is not None and row[0] < time.time() - self.idle_ttl:
+            self._db.execute("DELETE FROM turns WHERE session_id = ?", (session_id,))
+            self._db.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._db.commit()
+            self.evicted += 1
+
+    def messages(self, session_id):
+        if not session_id:
+            return []
+        with self._lock:
+            self._expire(session_id)
+            rows = self._db.execute(
+                "SELECT human, ai FROM turns WHERE session_id = ? ORDER BY id", (session_id,)
+            ).fetchall()
+            if rows:
+                self._db.execute("UPDATE sessions SET last_access = ? WHERE session_id = ?", (time.time(), session_id))
+                self._db.commit()
+        result = []
+        for human, ai in rows:
+            result += [HumanMessage(content=human), AIMessage(content=ai)]
+        return result
+
+    def append_turn(self, session_id, human, ai):
+        if not session_id:
+            return
+        with self._lock:
+            self._expire(session_id)
+            self._db.execute(
+                "INSERT INTO turns (session_id, human, ai, tokens) VALUES (?, ?, ?, ?)",
+                (session_id, human, ai, count_tokens(human) + count_tokens(ai)),
+            )
+            self._db.execute(
+                "INSERT INTO sessions (session_id, last_access) VALUES (?, ?) "
+                "ON CONFLICT(session_id) DO UPDATE SET last_access = excluded.last_access",
+                (session_id, time.time()),
+            )
+            rows = self._db.execute(
+                "SELECT id, human, ai, tokens FROM turns WHERE session_id = ? ORDER BY id", (session_id,)
+            ).fetchall()
+            kept = _trim([(r[1], r[2], r[3]) for r in rows], self.max_turns, self.max_tokens)
+            dropped = [r[0] for r in rows[: len(rows) - len(kept)]]
+            self._db.executemany("DELETE FROM turns WHERE id = ?", [(i,) for i in dropped])
+            self._evict()
+            self._db.commit()
+
+    def stats(self):
+        # 읽기만 합니다. (유휴 TTL이 지난 세션은 세지 않음)
+        cutoff = time.time() - self.idle_ttl
+        live = "session_id IN (SELECT session_id FROM sessions WHERE last_access >= ?)"
+        with self._lock:
+            sessions = self._db.execute("SELECT COUNT(*) FROM sessions WHERE last_access >= ?", (cutoff,)).fetchone()[0]
+            turns, tokens = self._db.execute(f"SELECT COUNT(*), COALESCE(SUM(tokens), 0) FROM turns WHERE {live}", (cutoff,)).fetchone()
+            max_tokens = self._db.execute(
+                f"SELECT COALESCE(MAX(t), 0) FROM (SELECT SUM(tokens) AS t FROM turns WHERE {live} GROUP BY session_id)", (cutoff,)
+            ).fetchone()[0]
+        return {
+            "backend": "sqlite",
+            "sessions": sessions,
+            "turns": turns,
+            "history_tokens": tokens,
+            "max_session_tokens": max_tokens,
+            "evicted": self.evicted,
+        }
+
+    async def amessages(self, session_id):
+        return await asyncio.to_thread(self.messages, session_id)
+
+    async def aappend_turn(self, session_id, human, ai):
+        await asyncio.to_thread(self.append_turn, session_id, human, ai)
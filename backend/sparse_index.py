@@ -0,0 +1,205 @@
+import json
+import os
+import re
+import shutil
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+from backend.regulations import league_of
+
+# 🟢 한국어 규정집용 BM25 희소 인덱스
+# - "제17조", "제3항", 금액·인원 같은 정확한 표현은 밀집 벡터 검색이 자주 놓치므로 키워드 점수로 보완합니다.
+# - 인제스트할 때 한 번 만들어 디스크(./sparse_index)에 저장하고, 서버는 읽기만 합니다. (프로세스마다 다시 만들지 않음)
+# - 토큰화 (형태소 분석기 없이):
+#   1) 조항 표기 정규화: "제 17 조", "17조" → "제17조", "제17조의2" 유지, ①~⑳ → "제N항"
+#   2) 숫자: 자릿수 쉼표 제거 ("1,000" → "1000")
+#   3) 한글 어절: 끝의 조사를 떼고, 3글자 이상이면 글자 바이그램도 추가 ("외국인선수" ↔ "외국인 선수"가 서로 걸리도록)
+# - 점수 계산은 용어별 역색인(포스팅 배열)만 훑는 NumPy 연산이라 질의당 1ms 미만입니다.
+SPARSE_INDEX_DIR = os.getenv("SPARSE_INDEX_DIR", "./sparse_index")
+TOKENIZER_VERSION = 1
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+ARTICLE_RE = re.compile(r"(?:제\s*)?(\d+)\s*(조|항|호|장|절)(?:\s*의\s*(\d+))?")
+TOKEN_RE = re.compile(r"[가-힣]+|[a-z]+|\d+(?:[.,]\d+)*")
+CIRCLED_NUMBERS = {chr(0x2460 + i): f" 제{i + 1}항 " for i in range(20)}
+JOSA = sorted(
+    [
+        "은", "는", "이", "가", "을", "를", "의", "에", "와", "과", "도", "만", "로", "으로",
+        "에서", "에게", "까지", "부터", "보다", "이나", "이란", "란", "이라", "라", "에는",
+        "에서는", "으로는", "로는", "과의", "와의", "에의", "이며", "하는", "하여", "해야",
+        "한다", "된다", "되는",
+    ],
+    key=len,
+    reverse=True,
+)
+
+
+def _strip_josa(word):
+    # 남는 어간이 너무 짧으면 조사가 아니라 단어의 일부로 봅니다. ("평가", "제도" 등은 그대로)
+    for suffix in JOSA:
+        if word.endswith(suffix) and len(word) - len(suffix) >= (2 if len(suffix) == 1 else 1):
+            return word[: -len(suffix)]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    text = unicodedata.normalize("NFC", text or "").lower()
+    for circled, replacement in CIRCLED_NUMBERS.items():
+        text = text.replace(circled, replacement)
+
+    tokens = []
+    for m in ARTICLE_RE.finditer(text):
+        tokens.append(f"제{m[1]}{m[2]}" + (f"의{m[3]}" if m[3] else ""))
+    text = ARTICLE_RE.sub(" ", text)
+
+    for word in TOKEN_RE.findall(text):
+        if word[0].isdigit():
+            tokens.append(word.replace(",", ""))
+        elif "가" <= word[0] <= "힣":
+            stem = _strip_josa(word)
+            tokens.append(stem)
+            if len(stem) > 2:
+                tokens += [stem[i : i + 2] for i in range(len(stem) - 1)]
+        else:
+            tokens.append(word)
+    return tokens
+
+
+class SparseIndex:
+    def __init__(self, docs: List[Document], vocab: Dict[str, int], term_ptr, post_docs, post_tfs, doc_len):
+        self.docs = docs
+        self.vocab = vocab
+        self.term_ptr = term_ptr
+        self.post_docs = post_docs
+        self.post_tfs = post_tfs
+        self.doc_len = doc_len
+        n = len(docs)
+        df = np.diff(term_ptr)
+        self.idf = np.log(1 + (n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        self._norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_len / max(float(doc_len.mean()) if n else 1.0, 1e-9))
+        self._fields = {}  # 필터용 필드 값 배열 (처음 쓸 때 만듭니다)
+
+    def __len__(self):
+        return len(self.docs)
+
+    @classmethod
+    def build(cls, docs: List[Document]) -> "SparseIndex":
+        vocab = {}
+        postings = []  # term_id -> [(doc, tf), ...]
+        doc_len = np.zeros(len(docs), dtype=np.float32)
+        for d, doc in enumerate(docs):
+            counts = Counter(tokenize(doc.page_content))
+            doc_len[d] = sum(counts.values())
+            for term, tf in counts.items():
+                term_id = vocab.setdefault(term, len(vocab))
+                if term_id == len(postings):
+                    postings.append([])
+                postings[term_id].append((d, tf))
+
+        term_ptr = np.zeros(len(postings) + 1, dtype=np.int64)
+        term_ptr[1:] = np.cumsum([len(p) for p in postings])
+        post_docs = np.fromiter((d for p in postings for d, _ in p), dtype=np.int32, count=int(term_ptr[-1]))
+        post_tfs = np.fromiter((tf for p in postings for _, tf in p), dtype=np.float32, count=int(term_ptr[-1]))
+        return cls(docs, vocab, term_ptr, post_docs, post_tfs, doc_len)
+
+    def _field(self, field):
+        # 벡터 검색과 같은 기준으로 거릅니다: file은 파일명, league는 파일명 접두어
+        if field not in self._fields:
+            files = [os.path.basename(d.metadata.get("source", "")) for d in self.docs]
+            if field == "file":
+                values = files
+            elif field == "league":
+                values = [d.metadata.get("league") or league_of(f) for d, f in zip(self.docs, files)]
+            else:
+                raise ValueError(f"희소 인덱스는 file / league 필터만 지원합니다: {field}")
+            self._fields[field] = np.asarray(values, dtype=object)
+        return self._fields[field]
+
+    def _mask(self, filter):
+        mask = np.ones(len(self.docs), dtype=bool)
+        for field, value in filter.items():
+            mask &= self._field(field) == value
+        return mask
+
+    def search(self, query: str, k: int = 20, filter: Optional[dict] = None) -> List[Document]:
+        # filter: {"league": "KBO", "file": "baseball_kbo_rule_2025.pdf"} 처럼 필드 → 값 (모두 만족하는 청크만)
+        if not self.docs:
+            return []
+        scores = np.zeros(len(self.docs), dtype=np.float32)
+        for term, qtf in Counter(tokenize(query)).items():
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                continue
+            lo, hi = self.term_ptr[term_id], self.term_ptr[term_id + 1]
+            docs, tfs = self.post_docs[lo:hi], self.post_tfs[lo:hi]
+            scores[docs] += qtf * self.idf[term_id] * tfs * (BM25_K1 + 1) / (tfs + self._norm[docs])
+        if filter:
+            scores[~self._mask(filter)] = 0
+
+        hits = np.flatnonzero(scores)
+        if not len(hits):
+            return []
+        top = hits[np.argsort(-scores[hits], kind="stable")[:k]]
+        return [self.docs[i] for i in top]
+
+    def save(self, directory: str = SPARSE_INDEX_DIR):
+        # 임시 폴더에 다 쓴 뒤 바꿔치기 (서버가 반쯤 쓰인 인덱스를 읽지 않도록)
+        tmp_dir = directory.rstrip("/") + ".tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        np.savez(
+            os.path.join(tmp_dir, "postings.npz"),
+            term_ptr=self.term_ptr, post_docs=self.post_docs, post_tfs=self.post_tfs, doc_len=self.doc_len,
+        )
+        terms = sorted(self.vocab, key=self.vocab.get)
+        with open(os.path.join(tmp_dir, "vocab.json"), "w", encoding="utf-8") as f:
+            json.dump({"tokenizer_version": TOKENIZER_VERSION, "terms": terms}, f, ensure_ascii=False)
+        with open(os.path.join(tmp_dir, "docs.jsonl"), "w", encoding="utf-8") as f:
+            for doc in self.docs:
+                f.write(json.dumps({"id": doc.id, "text": doc.page_content, "metadata": doc.metadata}, ensure_ascii=False) + "\n")
+
+        old_dir = directory.rstrip("/") + ".old"
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if os.path.exists(directory):
+            os.replace(directory, old_dir)
+        os.replace(tmp_dir, directory)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory: str = SPARSE_INDEX_DIR) -> Optional["SparseIndex"]:
+        # 인덱스가 없거나 토크나이저가 바뀌었으면 None (→ 밀집 검색만 사용, 다음 인제스트 때 다시 만들어짐)
+        vocab_path = os.path.join(directory, "vocab.json")
+        if not os.path.exists(vocab_path):
+            return None
+        with open(vocab_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("tokenizer_version") != TOKENIZER_VERSION:
+            print(f"⚠️ 희소 인덱스 토크나이저 버전이 달라 사용하지 않습니다. 인제스트를 다시 돌려주세요. ({directory})")
+            return None
+        docs = []
+        with open(os.path.join(directory, "docs.jsonl"), encoding="utf-8") as f:
+            for line in f:
+                row = json.loads(line)
+                docs.append(Document(id=row["id"], page_content=row["text"], metadata=row["metadata"]))
+        arrays = np.load(os.path.join(directory, "postings.npz"))
+        vocab = {term: i for i, term in enumerate(meta["terms"])}
+        return cls(docs, vocab, arrays["term_ptr"], arrays["post_docs"], arrays["post_tfs"], arrays["doc_len"])
+
+
+def update_sparse_index(chunks: Dict[str, Document], parsed_sources=None, directory: str = SPARSE_INDEX_DIR):
+    # 이번에 파싱한 파일의 청크는 새것으로 바꾸고, 나머지 파일의 청크는 기존 인덱스에서 그대로 가져와 다시 만듭니다.
+    # parsed_sources가 None이면 전체 인제스트로 보고 chunks만으로 새로 만듭니다. (폴더에서 지운 파일도 빠지도록)
+    # (청크 수천 개 기준 1~2초라 증분 갱신 대신 통째로 다시 씁니다.)
+    existing = SparseIndex.load(directory) if parsed_sources is not None else None
+    kept = []
+    if existing is not None:
+        kept = [d for d in existing.docs if os.path.basename(d.metadata.get("source", "")) not in parsed_sources]
+    docs = sorted(kept + [Document(id=cid, page_content=d.page_content, metadata=d.metadata) for cid, d in chunks.items()], key=lambda d: d.id)
+    index = SparseIndex.build(docs)
+    index.save(directory)
+    return index
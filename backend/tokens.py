@@ -0,0 +1,27 @@
+import os
+from functools import lru_cache
+
+import tiktoken
+
+# 🟢 토큰 수 계산 (gpt-4.1 계열 = o200k_base)
+# BPE 파일을 받을 수 없는 오프라인 환경에서는 UTF-8 바이트 수 기반의 보수적 추정치로 대신합니다.
+TOKEN_ENCODING = os.getenv("TOKEN_ENCODING", "o200k_base")
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    try:
+        return tiktoken.get_encoding(TOKEN_ENCODING)
+    except Exception as e:
+        print(f"⚠️ tiktoken '{TOKEN_ENCODING}' 로드 실패, 추정치로 토큰을 셉니다: {e.__class__.__name__}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    encoding = _encoding()
+    if encoding is None:
+        # 한글 1글자(3바이트) ≈ 1토큰, 영문 3글자 ≈ 1토큰 → 실제보다 약간 많게 잡힙니다.
+        return len(text.encode("utf-8")) // 3 + 1
+    return len(encoding.encode(text))
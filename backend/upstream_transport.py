@@ -0,0 +1,51 @@
+import httpx
+
+from backend.clients import upstream_gate
+
+# 🟢 업스트림별 동시 요청 상한을 거는 httpx 전송 계층 래퍼 (backend/clients.py가 처음 클라이언트를 만들 때 import)
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    # 응답 본문을 다 읽거나 닫을 때 슬롯을 돌려줍니다. (스트리밍 응답도 끝날 때까지 한 자리로 셈)
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+
+class LimitedTransport(httpx.AsyncBaseTransport):
+    # HTTP/2는 연결 하나에 요청 여러 개가 실리므로 연결 수 상한과 별개로 동시 요청 수를 셉니다.
+    def __init__(self, transport: httpx.AsyncBaseTransport, gate_name: str):
+        self._transport = transport
+        self._gate_name = gate_name
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        gate = upstream_gate(self._gate_name)
+        await gate.acquire()
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                gate.release()
+
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            release()
+            raise
+        response.stream = _ReleasingStream(response.stream, release)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
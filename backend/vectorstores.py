@@ -0,0 +1,38 @@
+import os
+from typing import TYPE_CHECKING
+
+from backend.corpus import version_dir
+
+if TYPE_CHECKING:
+    # langchain_core.embeddings는 import가 무거워(runnables·langsmith) API 서버 시작 경로에서 뺍니다.
+    from langchain_core.embeddings import Embeddings
+
+# 🟢 검색 백엔드 선택 (backend/main.py · app.py 공용)
+# VECTOR_BACKEND=pinecone (기본) : 원격 Pinecone 인덱스
+# VECTOR_BACKEND=local           : 프로세스 안에 올린 로컬 인덱스 (backend/local_index.py, LOCAL_INDEX_DIR)
+#                                  LOCAL_INDEX_MMAP=1 이면 RAM에 복사하지 않고 memmap으로 읽습니다. (워커 여러 개가 페이지 캐시 공유)
+# version을 주면 그 코퍼스 버전을 읽습니다. (pinecone: 같은 이름의 네임스페이스 / local: corpus/<version>/local_index)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "pinecone")
+
+
+def load_vectorstore(embeddings: "Embeddings", model: str = None, backend: str = None, version: str = None):
+    backend = backend or VECTOR_BACKEND
+    if backend == "local":
+        from backend.local_index import LOCAL_INDEX_DIR, LocalVectorStore
+
+        return LocalVectorStore.load(
+            embeddings,
+            directory=os.path.join(version_dir(version), "local_index") if version else LOCAL_INDEX_DIR,
+            mmap=os.getenv("LOCAL_INDEX_MMAP", "0") == "1",
+            model=model,
+        )
+    if backend != "pinecone":
+        raise ValueError(f"알 수 없는 VECTOR_BACKEND: {backend} (pinecone | local)")
+
+    from langchain_pinecone import PineconeVectorStore
+
+    return PineconeVectorStore.from_existing_index(
+        index_name=os.getenv("PINECONE_INDEX_NAME"),
+        embedding=embeddings,
+        namespace=version,
+    )
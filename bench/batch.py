@@ -0,0 +1,83 @@
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+# 🧪 체크리스트형 질의: /chat을 하나씩 부르는 경우 vs /chat/batch 한 번 (오프라인)
+# 사용법: python -m bench.batch [--questions bench/questions.jsonl] [--repeat 2]
+# - 코퍼스·스텁은 bench/rag_eval.py와 같습니다. (단어 해싱 임베딩 + 로컬 인덱스 + 스텁 LLM, STUB_*_LATENCY로 지연 조절)
+# - 질문 세트를 --repeat번 이어 붙여 배치 크기를 키울 수 있습니다. (같은 질문은 배치 안에서 한 번만 처리됨)
+
+
+async def serial(client, questions):
+    started = time.perf_counter()
+    for question in questions:
+        response = await client.post("/chat", json={"message": question})
+        response.raise_for_status()
+    return time.perf_counter() - started
+
+
+async def batch(client, questions):
+    started = time.perf_counter()
+    first, done, rows = None, None, 0
+    # ASGITransport는 응답을 다 모아서 돌려주므로 첫 결과 시각은 서버가 적은 elapsed로 봅니다.
+    async with client.stream("POST", "/chat/batch", json={"questions": questions}) as response:
+        response.raise_for_status()
+        async for raw in response.aiter_lines():
+            if not raw.strip():
+                continue
+            row = json.loads(raw)
+            if row.get("done"):
+                done = row
+            elif "error" not in row:
+                rows += 1
+                first = row["elapsed"] if first is None else min(first, row["elapsed"])
+    return time.perf_counter() - started, first, rows, done
+
+
+async def run(args):
+    from bench.rag_eval import load_questions, load_server, prepare_corpus
+
+    args.embeddings, args.llm, args.k, args.cache, args.rerank = "lexical", "stub", None, False, None
+    args.embedding_model, args.chunk_tokens, args.rebuild = None, None, False
+    items = load_questions(args.questions)
+    questions = [q["question"] for q in items] * args.repeat
+    _, embeddings = prepare_corpus(args)
+    main = load_server(args, embeddings, items)
+
+    import httpx
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        serial_s = await serial(client, questions)
+        batch_s, first_s, answered, done = await batch(client, questions)
+
+    print(json.dumps({
+        "questions": len(questions),
+        "serial_s": round(serial_s, 2),
+        "batch_s": round(batch_s, 2),
+        "batch_first_result_s": round(first_s or 0.0, 2),
+        "speedup": round(serial_s / batch_s, 1) if batch_s else None,
+        "answered": answered,
+        "batch_concurrency": main.BATCH_CONCURRENCY,
+        "router_calls": done and done["router_calls"],
+        "answer_calls": done and done["answer_calls"],
+        "shared_groups": done and done["shared_groups"],
+    }, ensure_ascii=False))
+
+
+def main():
+    from bench.rag_eval import CACHE_DIR, PDF_FOLDER, QUESTIONS_PATH
+
+    parser = argparse.ArgumentParser(description="책첵 배치 질의 벤치마크")
+    parser.add_argument("--questions", default=QUESTIONS_PATH)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--pdfs", default=PDF_FOLDER)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+# 🧪 /chat 부하 테스트 (오프라인)
+# 사용법: python -m bench.load_test --requests 200 --concurrency 100
+# - 스텁 LLM/벡터 DB(bench/stubs.py)로 서버를 띄워 네트워크·과금 없이 동시성 효과를 측정합니다.
+# - --baseline 을 주면 예전 방식(동기 invoke를 스레드풀에서 실행)과 나란히 비교합니다.
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(label, latencies, statuses, wall):
+    ok = statuses.count(200)
+    return {
+        "mode": label,
+        "requests": len(statuses),
+        "ok": ok,
+        "429": statuses.count(429),
+        "503": statuses.count(503),
+        "errors": len(statuses) - ok - statuses.count(429) - statuses.count(503),
+        "wall_s": round(wall, 2),
+        "throughput_rps": round(ok / wall, 2) if wall else 0.0,
+        "p50_s": round(percentile(latencies, 50), 3),
+        "p95_s": round(percentile(latencies, 95), 3),
+        "p99_s": round(percentile(latencies, 99), 3),
+        "mean_s": round(statistics.fmean(latencies), 3) if latencies else 0.0,
+    }
+
+
+async def fire(client, path, n, concurrency, question):
+    gate = asyncio.Semaphore(concurrency)
+    latencies, statuses = [], []
+
+    async def one(i):
+        async with gate:
+            t0 = time.perf_counter()
+            response = await client.post(path, json={"message": question, "session_id": f"{path}-{i}"})
+            latencies.append(time.perf_counter() - t0)
+            statuses.append(response.status_code)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n)))
+    return latencies, statuses, time.perf_counter() - t0
+
+
+def mount_baseline(main):
+    # 예전 chat_endpoint 와 동일한 동기 경로 (starlette 스레드풀에서 실행됨)
+    @main.app.post("/_baseline_chat")
+    def baseline_chat(request: main.ChatRequest):
+        main.router_chain.invoke({"question": request.message})
+        inputs = {"input": request.message, "chat_history": main.session_store.messages(request.session_id)}
+        # 예전에는 히스토리가 있으면 라우터와 별도로 재구성 LLM을 한 번 더 불렀습니다.
+        question = request.message
+        if inputs["chat_history"]:
+            route = main.history_router_chain.invoke({"question": request.message, "chat_history": inputs["chat_history"]})
+            question = route.standalone_question or request.message
+        context = main.corpus.vectorstore.similarity_search(question, k=main.RETRIEVAL_K)
+        answer = main.answer_chain.invoke({**inputs, "context": context})
+        main.session_store.append_turn(request.session_id, request.message, answer)
+        return {"answer": answer}
+
+
+async def run(args):
+    from bench import stubs
+
+    stubs.install()
+    os.environ["CHAT_MAX_INFLIGHT"] = str(args.max_inflight)
+    os.environ["CHAT_MAX_QUEUE"] = str(args.max_queue)
+    os.environ["CHAT_MAX_WAIT"] = str(args.max_wait)
+    # 같은 질문을 반복해서 보내므로, 캐시 효과를 보려는 게 아니면 의미 캐시는 끕니다.
+    os.environ["SEMANTIC_CACHE"] = "1" if args.cache else "0"
+    # 답변 LLM까지 가는 경로를 재므로 거절 사전 판정은 끕니다.
+    os.environ["REFUSAL_PRECHECK"] = "0"
+
+    import httpx
+    from backend import main
+
+    main.initialize()
+
+    if args.baseline:
+        mount_baseline(main)
+
+    reports = []
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        if args.baseline:
+            latencies, statuses, wall = await fire(
+                client, "/_baseline_chat", args.requests, args.concurrency, args.question
+            )
+            reports.append(summarize("threadpool-baseline", latencies, statuses, wall))
+
+        latencies, statuses, wall = await fire(client, "/chat", args.requests, args.concurrency, args.question)
+        reports.append(summarize("async", latencies, statuses, wall))
+
+    for report in reports:
+        print(json.dumps(report, ensure_ascii=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="책첵 /chat 오프라인 부하 테스트")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--question", default="KBO 외국인 선수 몇 명까지 보유할 수 있어?")
+    parser.add_argument("--max-inflight", type=int, default=256)
+    parser.add_argument("--max-queue", type=int, default=1024)
+    parser.add_argument("--max-wait", type=float, default=30)
+    parser.add_argument("--baseline", action="store_true", help="동기 스레드풀 방식과 비교")
+    parser.add_argument("--cache", action="store_true", help="의미 기반 답변 캐시 켜기")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
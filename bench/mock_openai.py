@@ -0,0 +1,181 @@
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from bench.stubs import LexicalEmbeddings
+
+# 🧪 로컬 OpenAI 호환 목 서버 (/v1/chat/completions, /v1/embeddings)
+# 사용법: python -m bench.mock_openai --port 8900 [--latency 0.2] [--embed-latency 0.05] [--fail-rate 0.1]
+#   → OPENAI_BASE_URL=http://127.0.0.1:8900/v1 OPENAI_API_KEY=mock 으로 서버·인제스트를 띄우면 실제 클라이언트 계층
+#     (backend/clients.py의 커넥션 풀, 타임아웃, 재시도, 동시 요청 상한)을 네트워크 없이 시험할 수 있습니다.
+# - 라우터(구조화 출력: tools / json_schema)에는 질문에 축구·K리그가 있으면 K리그, 아니면 KBO로 답합니다.
+# - 임베딩은 bench/stubs.py의 단어 해싱 임베딩이라 EMBEDDING_MODEL=lexical-hash-1024로 만든 벤치 코퍼스와 그대로 맞습니다.
+# - --fail-rate 비율만큼 429 + Retry-After로 거절해 재시도·백오프를 확인합니다.
+# - GET /stats: 요청 수, 거절 수, 동시 처리 최대치, TCP 연결 수(클라이언트 포트 기준), HTTP 버전별 요청 수 / POST /stats/reset
+# - --certfile/--keyfile을 주면 TLS로 받습니다. --http2를 더하면 hypercorn(h2 필요)으로 띄워 ALPN으로 HTTP/2를 협상합니다.
+#   (uvicorn은 HTTP/1.1만 받으므로, 클라이언트가 실제로 HTTP/2로 붙었는지는 /stats의 http_versions로 확인)
+
+ANSWER = "**제17조(외국인 선수)** 에 따라 각 구단은 외국인 선수를 최대 3명까지 보유할 수 있습니다."
+
+app = FastAPI(title="mock-openai")
+config = {"latency": 0.2, "embed_latency": 0.05, "fail_rate": 0.0, "retry_after": 0.05}
+stats = {}
+
+
+def reset_stats():
+    stats.update(requests={}, rejected=0, inflight=0, max_inflight=0, connections=set(), http_versions={})
+
+
+reset_stats()
+
+
+def domain_of(text: str) -> str:
+    return "K리그" if any(word in text for word in ("K리그", "축구", "클럽")) else "KBO"
+
+
+def route_arguments(body: dict) -> str:
+    question = next((m.get("content") or "" for m in reversed(body["messages"]) if m["role"] == "user"), "")
+    return json.dumps({"domain": domain_of(question), "confidence": 0.9}, ensure_ascii=False)
+
+
+def completion(body: dict) -> dict:
+    message = {"role": "assistant", "content": ANSWER}
+    if body.get("tools"):
+        name = body["tools"][0]["function"]["name"]
+        message = {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [{"id": f"call_{uuid.uuid4().hex[:8]}", "type": "function", "function": {"name": name, "arguments": route_arguments(body)}}],
+        }
+    elif (body.get("response_format") or {}).get("type") in ("json_schema", "json_object"):
+        message["content"] = route_arguments(body)
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "mock"),
+        "choices": [{"index": 0, "message": message, "finish_reason": "tool_calls" if body.get("tools") else "stop"}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+
+
+async def stream_completion(body: dict, latency: float):
+    # 첫 토큰까지 지연의 30%, 나머지는 단어 단위로 나눠 보냅니다.
+    base = {"id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "object": "chat.completion.chunk", "created": int(time.time()), "model": body.get("model", "mock")}
+    words = ANSWER.split(" ")
+    await asyncio.sleep(latency * 0.3)
+    for i, word in enumerate(words):
+        if i:
+            await asyncio.sleep(latency * 0.7 / len(words))
+        delta = {"role": "assistant", "content": word} if i == 0 else {"content": " " + word}
+        yield f"data: {json.dumps({**base, 'choices': [{'index': 0, 'delta': delta, 'finish_reason': None}]}, ensure_ascii=False)}\n\n"
+    yield f"data: {json.dumps({**base, 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]})}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+@app.middleware("http")
+async def track(request: Request, call_next):
+    if request.url.path.startswith("/stats"):
+        return await call_next(request)
+    stats["connections"].add((request.client.host, request.client.port))
+    stats["requests"][request.url.path] = stats["requests"].get(request.url.path, 0) + 1
+    version = request.scope.get("http_version", "1.1")
+    stats["http_versions"][version] = stats["http_versions"].get(version, 0) + 1
+    if random.random() < config["fail_rate"]:
+        stats["rejected"] += 1
+        return JSONResponse(
+            {"error": {"message": "Rate limit reached (mock)", "type": "rate_limit_exceeded"}},
+            status_code=429,
+            headers={"Retry-After": str(config["retry_after"])},
+        )
+    stats["inflight"] += 1
+    stats["max_inflight"] = max(stats["max_inflight"], stats["inflight"])
+    try:
+        return await call_next(request)
+    finally:
+        stats["inflight"] -= 1
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    latency = config["latency"] / 2 if body.get("tools") or body.get("response_format") else config["latency"]
+    if body.get("stream"):
+        return StreamingResponse(stream_completion(body, latency), media_type="text/event-stream")
+    await asyncio.sleep(latency)
+    return completion(body)
+
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    texts = [body["input"]] if isinstance(body["input"], str) else body["input"]
+    if texts and not isinstance(texts[0], str):
+        return JSONResponse({"error": {"message": "토큰 배열 입력은 지원하지 않습니다.", "type": "invalid_request_error"}}, status_code=400)
+    await asyncio.sleep(config["embed_latency"])
+    size = int(body.get("dimensions") or 1024)
+    vectors = LexicalEmbeddings(size).embed_documents(texts)
+    return {
+        "object": "list",
+        "model": body.get("model", "mock"),
+        "data": [{"object": "embedding", "index": i, "embedding": v} for i, v in enumerate(vectors)],
+        "usage": {"prompt_tokens": 0, "total_tokens": 0},
+    }
+
+
+@app.get("/stats")
+async def get_stats():
+    return {**{k: v for k, v in stats.items() if k != "connections"}, "connections": len(stats["connections"])}
+
+
+@app.post("/stats/reset")
+async def post_reset():
+    reset_stats()
+    return {"ok": True}
+
+
+def serve_http2(args):
+    try:
+        from hypercorn.asyncio import serve
+        from hypercorn.config import Config
+    except ImportError:
+        raise SystemExit("❌ --http2에는 hypercorn이 필요합니다. (pip install hypercorn h2)") from None
+    hypercorn_config = Config()
+    hypercorn_config.bind = [f"127.0.0.1:{args.port}"]
+    hypercorn_config.certfile, hypercorn_config.keyfile = args.certfile, args.keyfile
+    hypercorn_config.loglevel = "WARNING"
+    asyncio.run(serve(app, hypercorn_config))
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="OpenAI 호환 목 서버")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=config["latency"], help="답변 지연(초), 라우터는 절반")
+    parser.add_argument("--embed-latency", type=float, default=config["embed_latency"])
+    parser.add_argument("--fail-rate", type=float, default=config["fail_rate"], help="429로 거절할 비율 (0~1)")
+    parser.add_argument("--retry-after", type=float, default=config["retry_after"])
+    parser.add_argument("--certfile", default=None, help="TLS 인증서 (PEM)")
+    parser.add_argument("--keyfile", default=None, help="TLS 개인 키 (PEM)")
+    parser.add_argument("--http2", action="store_true", help="TLS + ALPN으로 HTTP/2를 받음 (hypercorn, --certfile 필요)")
+    args = parser.parse_args()
+    config.update(latency=args.latency, embed_latency=args.embed_latency, fail_rate=args.fail_rate, retry_after=args.retry_after)
+    if args.http2:
+        if not args.certfile:
+            parser.error("--http2에는 --certfile/--keyfile이 필요합니다.")
+        serve_http2(args)
+        return 0
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning", ssl_certfile=args.certfile, ssl_keyfile=args.keyfile)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
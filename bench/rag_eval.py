@@ -0,0 +1,361 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench.load_test import percentile
+
+# 🧪 RAG 파이프라인 오프라인 벤치마크 & 회귀 비교
+# 사용법:
+#   python -m bench.rag_eval                                    # 단어 해싱 임베딩 + 스텁 LLM (네트워크 없음)
+#   python -m bench.rag_eval --k 8 --chunk-tokens 384 --label k8
+#   python -m bench.rag_eval --baseline bench/results/<이전 결과>.json   # 이전 실행과 지표·질문별 순위 비교
+#   python -m bench.rag_eval --embeddings openai --label te3l   # 실제 임베딩으로 한 번 돌리며 .bench_cache에 녹화
+#   python -m bench.rag_eval --embeddings recorded              # 녹화한 임베딩만 재생 (네트워크 없음, 없는 텍스트면 실패)
+# 1. 검색 품질: bench/questions.jsonl의 질문마다 실제 서버 경로(_route_and_retrieve)로 찾은 청크 순위에서
+#    정답(파일 + 쪽, ±--page-tolerance)이 몇 번째인지 → recall@1/3/k, MRR (파일만 맞춘 경우도 따로)
+# 2. 종단 간: /chat에 --concurrency개씩 동시에 보내 지연 p50/p95/p99, 처리량, 답변당 토큰(usage)
+# 3. 결과: bench/results/<시각>-<label>.json (설정 + git 커밋 + 요약 + 질문별 결과). 두 파일을 diff 하거나 --baseline으로 비교
+# - 코퍼스는 frontend/public/pdfs를 인제스트와 같은 청커로 잘라 로컬 인덱스(VECTOR_BACKEND=local) + BM25 인덱스로 만듭니다.
+#   PDF·청크 크기·임베딩이 같으면 .bench_cache에 만들어 둔 인덱스를 다시 씁니다.
+# - 스텁 LLM의 라우터는 질문 세트에 적힌 리그를 그대로 돌려줍니다. (로컬 사전 분류기가 먼저 정하면 라우터는 안 불림)
+
+PDF_FOLDER = "./frontend/public/pdfs"
+QUESTIONS_PATH = "./bench/questions.jsonl"
+CACHE_DIR = "./.bench_cache"
+RESULTS_DIR = "./bench/results"
+LEXICAL_DIM = 1024
+CORPUS_MODULES = ("./backend/chunker.py", "./backend/ingestion.py", "./backend/sparse_index.py", "./backend/regulations.py")
+
+
+def load_questions(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True).stdout.strip()
+        return commit + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def embedding_model(args):
+    return f"lexical-hash-{LEXICAL_DIM}" if args.embeddings == "lexical" else args.embedding_model
+
+
+def make_embeddings(args):
+    from backend.embedding_cache import CachedEmbeddings
+    from bench.stubs import LexicalEmbeddings, ReplayEmbeddings
+
+    model = embedding_model(args)
+    if args.embeddings == "lexical":
+        # 계산이 싸므로 캐시는 임시 폴더에 (실제 임베딩 캐시와 섞이지 않게)
+        return CachedEmbeddings(LexicalEmbeddings(LEXICAL_DIM), model=model, directory=tempfile.mkdtemp(prefix="chaekcheck-lex-"))
+    directory = os.path.join(args.cache_dir, "embeddings")
+    # 녹화·재생에는 질문 임베딩도 디스크에 남깁니다. (서버는 질문을 메모리에만 둠)
+    if args.embeddings == "recorded":
+        return CachedEmbeddings(ReplayEmbeddings(model), model=model, directory=directory, persist_queries=True)
+    from langchain_openai import OpenAIEmbeddings
+
+    return CachedEmbeddings(OpenAIEmbeddings(model=model), model=model, directory=directory, persist_queries=True)
+
+
+def corpus_key(args):
+    # PDF, 청킹·토크나이저 코드, 청크 크기, 임베딩 모델이 같으면 같은 코퍼스입니다.
+    # (서버 모듈은 import 시점에 인덱스 경로를 읽으므로 여기서는 backend를 import하지 않습니다.)
+    digest = hashlib.sha256()
+    for filename in sorted(f for f in os.listdir(args.pdfs) if f.endswith(".pdf")):
+        with open(os.path.join(args.pdfs, filename), "rb") as f:
+            digest.update(filename.encode("utf-8") + hashlib.sha256(f.read()).digest())
+    for module in CORPUS_MODULES:
+        with open(module, "rb") as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    digest.update(f"{os.getenv('CHUNK_MAX_TOKENS', '')}:{embedding_model(args)}".encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def build_corpus(args, directory, embeddings):
+    # 인제스트와 같은 파싱·청킹·청크 ID로 로컬 벡터 인덱스와 BM25 인덱스를 만듭니다.
+    from backend.ingestion import BATCH_SIZE, chunk_id, iter_parsed_files, split_documents
+    from backend.local_index import write_index
+    from backend.sparse_index import SparseIndex
+    from langchain_core.documents import Document
+
+    files = sorted(f for f in os.listdir(args.pdfs) if f.endswith(".pdf"))
+    docs = []
+    for path, pages in iter_parsed_files([os.path.join(args.pdfs, f) for f in files]):
+        seen = {}
+        for doc in split_documents(os.path.basename(path), pages):
+            docs.append(Document(id=chunk_id(doc, seen), page_content=doc.page_content, metadata=doc.metadata))
+    docs.sort(key=lambda d: d.id)
+
+    vectors = []
+    for i in range(0, len(docs), BATCH_SIZE):
+        vectors.extend(embeddings.embed_documents([d.page_content for d in docs[i : i + BATCH_SIZE]]))
+    write_index(os.path.join(directory, "local_index"), vectors, docs, embedding_model(args), "bench")
+    SparseIndex.build(docs).save(os.path.join(directory, "sparse_index"))
+    print(f"📦 벤치 코퍼스 생성: {len(files)}개 파일 → {len(docs)}개 청크 ({directory})", file=sys.stderr)
+    return len(docs)
+
+
+def prepare_corpus(args):
+    # 서버 모듈이 import 시점에 읽는 설정(청크 크기, 인덱스 경로)을 먼저 정한 뒤 코퍼스를 준비합니다.
+    if args.chunk_tokens:
+        os.environ["CHUNK_MAX_TOKENS"] = str(args.chunk_tokens)
+    key = corpus_key(args)
+    directory = os.path.join(args.cache_dir, "corpus", key)
+    os.environ["VECTOR_BACKEND"] = "local"
+    os.environ["LOCAL_INDEX_DIR"] = os.path.join(directory, "local_index")
+    os.environ["SPARSE_INDEX_DIR"] = os.path.join(directory, "sparse_index")
+    # 작업 폴더의 코퍼스 레지스트리(블루/그린 버전)는 보지 않고 위 인덱스를 그대로 씁니다.
+    os.environ["CORPUS_REGISTRY_PATH"] = os.path.join(directory, "registry.json")
+    embeddings = make_embeddings(args)
+    if args.rebuild or not os.path.exists(os.path.join(directory, "sparse_index", "vocab.json")):
+        build_corpus(args, directory, embeddings)
+    return key, embeddings
+
+
+def load_server(args, embeddings, questions):
+    if args.k:
+        os.environ["RETRIEVAL_K"] = os.environ["SCOPED_RETRIEVAL_K"] = str(args.k)
+    os.environ["EMBEDDING_MODEL"] = embedding_model(args)
+    if args.rerank:
+        os.environ["RERANK"] = args.rerank
+    # 같은 질문을 여러 번 보내므로 의미 캐시는 기본으로 끕니다. (--cache로 켜기)
+    os.environ["SEMANTIC_CACHE"] = "1" if args.cache else "0"
+    os.environ.setdefault("CHAT_MAX_INFLIGHT", "256")
+    os.environ.setdefault("CHAT_MAX_QUEUE", "1024")
+    os.environ.setdefault("CHAT_MAX_WAIT", "60")
+    if args.llm == "stub":
+        from bench import stubs
+
+        stubs.install()
+
+    from backend import main
+
+    # 라우터·임베딩을 바꿔 끼우기 전에 초기화를 끝내 둡니다. (첫 요청 때 다시 만들지 않도록)
+    main.initialize()
+    main.embeddings = embeddings
+    main.corpus.vectorstore.embedding = embeddings
+    if args.llm == "stub":
+        replay_router(main, questions)
+    return main
+
+
+def replay_router(main, questions):
+    # 스텁 라우터: 질문 세트에 적힌 리그를 확신도 1로 돌려줍니다. (규정집까지는 고르지 않음)
+    from langchain_core.runnables import RunnableLambda
+
+    from bench.stubs import ROUTER_LATENCY
+
+    leagues = {q["question"]: q["league"] for q in questions}
+
+    def route(payload):
+        return main.RouteQuery(domain=leagues.get(payload["question"], "KBO"))
+
+    async def aroute(payload):
+        await asyncio.sleep(ROUTER_LATENCY)
+        return route(payload)
+
+    main.router_chain = RunnableLambda(route, afunc=aroute)
+
+
+def is_hit(doc, question, tolerance):
+    # 청크 메타데이터의 page는 0부터, 질문 세트의 page는 PDF 뷰어 기준(1부터)입니다.
+    if os.path.basename(doc.metadata.get("source", "")) != question["file"]:
+        return False
+    return abs(int(doc.metadata.get("page", 0)) + 1 - question["page"]) <= tolerance
+
+
+def first_rank(docs, match):
+    return next((i + 1 for i, doc in enumerate(docs) if match(doc)), None)
+
+
+async def evaluate_retrieval(main, questions, tolerance):
+    rows = []
+    for q in questions:
+        started = time.perf_counter()
+        domain, retrieval = await main._route_and_retrieve(q["question"], {"input": q["question"], "chat_history": []})
+        elapsed = time.perf_counter() - started
+        docs = retrieval.context if retrieval is not None else []
+        rows.append({
+            "id": q["id"],
+            "domain": domain,
+            "scope": retrieval.scope if retrieval is not None else None,
+            "rank": first_rank(docs, lambda d: is_hit(d, q, tolerance)),
+            "file_rank": first_rank(docs, lambda d: os.path.basename(d.metadata.get("source", "")) == q["file"]),
+            "chunks": len(docs),
+            "retrieved": [f"{os.path.basename(d.metadata.get('source', ''))}#{int(d.metadata.get('page', 0)) + 1}" for d in docs],
+            "latency_ms": round(elapsed * 1000, 1),
+        })
+    return rows
+
+
+def summarize_retrieval(rows, k):
+    n = len(rows) or 1
+
+    def recall(at, field="rank"):
+        return round(sum(1 for r in rows if r[field] is not None and r[field] <= at) / n, 3)
+
+    latencies = [r["latency_ms"] for r in rows]
+    return {
+        "questions": len(rows),
+        "recall@1": recall(1),
+        "recall@3": recall(3),
+        f"recall@{k}": recall(k),
+        "mrr": round(sum(1 / r["rank"] for r in rows if r["rank"]) / n, 3),
+        f"file_recall@{k}": recall(k, "file_rank"),
+        "file_mrr": round(sum(1 / r["file_rank"] for r in rows if r["file_rank"]) / n, 3),
+        "chunks_mean": round(statistics.fmean(r["chunks"] for r in rows), 2) if rows else 0.0,
+        "retrieval_p50_ms": percentile(latencies, 50),
+        "retrieval_p95_ms": percentile(latencies, 95),
+    }
+
+
+async def evaluate_end_to_end(main, questions, requests, concurrency):
+    import httpx
+
+    gate = asyncio.Semaphore(concurrency)
+    latencies, statuses, usages = [], [], []
+
+    async def one(client, i):
+        q = questions[i % len(questions)]
+        async with gate:
+            started = time.perf_counter()
+            response = await client.post("/chat", json={"message": q["question"]})
+            latencies.append(time.perf_counter() - started)
+        statuses.append(response.status_code)
+        if response.status_code == 200:
+            body = response.json()
+            usages.append({**body.get("usage", {}), "no_sources": not body["sources"], "is_refusal": body["is_refusal"]})
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(one(client, i) for i in range(requests)))
+        wall = time.perf_counter() - started
+
+    ok = statuses.count(200)
+    prompt = [u.get("prompt_tokens", 0) for u in usages]
+    completion = [u.get("completion_tokens", 0) for u in usages]
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "ok": ok,
+        "errors": requests - ok,
+        "wall_s": round(wall, 2),
+        "throughput_rps": round(ok / wall, 2) if wall else 0.0,
+        "p50_s": round(percentile(latencies, 50), 3),
+        "p95_s": round(percentile(latencies, 95), 3),
+        "p99_s": round(percentile(latencies, 99), 3),
+        "prompt_tokens_mean": round(statistics.fmean(prompt), 1) if prompt else 0.0,
+        "completion_tokens_mean": round(statistics.fmean(completion), 1) if completion else 0.0,
+        "tokens_per_answer": round(statistics.fmean(p + c for p, c in zip(prompt, completion)), 1) if prompt else 0.0,
+        "no_sources": sum(1 for u in usages if u["no_sources"]),
+        "refusals": sum(1 for u in usages if u["is_refusal"]),
+    }
+
+
+def compare(current, baseline_path):
+    # 요약 지표는 (이전 → 지금, 차이), 질문별로는 정답 순위가 바뀐 것만 보여 줍니다.
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    diff = {"baseline": baseline_path, "baseline_commit": baseline["config"].get("git_commit"), "summary": {}, "rank_changes": []}
+    for section in ("retrieval", "end_to_end"):
+        old, new = baseline["summary"].get(section) or {}, current["summary"].get(section) or {}
+        for name in sorted(set(old) & set(new)):
+            if isinstance(new[name], (int, float)) and old[name] != new[name]:
+                diff["summary"][f"{section}.{name}"] = [old[name], new[name], round(new[name] - old[name], 3)]
+    old_ranks = {r["id"]: r["rank"] for r in baseline["questions"]}
+    for row in current["questions"]:
+        if row["id"] in old_ranks and old_ranks[row["id"]] != row["rank"]:
+            diff["rank_changes"].append({"id": row["id"], "before": old_ranks[row["id"]], "after": row["rank"]})
+    return diff
+
+
+async def run(args):
+    questions = load_questions(args.questions)
+    key, embeddings = prepare_corpus(args)
+    main = load_server(args, embeddings, questions)
+
+    rows = await evaluate_retrieval(main, questions, args.page_tolerance)
+    summary = {"retrieval": summarize_retrieval(rows, main.RETRIEVAL_K)}
+    if args.requests:
+        summary["end_to_end"] = await evaluate_end_to_end(main, questions, args.requests, args.concurrency)
+
+    from backend.chunker import CHUNK_MAX_TOKENS
+    from bench import stubs
+
+    result = {
+        "config": {
+            "label": args.label,
+            "git_commit": git_commit(),
+            "questions": args.questions,
+            "corpus": key,
+            "chunks": len(main.corpus.vectorstore.index),
+            "chunk_max_tokens": CHUNK_MAX_TOKENS,
+            "retrieval_k": main.RETRIEVAL_K,
+            "scoped_retrieval_k": main.SCOPED_RETRIEVAL_K,
+            "hybrid": main.corpus.sparse_index is not None,
+            "rerank": main.rerank_stage.reranker.name if main.rerank_stage is not None else None,
+            "context_compression": main.CONTEXT_COMPRESSION,
+            "prompt_token_budget": int(os.getenv("PROMPT_TOKEN_BUDGET", "3000")),
+            "embeddings": args.embeddings,
+            "embedding_model": embedding_model(args),
+            "llm": args.llm,
+            "answer_model": main.ANSWER_MODEL if args.llm == "openai" else "stub",
+            "router_model": main.ROUTER_MODEL if args.llm == "openai" else "stub",
+            "stub_latency_s": {"llm": stubs.LLM_LATENCY, "router": stubs.ROUTER_LATENCY} if args.llm == "stub" else None,
+            "page_tolerance": args.page_tolerance,
+        },
+        "summary": summary,
+        "questions": rows,
+    }
+    if args.baseline:
+        result["comparison"] = compare(result, args.baseline)
+
+    os.makedirs(args.out, exist_ok=True)
+    path = os.path.join(args.out, f"{time.strftime('%Y%m%d-%H%M%S')}-{args.label}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    if args.baseline:
+        print(json.dumps(result["comparison"], ensure_ascii=False, indent=2))
+    print(f"💾 {path}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="책첵 RAG 오프라인 벤치마크 (검색 품질 + 종단 간 지연)")
+    parser.add_argument("--questions", default=QUESTIONS_PATH)
+    parser.add_argument("--pdfs", default=PDF_FOLDER)
+    parser.add_argument("--k", type=int, default=None, help="RETRIEVAL_K / SCOPED_RETRIEVAL_K 덮어쓰기")
+    parser.add_argument("--chunk-tokens", type=int, default=None, help="CHUNK_MAX_TOKENS 덮어쓰기 (코퍼스를 다시 만듦)")
+    parser.add_argument("--embeddings", choices=["lexical", "recorded", "openai"], default="lexical")
+    parser.add_argument("--embedding-model", default=os.getenv("EMBEDDING_MODEL", "text-embedding-3-large"))
+    parser.add_argument("--llm", choices=["stub", "openai"], default="stub")
+    parser.add_argument("--requests", type=int, default=120, help="종단 간 요청 수 (0이면 검색만)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--page-tolerance", type=int, default=1, help="정답 쪽 ± 허용 범위")
+    parser.add_argument("--rerank", choices=["auto", "onnx", "lexical", "off"], default=None, help="RERANK 덮어쓰기 (재정렬 + 적응형 k)")
+    parser.add_argument("--cache", action="store_true", help="의미 기반 답변 캐시 켜기")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--rebuild", action="store_true", help="코퍼스 인덱스를 다시 만들기")
+    parser.add_argument("--baseline", default=None, help="비교할 이전 결과 JSON")
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--out", default=RESULTS_DIR)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
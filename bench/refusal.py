@@ -0,0 +1,204 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+# 🧪 거절 사전 판정 기준값 보정 & 리포트 (backend/refusal.py)
+# 사용법:
+#   python -m bench.refusal                          # 보정 결과와 지금 기준값(보정 파일/환경 변수, 없으면 꺼짐)의 성능만 보기
+#   python -m bench.refusal --write                  # 보정한 기준값을 REFUSAL_THRESHOLDS_PATH에 저장 (서버가 시작할 때 읽음)
+#   python -m bench.refusal --embeddings openai --llm openai   # 실제 임베딩·라우터로 (실서비스 기준값은 서빙 중인 임베딩 모델로 맞춰야 함)
+# - 라벨: bench/questions.jsonl은 모두 답할 수 있는 질문, bench/refusal_questions.jsonl은 코퍼스로 답할 수 없는 질문입니다.
+# - 질문마다 실제 서버 경로(_route_and_retrieve: 사전 분류기·라우터의 검색 범위 포함)로 검색해 (1등 벡터 유사도, 단어 겹침)을 구하고,
+#   거짓 거절률(답할 수 있는 질문을 거절한 비율)이 --max-false-refusal 이하인 기준값 중 답할 수 없는 질문을 가장 많이 거르는 것을 고릅니다.
+#   같으면 더 낮은(덜 거절하는) 기준값을 고르고, 기준값은 관측값 사이의 중간에 둡니다.
+#   라우터가 이미 거절한 질문(비관련·미지원 종목)은 검색을 하지 않으므로 보정에서 빼고 따로 셉니다.
+# - 같은 질문으로 맞추고 재면 거짓 거절률이 낙관적으로 나오므로 leave-one-out으로 잽니다.
+#   (질문 하나를 빼고 맞춘 기준값으로 그 질문을 판정) --write는 이 표본 밖 거짓 거절률이 --max-false-refusal 이하일 때만 저장합니다.
+# - 리포트: 아낀 답변 LLM 호출 수(사전 판정으로 거절한 질문 수), 거짓 거절 수·비율, 놓친 질문 (표본 안 / leave-one-out)
+# - 코퍼스는 bench/rag_eval.py와 같고, 마지막으로 /chat을 불러 응답의 refusal_reason이 판정과 맞는지 확인합니다.
+REFUSAL_QUESTIONS_PATH = "./bench/refusal_questions.jsonl"
+
+
+async def collect(main, questions):
+    from backend.refusal import signals
+
+    rows = []
+    for q in questions:
+        domain, retrieval = await main._route_and_retrieve(q["question"], {"input": q["question"], "chat_history": []})
+        row = {"id": q["id"], "question": q["question"], "answerable": q.get("answerable", True), "domain": domain}
+        if retrieval is None:
+            # 라우터가 거절한 질문: 사전 판정까지 오지 않습니다.
+            rows.append({**row, "top_score": None, "overlap": None})
+            continue
+        top_score, overlap = signals(retrieval.question, retrieval.context, retrieval.scores, main.corpus.sparse_index)
+        rows.append({**row, "top_score": round(top_score, 4) if top_score is not None else None, "overlap": round(overlap, 4)})
+    return rows
+
+
+def checkable(rows):
+    # 사전 판정을 할 수 있는 질문 (라우터가 거절하지 않았고 벡터 유사도가 있음)
+    return [r for r in rows if r["top_score"] is not None]
+
+
+def refused(row, min_score, min_overlap):
+    return row["top_score"] is not None and row["top_score"] < min_score and row["overlap"] < min_overlap
+
+
+def evaluate(rows, decisions):
+    # decisions: id → 사전 판정으로 거절했는지 (표본 안이든 leave-one-out이든 같은 방식으로 셉니다)
+    answerable = [r for r in rows if r["answerable"]]
+    unanswerable = [r for r in rows if not r["answerable"]]
+    false_refusals = [r["id"] for r in answerable if decisions.get(r["id"])]
+    caught = [r["id"] for r in unanswerable if decisions.get(r["id"])]
+    return {
+        "answerable": len(answerable),
+        "unanswerable": len(unanswerable),
+        "llm_calls_saved": len(caught) + len(false_refusals),
+        "unanswerable_caught": len(caught),
+        "unanswerable_caught_rate": round(len(caught) / len(unanswerable), 3) if unanswerable else 0.0,
+        "false_refusals": len(false_refusals),
+        "false_refusal_rate": round(len(false_refusals) / len(answerable), 3) if answerable else 0.0,
+        "false_refusal_ids": false_refusals,
+        "missed_ids": [r["id"] for r in unanswerable if r["id"] not in caught and r["top_score"] is not None],
+        "router_refused_ids": [r["id"] for r in rows if r["overlap"] is None],
+    }
+
+
+def apply(rows, min_score, min_overlap):
+    return {r["id"]: refused(r, min_score, min_overlap) for r in rows}
+
+
+def cut_points(values):
+    # 0(거절 안 함) + 관측값 사이의 중간 + 최댓값 바로 위
+    values = sorted(set(values))
+    return [0.0] + [(a + b) / 2 for a, b in zip(values, values[1:])] + ([values[-1] + 1e-3] if values else [])
+
+
+def calibrate(rows, max_false_refusal):
+    # → (min_score, min_overlap). 0, 0이면 아무것도 거절하지 않습니다.
+    scored = checkable(rows)
+    answerable = sum(1 for r in scored if r["answerable"]) or 1
+    best = None
+    for min_score in cut_points(r["top_score"] for r in scored):
+        for min_overlap in cut_points(r["overlap"] for r in scored):
+            hits = [r["answerable"] for r in scored if refused(r, min_score, min_overlap)]
+            false_refusals = sum(hits)
+            if false_refusals / answerable > max_false_refusal:
+                continue
+            key = (len(hits) - false_refusals, -false_refusals, -(min_score + min_overlap))
+            if best is None or key > best[0]:
+                best = (key, (min_score, min_overlap))
+    return best[1]
+
+
+def leave_one_out(rows, max_false_refusal):
+    # 질문마다 그 질문을 뺀 나머지로 맞춘 기준값으로 판정합니다.
+    scored = checkable(rows)
+    decisions = {}
+    for i, row in enumerate(scored):
+        min_score, min_overlap = calibrate(scored[:i] + scored[i + 1 :], max_false_refusal)
+        decisions[row["id"]] = refused(row, min_score, min_overlap)
+    return decisions
+
+
+async def check_endpoint(main, rows, questions):
+    # 보정한 기준값으로 /chat을 불러 응답의 구조화된 거절 필드를 셉니다. (스텁 LLM은 거절하지 않음)
+    import httpx
+
+    reasons = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        responses = await asyncio.gather(*(client.post("/chat", json={"message": q["question"]}) for q in questions))
+    for row, response in zip(rows, responses):
+        body = response.json()
+        reason = body.get("refusal_reason") or "answered"
+        reasons[reason] = reasons.get(reason, 0) + 1
+        row["refusal_reason"] = reason
+    return reasons
+
+
+async def run(args):
+    from bench.rag_eval import embedding_model, git_commit, load_questions, load_server, prepare_corpus
+
+    questions = [{**q, "answerable": True} for q in load_questions(args.questions)]
+    questions += [{**q, "answerable": False} for q in load_questions(args.refusal_questions)]
+    _, embeddings = prepare_corpus(args)
+    main = load_server(args, embeddings, questions)
+
+    rows = await collect(main, questions)
+    configured = main.refusal_thresholds or main.load_thresholds(embedding_model(args))
+    current = None
+    if configured is not None:
+        current = {"min_score": configured.min_score, "min_overlap": configured.min_overlap, "source": configured.source,
+                   **evaluate(rows, apply(rows, configured.min_score, configured.min_overlap))}
+    min_score, min_overlap = calibrate(rows, args.max_false_refusal)
+    calibrated = {"min_score": round(min_score, 4), "min_overlap": round(min_overlap, 4), **evaluate(rows, apply(rows, min_score, min_overlap))}
+    # 표본 밖 추정치: 보정한 기준값을 새 질문에 썼을 때 기대할 수 있는 값
+    held_out = evaluate(rows, leave_one_out(rows, args.max_false_refusal))
+
+    main.refusal_thresholds = main.Thresholds(min_score, min_overlap, "bench")
+    endpoint = await check_endpoint(main, rows, questions)
+
+    report = {
+        "embedding_model": embedding_model(args),
+        "llm": args.llm,
+        "max_false_refusal": args.max_false_refusal,
+        "current": current,
+        "calibrated_in_sample": calibrated,
+        "leave_one_out": held_out,
+        "chat_refusal_reasons": endpoint,
+    }
+    if args.write:
+        from backend.refusal import REFUSAL_THRESHOLDS_PATH
+
+        if held_out["false_refusal_rate"] > args.max_false_refusal:
+            print(f"⚠️ leave-one-out 거짓 거절률 {held_out['false_refusal_rate']}이 --max-false-refusal을 넘어 저장하지 않습니다. "
+                  "라벨 질문을 늘리거나 허용치를 다시 정하세요.", file=sys.stderr)
+        else:
+            with open(REFUSAL_THRESHOLDS_PATH, "w", encoding="utf-8") as f:
+                json.dump({
+                    "embedding_model": embedding_model(args),
+                    "min_score": calibrated["min_score"],
+                    "min_overlap": calibrated["min_overlap"],
+                    "max_false_refusal": args.max_false_refusal,
+                    "leave_one_out": {k: held_out[k] for k in ("false_refusal_rate", "unanswerable_caught_rate")},
+                    "answerable": calibrated["answerable"],
+                    "unanswerable": calibrated["unanswerable"],
+                    "git_commit": git_commit(),
+                    "calibrated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                }, f, ensure_ascii=False, indent=2)
+            print(f"💾 {REFUSAL_THRESHOLDS_PATH}", file=sys.stderr)
+
+    os.makedirs(args.out, exist_ok=True)
+    path = os.path.join(args.out, f"{time.strftime('%Y%m%d-%H%M%S')}-refusal-{args.label}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({**report, "questions": rows}, f, ensure_ascii=False, indent=2)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    print(f"💾 {path}", file=sys.stderr)
+
+
+def main():
+    from bench.rag_eval import CACHE_DIR, PDF_FOLDER, QUESTIONS_PATH, RESULTS_DIR
+
+    parser = argparse.ArgumentParser(description="책첵 거절 사전 판정 기준값 보정 (답할 수 없는 질문 라벨 세트)")
+    parser.add_argument("--questions", default=QUESTIONS_PATH, help="답할 수 있는 질문")
+    parser.add_argument("--refusal-questions", default=REFUSAL_QUESTIONS_PATH, help="답할 수 없는 질문")
+    parser.add_argument("--pdfs", default=PDF_FOLDER)
+    parser.add_argument("--embeddings", choices=["lexical", "recorded", "openai"], default="lexical")
+    parser.add_argument("--embedding-model", default=os.getenv("EMBEDDING_MODEL", "text-embedding-3-large"))
+    parser.add_argument("--llm", choices=["stub", "openai"], default="stub", help="stub: 질문 세트의 리그를 그대로 라우팅 / openai: 실제 라우터")
+    parser.add_argument("--max-false-refusal", type=float, default=0.0, help="허용할 거짓 거절률 (0~1)")
+    parser.add_argument("--write", action="store_true", help="보정한 기준값을 REFUSAL_THRESHOLDS_PATH에 저장")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--out", default=RESULTS_DIR)
+    args = parser.parse_args()
+    args.k, args.cache, args.rerank, args.chunk_tokens, args.rebuild = None, False, None, None, False
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+from langchain_core.documents import Document
+
+from bench.load_test import percentile
+
+# 🧪 검색 지연 시간 비교: 로컬 인덱스 vs 원격 인덱스
+# 사용법:
+#   python -m bench.retrieval_latency                          # 합성 코퍼스로 로컬 인덱스만 측정 (오프라인)
+#   python -m bench.retrieval_latency --index ./local_index --remote pinecone
+#                                                              # export한 인덱스와 원래 Pinecone 인덱스를 같은 질의 벡터로 비교
+# 질의 벡터는 인덱스에 있는 청크 벡터에 잡음을 섞어 만들므로 임베딩 API를 부르지 않습니다.
+
+PDF_FOLDER = "./frontend/public/pdfs"
+
+
+def synthetic_index(directory, chunks, dim, seed=0):
+    from backend.local_index import write_index
+
+    rng = np.random.default_rng(seed)
+    sources = sorted(f for f in os.listdir(PDF_FOLDER) if f.endswith(".pdf"))
+    docs = [
+        Document(id=f"chunk-{i}", page_content=f"synthetic chunk {i}", metadata={"source": f"./data/{sources[i % len(sources)]}", "page": float(i % 50)})
+        for i in range(chunks)
+    ]
+    write_index(directory, rng.standard_normal((chunks, dim), dtype=np.float32), docs, "synthetic", "synthetic")
+
+
+def make_queries(index, n, seed=1):
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, len(index), n)
+    return [np.asarray(index.vectors[r]) + 0.05 * rng.standard_normal(index.dim, dtype=np.float32) for r in rows]
+
+
+def timed(label, fn, queries, warmup=5):
+    for q in queries[:warmup]:
+        fn(q)
+    latencies = []
+    for q in queries:
+        t0 = time.perf_counter()
+        fn(q)
+        latencies.append(time.perf_counter() - t0)
+    return {
+        "mode": label,
+        "queries": len(latencies),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def remote_search(remote, k):
+    if remote == "pinecone":
+        from pinecone import Pinecone
+
+        index = Pinecone(api_key=os.getenv("PINECONE_API_KEY")).Index(os.getenv("PINECONE_INDEX_NAME"))
+        return lambda q: index.query(vector=q.tolist(), top_k=k, include_metadata=True)
+
+    import chromadb
+    from backend.ingestion import DB_PATH
+
+    collection = chromadb.PersistentClient(path=DB_PATH).get_collection("langchain")
+    return lambda q: collection.query(query_embeddings=[q.tolist()], n_results=k)
+
+
+def main():
+    from backend.local_index import LocalVectorIndex
+
+    parser = argparse.ArgumentParser(description="책첵 검색 지연 시간 벤치마크")
+    parser.add_argument("--index", default=None, help="export한 로컬 인덱스 폴더 (없으면 합성 코퍼스 사용)")
+    parser.add_argument("--chunks", type=int, default=3000)
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--remote", choices=["pinecone", "chroma"], default=None)
+    args = parser.parse_args()
+
+    directory = args.index
+    if directory is None:
+        directory = os.path.join(tempfile.mkdtemp(prefix="chaekcheck-index-"), "index")
+        synthetic_index(directory, args.chunks, args.dim)
+
+    for mmap in (False, True):
+        index = LocalVectorIndex.load(directory, mmap=mmap)
+        queries = make_queries(index, args.queries)
+        suffix = "+mmap" if mmap else ""
+        for label, filter in (("all", None), ("league", {"league": "KBO"}), ("source", {"source": "football_kleague_game_2018.pdf"})):
+            result = timed(f"local{suffix}/{label}", lambda q: index.search(q, k=args.k, filter=filter), queries)
+            result["chunks"] = len(index)
+            print(json.dumps(result, ensure_ascii=False))
+
+    if args.remote:
+        if args.index is None:
+            print("⚠️ 원격 비교는 그 원격 인덱스에서 export한 --index 와 함께 써야 같은 질의로 비교됩니다.")
+            return
+        search = remote_search(args.remote, args.k)
+        print(json.dumps(timed(f"remote/{args.remote}", search, queries), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import argparse
+import json
+import sqlite3
+from collections import defaultdict
+
+from backend.preclassifier import KeywordPreclassifier
+from backend.regulations import REGULATION_NAMES
+
+# 🧪 대화 로그 재생: 질문 재구성(rewrite) LLM 호출이 얼마나 줄었는지 측정 (오프라인, LLM 호출 없음)
+# 사용법:
+#   python -m bench.rewrite_replay                                # 내장 샘플 대화
+#   python -m bench.rewrite_replay --sessions ./sessions.sqlite   # SESSION_STORE_PATH로 쌓인 대화 기록
+#   python -m bench.rewrite_replay --log turns.jsonl              # {"session_id": ..., "message": ...} 한 줄에 한 턴
+# 비교 기준 (검색 전 LLM 호출 수):
+#   before : 라우터(로컬 사전 분류로 못 정하면) + 히스토리가 있으면 재구성 1회
+#   after  : 재구성이 필요하면 라우터+재구성 1회, 아니면 예전처럼 라우터(로컬 사전 분류로 못 정하면)
+# SQLite 기록은 세션당 최근 턴만 남아 있으므로, 남은 첫 턴은 히스토리 없이 들어온 것으로 셉니다.
+
+SAMPLE_SESSIONS = {
+    "s1": ["KBO 외국인 선수 몇 명까지 보유할 수 있어?", "그럼 K리그는?", "K리그 외국인 선수 출전 제한도 알려줘"],
+    "s2": ["K리그 클럽 라이선스 조건은?", "재정 기준은 어떻게 돼?", "K리그 재정건전화 규정 위반 제재는?"],
+    "s3": ["샐러리캡 위반 제재금 얼마야?", "그건 몇 년부터 적용돼?", "KBO FA 자격 취득 조건은?", "보상선수는?"],
+    "s4": ["경고 누적되면 몇 경기 출장 정지야?", "K리그 퇴장 징계 기준도 알려줘", "더 자세히 알려줘"],
+    "s5": ["두산 FA 보상선수 규정 알려줘", "KBO 신인드래프트 일정은?", "육성선수 등록 조건은?"],
+    "s6": ["K리그 B팀 K3 가입 절차가 궁금해", "유소년 클럽 시스템 운영 세칙 핵심만", "제17조 내용 알려줘"],
+}
+
+
+def load_sessions(args):
+    if args.sessions:
+        db = sqlite3.connect(args.sessions)
+        sessions = defaultdict(list)
+        for session_id, human in db.execute("SELECT session_id, human FROM turns ORDER BY session_id, id"):
+            sessions[session_id].append(human)
+        return sessions
+    if args.log:
+        sessions = defaultdict(list)
+        with open(args.log, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    sessions[row.get("session_id") or "-"].append(row["message"])
+        return sessions
+    return SAMPLE_SESSIONS
+
+
+def replay(sessions, verbose=False):
+    preclassifier = KeywordPreclassifier(REGULATION_NAMES)
+    stats = defaultdict(int)
+    for session_id, messages in sessions.items():
+        for i, message in enumerate(messages):
+            has_history = i > 0
+            routed_locally = preclassifier.classify(message) is not None
+            rewrite = has_history and not preclassifier.is_self_contained(message)
+
+            stats["turns"] += 1
+            stats["turns_with_history"] += has_history
+            stats["rewrites_before"] += has_history
+            stats["rewrites_after"] += rewrite
+            stats["llm_calls_before"] += (not routed_locally) + has_history
+            stats["llm_calls_after"] += 1 if rewrite else (not routed_locally)
+            if verbose:
+                print(json.dumps({"session": session_id, "message": message, "history": has_history, "rewrite": rewrite}, ensure_ascii=False))
+
+    with_history = stats["turns_with_history"]
+    return {
+        **stats,
+        "rewrite_eliminated_pct": round(100 * (1 - stats["rewrites_after"] / with_history), 1) if with_history else 0.0,
+        "llm_calls_per_turn_before": round(stats["llm_calls_before"] / stats["turns"], 3) if stats["turns"] else 0.0,
+        "llm_calls_per_turn_after": round(stats["llm_calls_after"] / stats["turns"], 3) if stats["turns"] else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="책첵 질문 재구성 생략 효과 (로그 재생)")
+    parser.add_argument("--sessions", default=None, help="SQLite 세션 저장소 경로 (SESSION_STORE_PATH)")
+    parser.add_argument("--log", default=None, help="JSONL 턴 로그 경로")
+    parser.add_argument("--verbose", action="store_true", help="턴별 판정 출력")
+    args = parser.parse_args()
+    print(json.dumps(replay(load_sessions(args), args.verbose), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from bench.load_test import percentile
+
+# 🧪 투기적 검색 / 로컬 사전 분류 효과 측정 (오프라인)
+# 사용법: python -m bench.speculation --rounds 5
+# 같은 질문 세트를 세 가지 모드로 돌려 time-to-answer p50/p95를 비교합니다.
+#   sequential   : 라우터 → 검색 → 답변 (예전 방식)
+#   speculative  : 라우터와 임베딩 + 범위 없는 후보 검색을 동시에 시작 (라우팅 후 리그로 거르고, 모자라면 범위 검색)
+#   spec+local   : 투기적 검색 + 로컬 사전 분류(뻔한 질문은 라우터 생략)
+
+# (질문, 라우터가 돌려줄 도메인)
+QUESTIONS = [
+    ("KBO 외국인 선수 몇 명까지 보유할 수 있어?", "KBO"),
+    ("K리그 클럽 라이선스 조건은?", "K리그"),
+    ("두산 FA 보상선수 규정 알려줘", "KBO"),
+    ("B팀 K3 가입 절차가 궁금해", "K리그"),
+    ("경고 누적되면 몇 경기 출장 정지야?", "K리그"),
+    ("유니폼 색상 관련 규정은?", "K리그"),
+    ("경기 사용구는 누가 준비해?", "KBO"),
+    ("샐러리캡 위반 제재금 얼마야?", "KBO"),
+    ("오늘 점심 뭐 먹지?", "비관련"),
+    ("KBL 외국인 선수 규정은?", "미지원스포츠"),
+]
+
+MODES = {
+    "sequential": (False, False),
+    "speculative": (True, False),
+    "spec+local": (True, True),
+}
+
+
+def install_labeled_router(main, latency):
+    from langchain_core.runnables import RunnableLambda
+
+    labels = dict(QUESTIONS)
+
+    async def route(inputs):
+        await asyncio.sleep(latency)
+        return main.RouteQuery(domain=labels.get(inputs["question"], "KBO"))
+
+    main.router_chain = RunnableLambda(lambda inputs: None, afunc=route)
+
+
+async def run(args):
+    from bench import stubs
+
+    stubs.install()
+    os.environ["SEMANTIC_CACHE"] = "0"
+    # 답변 LLM까지 가는 경로를 재므로 거절 사전 판정은 끕니다.
+    os.environ["REFUSAL_PRECHECK"] = "0"
+    from backend import main
+
+    main.initialize()
+
+    install_labeled_router(main, stubs.ROUTER_LATENCY)
+
+    for mode, (speculative, local) in MODES.items():
+        main.SPECULATIVE_RETRIEVAL = speculative
+        main.LOCAL_PRECLASSIFY = local
+        gate = asyncio.Semaphore(args.concurrency)
+        latencies = []
+
+        async def one(i, question):
+            async with gate:
+                t0 = time.perf_counter()
+                await main.chat_endpoint(main.ChatRequest(message=question, session_id=f"{mode}-{i}"))
+                latencies.append(time.perf_counter() - t0)
+
+        jobs = [q for _ in range(args.rounds) for q, _ in QUESTIONS]
+        await asyncio.gather(*(one(i, q) for i, q in enumerate(jobs)))
+        print(json.dumps({
+            "mode": mode,
+            "requests": len(latencies),
+            "p50_s": round(percentile(latencies, 50), 3),
+            "p95_s": round(percentile(latencies, 95), 3),
+        }, ensure_ascii=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="책첵 투기적 검색 벤치마크")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# 🧪 import 시간 & 콜드 스타트 (오프라인)
+# 사용법: python -m bench.startup [--runs 5] [--connect-latency 0.5]
+# - import: 새 파이썬 프로세스에서 `import backend.main`에 걸리는 시간 (스텁 없이 실제 라이브러리, 네트워크 호출 없음)
+# - cold start: uvicorn 워커를 띄운 시점부터 /health/live, /health/ready가 처음 200이 될 때까지, 그리고 첫 /chat 응답까지
+#   (OpenAI·Pinecone은 스텁, 벡터 DB 연결 시간은 --connect-latency로 흉내)
+# - --eager: 스텁을 import 전에 설치합니다. 초기화를 import 때 하던 예전 코드(/health/* 없음)를 같은 방법으로 잴 때 씁니다.
+
+IMPORT_SNIPPET = """
+import sys, time
+t = time.perf_counter()
+import backend.main
+print(time.perf_counter() - t)
+print(",".join(m for m in ("langchain_openai", "openai", "langchain.chains", "langchain_pinecone") if m in sys.modules) or "-")
+"""
+QUESTION = "KBO 외국인 선수 몇 명까지 보유할 수 있어?"
+
+
+def child_env(args):
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "stub")
+    env.setdefault("PINECONE_API_KEY", "stub")
+    env.setdefault("PINECONE_INDEX_NAME", "stub")
+    env["VECTOR_BACKEND"] = "pinecone"
+    env["SEMANTIC_CACHE"] = "0"
+    env["STUB_CONNECT_LATENCY"] = str(args.connect_latency)
+    # 실제 코퍼스 레지스트리·임베딩 캐시를 건드리지 않도록 임시 경로를 씁니다.
+    scratch = tempfile.mkdtemp(prefix="chaekcheck-startup-")
+    env["CORPUS_REGISTRY_PATH"] = os.path.join(scratch, "registry.json")
+    env["EMBEDDING_CACHE_DIR"] = os.path.join(scratch, "embeddings")
+    env["PYTHONPATH"] = os.getcwd() + os.pathsep + env.get("PYTHONPATH", "")
+    return env
+
+
+def measure_import(args):
+    times, loaded = [], ""
+    for _ in range(args.runs):
+        out = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], env=child_env(args), capture_output=True, text=True, check=True)
+        lines = out.stdout.strip().splitlines()
+        times.append(float(lines[-2]))
+        loaded = lines[-1]
+    return {"import_s_median": round(statistics.median(times), 3), "import_s_min": round(min(times), 3), "heavy_modules_at_import": loaded}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def poll(client, path, started, timeout):
+    while time.perf_counter() - started < timeout:
+        try:
+            response = client.get(path)
+            if response.status_code == 200:
+                return time.perf_counter() - started
+            if response.status_code == 404:
+                return None
+        except Exception:
+            pass
+        time.sleep(0.01)
+    raise TimeoutError(f"{path}가 {timeout}초 안에 200이 되지 않았습니다.")
+
+
+def measure_cold_start(args):
+    import httpx
+
+    rows = []
+    for _ in range(args.runs):
+        port = free_port()
+        command = [sys.executable, "-m", "bench.startup", "--serve", str(port)] + (["--eager"] if args.eager else [])
+        started = time.perf_counter()
+        process = subprocess.Popen(command, env=child_env(args), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+                # 예전 코드에는 /health/*가 없으므로 /가 뜨는 시점을 살아 있음·준비 완료로 봅니다.
+                live = poll(client, "/health/live", started, args.timeout) or poll(client, "/", started, args.timeout)
+                ready = poll(client, "/health/ready", started, args.timeout) or live
+                t0 = time.perf_counter()
+                client.post("/chat", json={"message": QUESTION}).raise_for_status()
+                rows.append({"live_s": live, "ready_s": ready, "first_chat_s": time.perf_counter() - t0})
+        finally:
+            process.terminate()
+            process.wait()
+    return {f"{key}_median": round(statistics.median(r[key] for r in rows), 3) for key in ("live_s", "ready_s", "first_chat_s")}
+
+
+def serve(port, eager):
+    import uvicorn
+
+    if eager:
+        from bench import stubs
+
+        stubs.install()
+    from backend import main
+
+    if not eager:
+        # 스텁 설치(= langchain_openai import)도 실제 초기화가 치르는 비용이므로 initialize 안에서 합니다.
+        initialize = main.initialize
+
+        def stubbed_initialize():
+            from bench import stubs
+
+            stubs.install()
+            initialize()
+
+        main.initialize = stubbed_initialize
+    uvicorn.run(main.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="책첵 import 시간·콜드 스타트 벤치마크")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--connect-latency", type=float, default=0.5, help="벡터 DB 연결 시간(초) 흉내")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--eager", action="store_true", help="스텁을 import 전에 설치 (예전 코드 측정용)")
+    parser.add_argument("--serve", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.eager)
+        return 0
+    report = {"runs": args.runs, "connect_latency_s": args.connect_latency}
+    if not args.eager:
+        report.update(measure_import(args))
+    report.update(measure_cold_start(args))
+    print(json.dumps(report, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+import asyncio
+import hashlib
+import math
+import os
+import re
+import tempfile
+import time
+from typing import Any, List, Optional
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+from langchain_core.vectorstores import InMemoryVectorStore
+
+# 🧪 오프라인 벤치마크용 스텁 백엔드
+# - OpenAI / Pinecone 대신 "지연 시간만 흉내 내는" 가짜 LLM, 임베딩, 벡터 DB를 제공합니다.
+# - install()을 backend.main import 전에 호출하면 실제 네트워크 호출 없이 서버 전체가 뜹니다.
+
+STUB_ANSWER = "**제17조(외국인 선수)** 에 따라 각 구단은 외국인 선수를 최대 3명까지 보유할 수 있습니다."
+
+SAMPLE_DOCS = [
+    Document(
+        page_content="제17조(외국인 선수) 구단은 외국인 선수를 3명까지 보유할 수 있으며, 경기에는 2명까지 출전할 수 있다.",
+        metadata={"source": "./data/baseball_kbo_leagueregulations_2025.pdf", "page": 11.0},
+    ),
+    Document(
+        page_content="제3조(승강) K리그1 최하위 클럽은 다음 시즌 K리그2로 자동 강등된다.",
+        metadata={"source": "./data/football_kleague_game_2018.pdf", "page": 2.0},
+    ),
+    Document(
+        page_content="제5조(연봉 상한) 선수단 연봉 총액은 재정건전화 규정이 정한 상한을 초과할 수 없다.",
+        metadata={"source": "./data/football_kleague_cleanfinancial_2024.pdf", "page": 4.0},
+    ),
+    Document(
+        page_content="제20조(FA 자격) 정규시즌 9시즌을 등록한 선수는 FA 자격을 취득한다.",
+        metadata={"source": "./data/baseball_kbo_rule_2025.pdf", "page": 31.0},
+    ),
+    Document(
+        page_content="제9조(유니폼) 홈 클럽과 원정 클럽의 유니폼 색상은 명확히 구분되어야 한다.",
+        metadata={"source": "./data/football_kleague_game_2018.pdf", "page": 7.0},
+    ),
+]
+
+# 환경 변수로 스텁 지연 시간(초)을 조절합니다.
+LLM_LATENCY = float(os.getenv("STUB_LLM_LATENCY", "0.8"))
+ROUTER_LATENCY = float(os.getenv("STUB_ROUTER_LATENCY", "0.3"))
+EMBED_LATENCY = float(os.getenv("STUB_EMBED_LATENCY", "0.1"))
+SEARCH_LATENCY = float(os.getenv("STUB_SEARCH_LATENCY", "0.1"))
+# 벡터 DB 연결(Pinecone 인덱스 조회) 시간. 콜드 스타트 측정용 (bench/startup.py)
+CONNECT_LATENCY = float(os.getenv("STUB_CONNECT_LATENCY", "0"))
+EMBED_DIM = 3072
+
+
+class StubChatModel(BaseChatModel):
+    latency: float = LLM_LATENCY
+    router_latency: float = ROUTER_LATENCY
+    answer: str = STUB_ANSWER
+    domain: str = "KBO"
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub-chat"
+
+    def _result(self, messages) -> ChatResult:
+        # /chat/batch가 여러 질문을 한 번에 물으면 "### 답변 N" 형식으로 질문 수만큼 답합니다.
+        asked = re.search(r"다음 (\d+)개 질문에 각각 답하세요", messages[-1].content if messages else "")
+        content = self.answer
+        if asked:
+            content = "\n\n".join(f"### 답변 {n}\n{self.answer}" for n in range(1, int(asked.group(1)) + 1))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency)
+        return self._result(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._result(messages)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        # 첫 토큰까지 전체 지연의 30%, 나머지는 단어 단위로 나눠서 흘려보냅니다.
+        words = self.answer.split(" ")
+        await asyncio.sleep(self.latency * 0.3)
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(self.latency * 0.7 / len(words))
+            text = word if i == 0 else " " + word
+            yield ChatGenerationChunk(message=AIMessageChunk(content=text))
+
+    def with_structured_output(self, schema, **kwargs):
+        def route(_input):
+            time.sleep(self.router_latency)
+            return schema(domain=self.domain)
+
+        async def aroute(_input):
+            await asyncio.sleep(self.router_latency)
+            return schema(domain=self.domain)
+
+        return RunnableLambda(route, afunc=aroute)
+
+
+class StubEmbeddings(DeterministicFakeEmbedding):
+    latency: float = EMBED_LATENCY
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self.latency)
+        return super().embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        await asyncio.sleep(self.latency)
+        return super().embed_query(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        # 배치 요청 한 번 = 왕복 한 번
+        await asyncio.sleep(self.latency)
+        return super().embed_documents(texts)
+
+
+class LexicalEmbeddings(Embeddings):
+    """단어 해싱 임베딩: 같은 단어를 많이 공유할수록 가까운 결정적 벡터 (오프라인 검색 품질 측정용)."""
+
+    def __init__(self, size: int = 1024):
+        self.size = size
+
+    def _features(self, text: str):
+        from backend.sparse_index import tokenize
+
+        words = tokenize(text)
+        # 단어 + 인접 단어 쌍 + 글자 2-gram ("보상선수" ↔ "보상 선수"처럼 띄어쓰기가 달라도 겹치도록)
+        yield from words
+        yield from (f"{a} {b}" for a, b in zip(words, words[1:]))
+        for word in words:
+            yield from (f"#{word[i:i + 2]}" for i in range(len(word) - 1))
+
+    def _embed(self, text: str) -> List[float]:
+        counts = {}
+        for feature in self._features(text):
+            counts[feature] = counts.get(feature, 0) + 1
+        vector = [0.0] * self.size
+        for feature, count in counts.items():
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            slot = int.from_bytes(digest[:4], "little") % self.size
+            sign = 1.0 if digest[4] & 1 else -1.0
+            vector[slot] += sign * (1.0 + math.log(count))
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+class ReplayEmbeddings(Embeddings):
+    """녹화해 둔 임베딩(CachedEmbeddings 디스크 캐시)만 재생합니다. 캐시에 없는 텍스트가 오면 실패합니다."""
+
+    def __init__(self, model: str):
+        self.model = model
+
+    def _missing(self, texts):
+        raise KeyError(f"녹화된 임베딩에 없는 텍스트 {len(texts)}개 ({self.model}). --embeddings openai 로 한 번 녹화하세요.")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._missing(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        self._missing([text])
+
+
+def _as_callable(filter):
+    # Pinecone 식 {"league": "KBO", "file": "..."} 필터를 InMemoryVectorStore가 받는 함수로 바꿉니다.
+    if not isinstance(filter, dict):
+        return filter
+    from backend.regulations import league_of
+
+    def match(doc):
+        source = os.path.basename(doc.metadata.get("source", ""))
+        values = {"file": source, "source": source, "league": league_of(source)}
+        return all(values.get(field, doc.metadata.get(field)) == value for field, value in filter.items())
+
+    return match
+
+
+class StubVectorStore(InMemoryVectorStore):
+    latency: float = SEARCH_LATENCY
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, filter=None, **kwargs: Any) -> List[Document]:
+        return super().similarity_search_by_vector(embedding, k=k, filter=_as_callable(filter), **kwargs)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        time.sleep(self.latency)
+        return super().similarity_search(query, k=k, **kwargs)
+
+    async def asimilarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        vector = await self.embedding.aembed_query(query)
+        return await self.asimilarity_search_by_vector(vector, k=k, **kwargs)
+
+    async def asimilarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        await asyncio.sleep(self.latency)
+        return self.similarity_search_by_vector(embedding, k=k, **kwargs)
+
+    async def asimilarity_search_by_vector_with_score(self, embedding: List[float], k: int = 4, filter=None, **kwargs: Any):
+        await asyncio.sleep(self.latency)
+        return self.similarity_search_with_score_by_vector(embedding, k=k, filter=_as_callable(filter), **kwargs)
+
+
+def build_vectorstore(embedding: Optional[StubEmbeddings] = None) -> StubVectorStore:
+    time.sleep(CONNECT_LATENCY)
+    embedding = embedding or StubEmbeddings(size=EMBED_DIM, latency=0)
+    store = StubVectorStore(embedding=embedding)
+    store.add_documents(SAMPLE_DOCS)
+    store.embedding = StubEmbeddings(size=EMBED_DIM)
+    return store
+
+
+def install():
+    """backend.main import 전에 호출: OpenAI/Pinecone 생성자를 스텁으로 교체합니다."""
+    import langchain_openai
+    import langchain_pinecone
+
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    os.environ.setdefault("PINECONE_API_KEY", "stub")
+    os.environ.setdefault("PINECONE_INDEX_NAME", "stub")
+    # 스텁 벡터가 실제 임베딩 캐시에 섞이지 않도록 임시 폴더를 씁니다.
+    os.environ["EMBEDDING_CACHE_DIR"] = tempfile.mkdtemp(prefix="chaekcheck-emb-")
+
+    langchain_openai.ChatOpenAI = lambda *args, **kwargs: StubChatModel()
+    langchain_openai.OpenAIEmbeddings = lambda *args, **kwargs: StubEmbeddings(size=EMBED_DIM)
+    langchain_pinecone.PineconeVectorStore.from_existing_index = classmethod(
+        lambda cls, *args, **kwargs: build_vectorstore()
+    )
@@ -0,0 +1,179 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# 🧪 업스트림 클라이언트 계층 벤치마크 (로컬 OpenAI 호환 목 서버, 네트워크 없음)
+# 사용법: python -m bench.upstream [--requests 120] [--concurrency 24] [--latency 0.2] [--fail-rate 0.05] [--tls | --http2]
+# - bench/mock_openai.py를 띄우고 OPENAI_BASE_URL을 그쪽으로 돌린 뒤, 실제 ChatOpenAI·OpenAIEmbeddings로 서버를 초기화해
+#   /chat을 동시에 보냅니다. (코퍼스는 bench/rag_eval.py의 단어 해싱 임베딩 로컬 인덱스, 목 서버가 같은 임베딩을 돌려줌)
+# - 공용 클라이언트(UPSTREAM_SHARED_CLIENTS=1)와 라이브러리 기본 클라이언트(=0)를 각각 새 프로세스로 돌려 비교합니다.
+#   지연 p50/p95, 성공 수, 목 서버가 본 업스트림 요청·TCP 연결 수, 429 거절(→ 재시도) 수, 목 서버의 동시 처리 최대치
+# - --concurrency-limit으로 OPENAI_MAX_CONCURRENCY를 걸면 목 서버의 동시 처리 최대치가 그 아래로 묶이는지 볼 수 있습니다.
+# - --tls: 자체 서명 인증서(openssl)로 목 서버를 HTTPS로 띄우고 SSL_CERT_FILE로 신뢰시킵니다. (TLS 핸드셰이크·keep-alive 재사용 비교)
+# - --http2: --tls + hypercorn 목 서버 + UPSTREAM_HTTP2=1. http_versions에서 공용 클라이언트가 실제로 "2"로 붙었는지 봅니다.
+# - CPU 한 개에서는 목 서버와 같이 돌므로 클라이언트 CPU(client_cpu_s)가 곧 지연으로 나타납니다. 순서 영향을 줄이려고 shared를 먼저 돌립니다.
+
+
+def child_env(args, port, shared):
+    env = dict(os.environ)
+    env.update(
+        OPENAI_BASE_URL=f"{args.scheme}://127.0.0.1:{port}/v1",
+        OPENAI_API_KEY="mock",
+        UPSTREAM_SHARED_CLIENTS="1" if shared else "0",
+        # 요청마다 라우터 LLM·임베딩을 실제로 부르도록 사전 분류기·캐시를 끕니다.
+        LOCAL_PRECLASSIFY="0",
+        SEMANTIC_CACHE="0",
+        EMBEDDING_CACHE_DIR=tempfile.mkdtemp(prefix="chaekcheck-upstream-"),
+        CHAT_DEBUG="0",
+        PYTHONPATH=os.getcwd() + os.pathsep + os.environ.get("PYTHONPATH", ""),
+    )
+    if args.concurrency_limit:
+        env["OPENAI_MAX_CONCURRENCY"] = str(args.concurrency_limit)
+    if args.certfile:
+        env["SSL_CERT_FILE"] = args.certfile
+    if args.http2:
+        env["UPSTREAM_HTTP2"] = "1"
+    return env
+
+
+def self_signed_cert():
+    # 127.0.0.1용 자체 서명 인증서 → (certfile, keyfile)
+    folder = tempfile.mkdtemp(prefix="chaekcheck-tls-")
+    certfile, keyfile = os.path.join(folder, "cert.pem"), os.path.join(folder, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-keyout", keyfile, "-out", certfile,
+         "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1"],
+        check=True, capture_output=True,
+    )
+    return certfile, keyfile
+
+
+async def fire(args, questions):
+    import httpx
+
+    from backend import main
+
+    main.initialize()
+    transport = httpx.ASGITransport(app=main.app)
+    latencies, failed = [], 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one(client, question):
+        nonlocal failed
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post("/chat", json={"message": question})
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - started)
+            else:
+                failed += 1
+                print(f"⚠️ {response.status_code} {response.text[:300]}", file=sys.stderr)
+
+    started, cpu = time.perf_counter(), time.process_time()
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await asyncio.gather(*(one(client, questions[i % len(questions)]) for i in range(args.requests)))
+    elapsed, cpu = time.perf_counter() - started, time.process_time() - cpu
+    latencies.sort()
+    return {
+        "ok": len(latencies),
+        "failed": failed,
+        "p50_s": round(statistics.median(latencies), 3) if latencies else None,
+        "p95_s": round(latencies[int(len(latencies) * 0.95) - 1], 3) if latencies else None,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "client_cpu_s": round(cpu, 2),
+    }
+
+
+def run_child(args):
+    from bench.rag_eval import load_questions
+
+    questions = [q["question"] for q in load_questions(args.questions)]
+    print(json.dumps(asyncio.run(fire(args, questions)), ensure_ascii=False))
+    return 0
+
+
+def run(args):
+    import httpx
+
+    from bench.rag_eval import prepare_corpus
+    from bench.startup import free_port
+
+    # 코퍼스(로컬 인덱스 + BM25)를 준비하고, 서버가 그 임베딩 모델 이름을 쓰도록 자식 프로세스에 넘깁니다.
+    args.embeddings, args.chunk_tokens, args.rebuild, args.embedding_model = "lexical", None, False, None
+    prepare_corpus(args)
+    os.environ["EMBEDDING_MODEL"] = "lexical-hash-1024"
+
+    args.tls = args.tls or args.http2
+    args.scheme = "https" if args.tls else "http"
+    args.certfile, keyfile = self_signed_cert() if args.tls else (None, None)
+    port = free_port()
+    command = [sys.executable, "-m", "bench.mock_openai", "--port", str(port), "--latency", str(args.latency),
+               "--embed-latency", str(args.embed_latency), "--fail-rate", str(args.fail_rate)]
+    if args.tls:
+        command += ["--certfile", args.certfile, "--keyfile", keyfile]
+    if args.http2:
+        command.append("--http2")
+    mock = subprocess.Popen(command, env=child_env(args, port, True))
+    report = {"requests": args.requests, "concurrency": args.concurrency, "fail_rate": args.fail_rate, "scheme": args.scheme, "http2": args.http2}
+    try:
+        with httpx.Client(base_url=f"{args.scheme}://127.0.0.1:{port}", timeout=10, verify=args.certfile or True) as control:
+            for _ in range(200):
+                if mock.poll() is not None:
+                    raise RuntimeError("목 서버가 뜨지 않았습니다.")
+                try:
+                    control.get("/stats")
+                    break
+                except httpx.TransportError:
+                    time.sleep(0.05)
+            for mode, shared in (("shared", True), ("default", False)):
+                control.post("/stats/reset")
+                command = [sys.executable, "-m", "bench.upstream", "--child", "--requests", str(args.requests),
+                           "--concurrency", str(args.concurrency), "--questions", args.questions]
+                out = subprocess.run(command, env=child_env(args, port, shared), capture_output=True, text=True)
+                if out.returncode:
+                    raise RuntimeError(out.stderr[-2000:])
+                result = json.loads(out.stdout.strip().splitlines()[-1])
+                upstream = control.get("/stats").json()
+                report[mode] = {
+                    **result,
+                    "upstream_requests": sum(upstream["requests"].values()),
+                    "connections": upstream["connections"],
+                    "rejected_429": upstream["rejected"],
+                    "max_inflight": upstream["max_inflight"],
+                    "http_versions": upstream["http_versions"],
+                }
+    finally:
+        mock.terminate()
+        mock.wait()
+    print(json.dumps(report, ensure_ascii=False))
+    return 0
+
+
+def main():
+    from bench.rag_eval import CACHE_DIR, PDF_FOLDER, QUESTIONS_PATH
+
+    parser = argparse.ArgumentParser(description="책첵 업스트림 클라이언트 계층 벤치마크")
+    parser.add_argument("--requests", type=int, default=120)
+    parser.add_argument("--concurrency", type=int, default=24)
+    parser.add_argument("--latency", type=float, default=0.2, help="목 서버 답변 지연(초)")
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--fail-rate", type=float, default=0.05, help="목 서버가 429로 거절할 비율")
+    parser.add_argument("--concurrency-limit", type=int, default=None, help="OPENAI_MAX_CONCURRENCY")
+    parser.add_argument("--tls", action="store_true", help="목 서버를 HTTPS(자체 서명 인증서)로 띄움")
+    parser.add_argument("--http2", action="store_true", help="TLS + HTTP/2 목 서버 (hypercorn, h2 필요), UPSTREAM_HTTP2=1")
+    parser.add_argument("--questions", default=QUESTIONS_PATH)
+    parser.add_argument("--pdfs", default=PDF_FOLDER)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    return run_child(args) if args.child else run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -623,13 +623,31 @@ const ServerWarmingOverlay = styled.div`
   }
 `;
 
+// 🟢 세션 ID 생성. crypto.randomUUID()는 보안 컨텍스트(HTTPS·localhost)에서만 있으므로
+// 사내망 HTTP 주소 등에서는 getRandomValues(없으면 Math.random)로 UUID v4 모양을 만듭니다.
+function newSessionId() {
+  if (globalThis.crypto?.randomUUID) return globalThis.crypto.randomUUID();
+  const bytes = new Uint8Array(16);
+  if (globalThis.crypto?.getRandomValues) globalThis.crypto.getRandomValues(bytes);
+  else for (let i = 0; i < bytes.length; i++) bytes[i] = Math.floor(Math.random() * 256);
+  bytes[6] = (bytes[6] & 0x0f) | 0x40;
+  bytes[8] = (bytes[8] & 0x3f) | 0x80;
+  const hex = Array.from(bytes, (b) => b.toString(16).padStart(2, "0")).join("");
+  return `${hex.slice(0, 8)}-${hex.slice(8, 12)}-${hex.slice(12, 16)}-${hex.slice(16, 20)}-${hex.slice(20)}`;
+}
+
 function App() {
   const [messages, setMessages] = useState([]);
   const [input, setInput] = useState("");
   const [loading, setLoading] = useState(false);
+  const [streaming, setStreaming] = useState(false);
+  // 🟢 탭마다 고유한 세션 ID (새로고침하면 새 대화). 서버가 이 ID로 대화 맥락을 이어갑니다.
+  const [sessionId] = useState(newSessionId);
   const [hasInteracted, setHasInteracted] = useState(false);
   const [loadingText, setLoadingText] = useState("📚 관련 규정을 탐색할 준비 중...");
   const [serverWarming, setServerWarming] = useState(false);
+  // 🟢 반영된 규정집 목록은 서버 카탈로그(/catalog, ETag로 캐시)에서 받아옵니다.
+  const [catalog, setCatalog] = useState([]);
   const API_URL = import.meta.env.VITE_API_URL || "http://127.0.0.1:8000";
 
   useEffect(() => {
@@ -655,6 +673,14 @@ function App() {
     checkServer();
   }, [API_URL]);
 
+  useEffect(() => {
+    axios.get(`${API_URL}/catalog`)
+      .then(res => setCatalog(res.data.documents || []))
+      .catch(() => {});
+  }, [API_URL]);
+
+  const documentCount = (league) => catalog.filter(doc => doc.league === league).length;
+
   const messagesEndRef = useRef();
 
 
@@ -674,8 +700,8 @@ function App() {
   ];
 
   const institutions = [
-    { name: "KBO", file: "kbo.svg", url: "https://www.koreabaseball.com/Kbo/Board/Ebook/EbookPublication.aspx", active: true },
-    { name: "K League", file: "kleague.png", url: "https://www.kleague.com/about/regulations.do", active: true },
+    { name: "KBO", league: "KBO", file: "kbo.svg", url: "https://www.koreabaseball.com/Kbo/Board/Ebook/EbookPublication.aspx", active: true },
+    { name: "K League", league: "K리그", file: "kleague.png", url: "https://www.kleague.com/about/regulations.do", active: true },
     { name: "KFA", file: "kfa.png", url: "", active: false },
     { name: "AFC", file: "afc.svg", url: "", active: false },
     { name: "FIFA", file: "fifa.png", url: "", active: false },
@@ -740,18 +766,66 @@ function App() {
       return; // 서버 통신 완벽 차단!
     }
 
+    // 🟢 [신규] SSE 스트리밍: 출처 카드는 검색 직후, 답변은 토큰 단위로 바로바로 그립니다.
+    let started = false;
+    const updateAssistant = (patch) => {
+      if (!started) {
+        started = true;
+        setStreaming(true);
+        setMessages(prev => [...prev, { role: "assistant", content: "", sources: [] }]);
+      }
+      setMessages(prev => {
+        const last = prev[prev.length - 1];
+        return [...prev.slice(0, -1), { ...last, ...patch(last) }];
+      });
+    };
+
     try {
-      const response = await axios.post(`${API_URL}/chat`, { message: textToSend });
-      setMessages(prev => [...prev, { 
-        role: "assistant", 
-        content: response.data.answer,
-        sources: response.data.sources,
-        generationTime: response.data.generation_time // 🟢 백엔드에서 준 시간 저장!
-      }]);
+      const response = await fetch(`${API_URL}/chat/stream`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ message: textToSend, session_id: sessionId }),
+      });
+      if (!response.ok || !response.body) throw new Error(`HTTP ${response.status}`);
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        const events = buffer.split("\n\n");
+        buffer = events.pop();
+        for (const raw of events) {
+          const event = raw.match(/^event: (.*)$/m)?.[1];
+          const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] || "{}");
+
+          if (event === "sources") {
+            updateAssistant(() => ({ sources: data.sources }));
+          } else if (event === "token") {
+            updateAssistant(last => ({ content: last.content + data.text }));
+          } else if (event === "withdraw_sources") {
+            // 답변이 '우아한 거절'로 바뀌면 먼저 보여준 출처 카드를 거둬들입니다.
+            updateAssistant(() => ({ sources: [] }));
+          } else if (event === "done") {
+            updateAssistant(() => ({ generationTime: data.timings.total.toFixed(2) }));
+          } else if (event === "error") {
+            throw new Error(data.detail);
+          }
+        }
+      }
     } catch (error) {
-      setMessages(prev => [...prev, { role: "assistant", content: "서버 연결에 실패했습니다." }]);
+      if (started) {
+        updateAssistant(last => ({ content: last.content + "\n\n서버 연결에 실패했습니다." }));
+      } else {
+        setMessages(prev => [...prev, { role: "assistant", content: "서버 연결에 실패했습니다." }]);
+      }
     } finally {
       setLoading(false);
+      setStreaming(false);
     }
   };
 
@@ -870,7 +944,7 @@ function App() {
                         target={inst.active ? "_blank" : undefined}
                         rel={inst.active ? "noopener noreferrer" : undefined}
                         $active={inst.active}
-                        title={inst.name}
+                        title={inst.league && documentCount(inst.league) ? `${inst.name} · 규정집 ${documentCount(inst.league)}개` : inst.name}
                       >
                          <img src={`/assets/logos/${inst.file}`} alt={inst.name} />
                       </InstitutionLogo>
@@ -943,7 +1017,7 @@ function App() {
                                   gap: '6px'
                                 }}
                               >
-                                <span style={{fontSize: '1.2em'}}>📄</span> {src.file} (p.{src.page}) 
+                                <span style={{fontSize: '1.2em'}}>📄</span> {src.file}{src.article ? ` ${src.article}` : ""} (p.{src.page}) 
                                 <span style={{fontSize: '0.85em', background: 'rgba(74, 144, 226, 0.1)', padding: '2px 6px', borderRadius: '4px'}}>🔍 뷰어 열기</span>
                               </a>
                             </li>
@@ -961,7 +1035,7 @@ function App() {
               ))}
               
               {/* 예쁜 스켈레톤 로딩 UI */}
-              {loading && (
+              {loading && !streaming && (
                 <SkeletonBubble>
                   <SkeletonContent>
                     {/* 1.5초마다 바뀌는 재치 있는 로딩 메시지 */}